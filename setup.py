@@ -231,7 +231,7 @@ setup_args = {
 
     'package_dir'       : {'': 'src'},
 
-    'scripts'           : ['bin/entk-version'],
+    'scripts'           : ['bin/entk-version', 'bin/entk-benchmark', 'bin/entk-convert-profiles'],
 
 
     'package_data'      :  {'': ['*.sh', '*.json', 'VERSION', 'SDIST']},
@@ -240,6 +240,10 @@ setup_args = {
     'install_requires'  :  ['radical.utils', 'pika', 'radical.pilot',
                             'pytest','hypothesis','sphinx'],
 
+    # Optional dependencies, e.g. pip install radical.entk[msgpack]
+    'extras_require'    :  {'msgpack': ['msgpack>=0.5.2'],
+                            'numpy'  : ['numpy>=1.13']},
+
     'zip_safe'          : False,
 
     'data_files'        : [
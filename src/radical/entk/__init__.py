@@ -4,6 +4,7 @@ from radical.entk.version import version, __version__
 from radical.entk.pipeline.pipeline import Pipeline
 from radical.entk.stage.stage import Stage
 from radical.entk.task.task import Task
+from radical.entk.task.task_array import TaskArray
 
 from radical.entk.appman.appmanager import AppManager
 import states
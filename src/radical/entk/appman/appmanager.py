@@ -8,7 +8,14 @@ from radical.entk.pipeline.pipeline import Pipeline
 from radical.entk.stage.stage import Stage
 from radical.entk.task.task import Task
 from radical.entk.utils.prof_utils import write_session_description
-from radical.entk.utils.prof_utils import write_workflow
+from radical.entk.utils.prof_utils import WorkflowWriter
+from radical.entk.utils.checkpoint import write_checkpoint, read_checkpoint, restore_workflow
+from radical.entk.utils.checkpoint import restore_id_counters, seed_placeholders
+from radical.entk.utils.mq_utils import CONSUME_TIMEOUT, PREFETCH_COUNT, TRANSPORTS
+from radical.entk.utils.mq_utils import get_connection_manager, set_transport
+from radical.entk.utils.metrics import Metrics, METRICS_INTERVAL
+from radical.entk.utils.log_utils import UpdateReporter
+from radical.entk.utils.bin_profiler import BinaryProfiler, get_profiler, flush_profilers, convert_profiles
 from wfprocessor import WFprocessor
 import sys
 import time
@@ -16,6 +23,7 @@ import os
 import Queue
 import pika
 import json
+from functools import partial
 from threading import Thread, Event
 from radical.entk import states
 
@@ -34,11 +42,13 @@ class AppManager(object):
         :reattempts: number of attempts to re-invoke any failed EnTK components
         :resubmit_failed: resubmit failed tasks (True/False)
         :autoterminate: terminate resource reservation upon execution of all tasks of first workflow (True/False)
-        :write_workflow: write workflow and mapping to rts entities to a file (post-termination)
+        :write_workflow: write workflow and mapping to rts entities to a file, as the objects reach final states
         :rts: Specify RTS to use. Current options: 'mock', 'radical.pilot' (default if unspecified)
         :rmq_cleanup: Cleanup all queues created in RabbitMQ server for current execution (default is True)
         :rts_config: Configuration for the RTS, accepts {"sandbox_cleanup": True/False,"db_cleanup": True/False} when RTS is RP
         :name: Name of the Application. It should be unique between executions. (default is randomly assigned)
+        :transport: Transport between the components of EnTK. Current options: 'rabbitmq' (default if unspecified),
+            'local' (no RabbitMQ server required, all components have to run on the same host)
     """
 
     def __init__(self,
@@ -52,7 +62,8 @@ class AppManager(object):
                  rts=None,
                  rmq_cleanup=None,
                  rts_config=None,
-                 name=None):
+                 name=None,
+                 transport=None):
 
         # Create a session for each EnTK script execution
         if name:
@@ -64,16 +75,22 @@ class AppManager(object):
             
         self._read_config(config_path, hostname, port, reattempts,
                           resubmit_failed, autoterminate, write_workflow,
-                          rts, rmq_cleanup, rts_config)
+                          rts, rmq_cleanup, rts_config, transport)
 
         # Create an uid + logger + profiles for AppManager, under the sid
         # namespace
         path = os.getcwd() + '/' + self._sid
         self._uid = ru.generate_id('appmanager.%(item_counter)04d', ru.ID_CUSTOM, namespace=self._sid)
         self._logger = ru.Logger('radical.entk.%s' % self._uid, path=path, targets=['2','.'])
-        self._prof = ru.Profiler(name='radical.entk.%s' % self._uid, path=path)
+        self._prof = get_profiler(name='radical.entk.%s' % self._uid, path=path)
         self._report = ru.Reporter(name='radical.entk.%s' % self._uid)
 
+        # Updates applied by the synchronizer, reported one by one or as periodic summaries
+        self._updates = UpdateReporter(self._report)
+
+        # Live latencies of the synchronizer and depths of the queues, dumped while the workflow runs
+        self._metrics = Metrics(name='radical.entk.%s' % self._uid, path=path)
+
         self._report.info('EnTK session: %s\n' % self._sid)
         self._prof.prof('create amgr obj', uid=self._uid)
         self._report.info('Creating AppManager')
@@ -82,16 +99,24 @@ class AppManager(object):
         # RabbitMQ Queues
         self._pending_queue = list()
         self._completed_queue = list()
+        self._queues = list()
 
         # Global parameters to have default values
         self._mqs_setup = False
         self._resource_desc = None
         self._task_manager = None
         self._workflow = None
+        self._uid_map = dict()
+        self._workflow_writer = None
+        self._resumed = False
         self._cur_attempt = 1
         self._shared_data = list()
 
         self._rmq_ping_interval = os.getenv('RMQ_PING_INTERVAL', 10)
+        self._idle_sleep = float(os.getenv('ENTK_IDLE_SLEEP', 0.1))
+
+        # Interval (secs) between checkpoints of the workflow, 0 disables checkpoints
+        self._checkpoint_interval = float(os.getenv('ENTK_CHECKPOINT_INTERVAL', 60))
 
         self._logger.info('Application Manager initialized')
         self._prof.prof('amgr obj created', uid=self._uid)
@@ -99,7 +124,7 @@ class AppManager(object):
 
     def _read_config(self, config_path, hostname, port, reattempts,
                      resubmit_failed, autoterminate, write_workflow,
-                     rts, rmq_cleanup, rts_config):
+                     rts, rmq_cleanup, rts_config, transport=None):
 
         if not config_path:
             config_path = os.path.dirname(os.path.abspath(__file__))
@@ -115,9 +140,11 @@ class AppManager(object):
         self._rts = rts if rts in ['radical.pilot', 'mock'] else str(config['rts'])
         self._rmq_cleanup = rmq_cleanup if rmq_cleanup is not None else config['rmq_cleanup']
         self._rts_config = rts_config if rts_config is not None else config['rts_config']
+        self._transport = transport if transport in TRANSPORTS else str(config.get('transport', 'rabbitmq'))
 
         self._num_pending_qs = config['pending_qs']
         self._num_completed_qs = config['completed_qs']
+        self._num_dequeue_workers = config.get('dequeue_workers', 1)
 
     # ------------------------------------------------------------------------------------------------------------------
     # Getter functions
@@ -275,6 +302,9 @@ class AppManager(object):
             # Setup rabbitmq stuff
             if not self._mqs_setup:
 
+                # Components forked from here on communicate via the selected transport
+                set_transport(self._transport)
+
                 self._report.info('Setting up RabbitMQ system')
                 setup = self._setup_mqs()
 
@@ -294,10 +324,17 @@ class AppManager(object):
                                     completed_queue=self._completed_queue,
                                     mq_hostname=self._mq_hostname,
                                     port=self._port,
-                                    resubmit_failed=self._resubmit_failed)
-            self._wfp._initialize_workflow()
-            self._workflow = self._wfp.workflow
+                                    resubmit_failed=self._resubmit_failed,
+                                    dequeue_workers=self._num_dequeue_workers)
+
+            # A resumed workflow keeps its uids
+            if self._resumed:
+                self._wfp._register_workflow()
+            else:
+                self._wfp._initialize_workflow()
 
+            self._workflow = self._wfp.workflow
+            self._uid_map = self._wfp.uid_map
 
             # Submit resource request if not resource allocation done till now or
             # resubmit a new one if the old one has completed
@@ -315,6 +352,10 @@ class AppManager(object):
                     'Cannot run without resource manager, please create and assign a resource manager')
                 raise EnTKError(text='Missing resource manager')
 
+            # Objects are written as they reach final states
+            if self._write_workflow and not self._workflow_writer:
+                self._workflow_writer = WorkflowWriter(self._sid)
+
             # Start synchronizer thread
             if not self._sync_thread:
                 self._logger.info('Starting synchronizer thread')
@@ -349,6 +390,10 @@ class AppManager(object):
 
             active_pipe_count = len(self._workflow)
             finished_pipe_uids = []
+            last_checkpoint = time.time()
+            last_metrics = time.time()
+
+            self._metrics.start()
 
             # We wait till all pipelines of the workflow are marked
             # complete
@@ -389,14 +434,17 @@ class AppManager(object):
                     """
 
                     self._prof.prof('recreating wfp obj', uid=self._uid)
-                    self._wfp = WFProcessor(
+                    self._wfp = WFprocessor(
                         sid=self._sid,
                         workflow=self._workflow,
                         pending_queue=self._pending_queue,
                         completed_queue=self._completed_queue,
                         mq_hostname=self._mq_hostname,
                         port=self._port,
-                        resubmit_failed=self._resubmit_failed)
+                        resubmit_failed=self._resubmit_failed,
+                        dequeue_workers=self._num_dequeue_workers)
+                    self._wfp._register_workflow()
+                    self._uid_map = self._wfp.uid_map
 
                     self._logger.info('Restarting WFProcessor process from AppManager')
                     self._wfp.start_processor()
@@ -425,6 +473,19 @@ class AppManager(object):
 
                     self._cur_attempt += 1
 
+                # Checkpoint the workflow, so that it can be resumed if the client dies
+                if self._checkpoint_interval and (time.time() - last_checkpoint >= self._checkpoint_interval):
+                    self._checkpoint()
+                    last_checkpoint = time.time()
+
+                # Queue depths are read as often as the metrics are dumped
+                if METRICS_INTERVAL and (time.time() - last_metrics >= METRICS_INTERVAL):
+                    self._update_queue_gauges()
+                    last_metrics = time.time()
+
+                # Only watch over the components, do not spin
+                time.sleep(self._idle_sleep)
+
             self._prof.prof('start termination', uid=self._uid)
 
             # Terminate threads in following order: wfp, helper, synchronizer
@@ -435,14 +496,26 @@ class AppManager(object):
             self._terminate_sync.set()
             self._sync_thread.join()
             self._logger.info('Synchronizer thread terminated')
+            self._updates.flush()
 
             if self._autoterminate:
                 self.resource_terminate()
 
-            if self._write_workflow:
-                write_workflow(self._workflow, self._sid)
+            if self._workflow_writer:
+                self._workflow_writer.write_workflow(self._workflow)
+                self._workflow_writer.close()
+                self._workflow_writer = None
+
+            if self._checkpoint_interval:
+                self._checkpoint()
+
+            self._metrics.stop()
+
+            self._logger.info('RabbitMQ connections: %s' %
+                              get_connection_manager(self._mq_hostname, self._port).metrics)
 
             self._prof.prof('termination done', uid=self._uid)
+            self._convert_profiles()
 
         except KeyboardInterrupt:
 
@@ -470,6 +543,11 @@ class AppManager(object):
             if self._resource_manager:
                 self._resource_manager._terminate_resource_request()
 
+            if self._checkpoint_interval:
+                self._checkpoint()
+
+            self._metrics.stop()
+
             self._prof.prof('termination done', uid=self._uid)
 
             raise KeyboardInterrupt
@@ -499,9 +577,39 @@ class AppManager(object):
             if self._resource_manager:
                 self._resource_manager._terminate_resource_request()
 
+            if self._checkpoint_interval:
+                self._checkpoint()
+
+            self._metrics.stop()
+
             self._prof.prof('termination done', uid=self._uid)
             raise
 
+    def resume(self, session_dir):
+        """
+        **Purpose**: Resume the workflow of an earlier run from the checkpoint in its session folder 'session_dir'.
+        Stages which are DONE are skipped, only the tasks which are not DONE (nor FAILED) are resubmitted. The paths of
+        the DONE tasks remain available to placeholders.
+
+        The post_exec of stages cannot be checkpointed. It is taken from the workflow assigned to the AppManager, if
+        any, matching pipelines by name and stages by position. The resource manager has to be assigned as for run().
+        """
+
+        self._prof.prof('resuming workflow', uid=self._uid)
+        self._logger.info('Resuming workflow from %s' % session_dir)
+
+        checkpoint = read_checkpoint(session_dir)
+
+        self._workflow = restore_workflow(checkpoint, self._workflow)
+        self._resumed = True
+
+        restore_id_counters(self._workflow, self._sid)
+        seed_placeholders(self._workflow, os.path.join(os.getcwd(), self._sid, 'placeholders.jsonl'))
+
+        self._prof.prof('workflow resumed', uid=self._uid)
+
+        self.run()
+
     def resource_terminate(self):
 
         if self._task_manager:
@@ -518,12 +626,60 @@ class AppManager(object):
         if self._rmq_cleanup:
             self._cleanup_mqs()
 
+        self._convert_profiles()
+
         self._report.info('All components terminated\n')
 
     # ------------------------------------------------------------------------------------------------------------------
     # Private methods
     # ------------------------------------------------------------------------------------------------------------------
 
+    def _checkpoint(self):
+        """
+        **Purpose**: Write a checkpoint of the workflow to the session folder. Failures are logged, they do not
+        interrupt the run.
+        """
+
+        try:
+            self._prof.prof('checkpoint', uid=self._uid)
+            write_checkpoint(self._workflow, self._sid)
+            self._prof.prof('checkpoint done', uid=self._uid)
+
+        except Exception as ex:
+            self._logger.exception('Checkpoint failed, error: %s' % ex)
+
+    def _convert_profiles(self):
+        """
+        **Purpose**: In binary profiling mode, write the buffered events of the profilers of this process and convert
+        the binary profiles of the session to .prof files.
+        """
+
+        if not isinstance(self._prof, BinaryProfiler):
+            return
+
+        try:
+            flush_profilers()
+            convert_profiles(os.path.join(os.getcwd(), self._sid))
+
+        except Exception as ex:
+            self._logger.exception('Profiles not converted, error: %s' % ex)
+
+    def _update_queue_gauges(self):
+        """
+        **Purpose**: Set the gauge 'queue.<name>' of the metrics to the number of messages waiting in each queue of the
+        session. Failures are logged, they do not interrupt the run.
+        """
+
+        try:
+            mq_channel = get_connection_manager(self._mq_hostname, self._port).channel()
+
+            for queue in self._queues:
+                depth = mq_channel.queue_declare(queue=queue, passive=True).method.message_count
+                self._metrics.gauge('queue.%s' % queue[len(self._sid) + 1:], depth)
+
+        except Exception as ex:
+            self._logger.exception('Queue depths not read, error: %s' % ex)
+
     def _setup_mqs(self):
         """
         **Purpose**: Setup RabbitMQ system on the client side. We instantiate queue(s) 'pendingq-*' for communication
@@ -544,9 +700,7 @@ class AppManager(object):
 
             self._logger.debug('Setting up mq connection and channel')
 
-            mq_connection = pika.BlockingConnection(pika.ConnectionParameters(host=self._mq_hostname, port=self._port))
-
-            mq_channel = mq_connection.channel()
+            mq_channel = get_connection_manager(self._mq_hostname, self._port).channel()
             self._logger.debug('Connection and channel setup successful')
             self._logger.debug('Setting up all exchanges and queues')
 
@@ -558,7 +712,8 @@ class AppManager(object):
                 '%s-sync-to-tmgr' % self._sid,
                 '%s-sync-to-cb' % self._sid,
                 '%s-sync-to-enq' % self._sid,
-                '%s-sync-to-deq' % self._sid
+                '%s-sync-to-deq' % self._sid,
+                '%s-pipeline-done' % self._sid
             ]
 
             for i in range(1, self._num_pending_qs + 1):
@@ -578,6 +733,8 @@ class AppManager(object):
                 f.write(q + '\n')
             f.close()
 
+            self._queues = qs
+
             self._logger.debug('All exchanges and queues are setup')
             self._prof.prof('mqs setup done', uid=self._uid)
 
@@ -592,8 +749,7 @@ class AppManager(object):
 
         try:
 
-            mq_connection = pika.BlockingConnection(pika.ConnectionParameters(host=self._mq_hostname, port=self._port))
-            mq_channel = mq_connection.channel()
+            mq_channel = get_connection_manager(self._mq_hostname, self._port).channel()
 
             mq_channel.queue_delete(queue='%s-tmgr-to-sync' % self._sid)
             mq_channel.queue_delete(queue='%s-cb-to-sync' % self._sid)
@@ -603,6 +759,7 @@ class AppManager(object):
             mq_channel.queue_delete(queue='%s-sync-to-cb' % self._sid)
             mq_channel.queue_delete(queue='%s-sync-to-enq' % self._sid)
             mq_channel.queue_delete(queue='%s-sync-to-deq' % self._sid)
+            mq_channel.queue_delete(queue='%s-pipeline-done' % self._sid)
 
             for i in range(1, self._num_pending_qs + 1):
                 queue_name = '%s-pendingq-%s' % (self._sid, i)
@@ -616,332 +773,272 @@ class AppManager(object):
             self._logger.exception('Message queues not deleted, error: %s' % ex)
             raise
 
-    def _synchronizer(self):
+    def _update_task(self, obj, full=True):
         """
-        **Purpose**: Thread in the master process to keep the workflow data
-        structure in appmanager up to date. We receive pipelines, stages and
-        tasks objects directly. The respective object is updated in this master
-        process.
-
-        Details: Important to note that acknowledgements of the type
-        channel.basic_ack() is an acknowledgement to the server that the msg
-        was received. This is not to be confused with the Ack sent to the
-        enqueuer/dequeuer/task_manager through the sync-ack queue.
+        **Purpose**: Apply a Task update, received as a dictionary, to the workflow of the AppManager. Only a 'full'
+        description can add a Task the AppManager does not know yet.
         """
 
-        try:
-
-            self._prof.prof('synchronizer started', uid=self._uid)
-
-            self._logger.info('synchronizer thread started')
-
-            def task_update(msg, reply_to, corr_id, mq_channel):
-
-                completed_task = Task()
-                completed_task.from_dict(msg['object'])
-                self._logger.info('Received %s with state %s' % (completed_task.uid, completed_task.state))
-
-                found_task = False
-
-                # Traverse the entire workflow to find the correct task
-                for pipe in self._workflow:
-
-                    if not pipe.completed:
-                        if completed_task.parent_pipeline['uid'] == pipe.uid:
-
-                            for stage in pipe.stages:
-
-                                if completed_task.parent_stage['uid'] == stage.uid:
-
-                                    for task in stage.tasks:
-
-                                        if (completed_task.uid == task.uid)and(completed_task.state != task.state):
-
-                                            task.state = str(completed_task.state)
-                                            self._logger.debug('Found task %s with state %s' %
-                                                               (task.uid, task.state))
-
-                                            if completed_task.path:
-                                                task.path = str(completed_task.path)
-
-                                            mq_channel.basic_publish(exchange='',
-                                                                     routing_key=reply_to,
-                                                                     properties=pika.BasicProperties(
-                                                                         correlation_id=corr_id),
-                                                                     body='%s-ack' % task.uid)
-
-                                            self._prof.prof('publishing sync ack for obj with state %s' %
-                                                            msg['object']['state'],
-                                                            uid=msg['object']['uid']
-                                                            )
-
-                                            mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
-                                            self._report.ok('Update: ')
-                                            self._report.info('Task %s in state %s\n' % (task.uid, task.state))
-
-                                            found_task = True
-
-                                    if not found_task:
+        completed_task = Task()
+        completed_task.from_dict(obj)
+        self._logger.debug('Received %s with state %s', completed_task.uid, completed_task.state)
 
-                                        # If there was a Stage update, but the Stage was not found in any of the Pipelines. This
-                                        # means that this was a Stage that was added during runtime and the AppManager does not
-                                        # know about it. The current solution is going to be: add it to the workflow object in the
-                                        # AppManager via the synchronizer.
+        # Find the parent pipeline and stage of the task via the uid map
+        pipe = self._uid_map.get(completed_task.parent_pipeline['uid'])
+        stage = self._uid_map.get(completed_task.parent_stage['uid'])
 
-                                        self._prof.prof('Adap: adding new task')
+        if (pipe is None) or (stage is None) or pipe.completed:
+            return
 
-                                        self._logger.info('Adding new task %s to parent stage: %s' % (completed_task.uid,
-                                                                                                      stage.uid))
+        task = self._uid_map.get(completed_task.uid)
 
-                                        stage.add_tasks(completed_task)
-                                        mq_channel.basic_publish(exchange='',
-                                                                 routing_key=reply_to,
-                                                                 properties=pika.BasicProperties(
-                                                                     correlation_id=corr_id),
-                                                                 body='%s-ack' % completed_task.uid)
+        if task is not None:
 
-                                        self._prof.prof('Adap: added new task')
+            if completed_task.state != task.state:
 
-                                        self._prof.prof('publishing sync ack for obj with state %s' %
-                                                        msg['object']['state'],
-                                                        uid=msg['object']['uid']
-                                                        )
+                task.state = str(completed_task.state)
+                self._logger.debug('Found task %s with state %s', task.uid, task.state)
 
-                                        mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
-                                        self._report.ok('Update: ')
-                                        self._report.info('Task %s in state %s\n' %
-                                                          (completed_task.uid, completed_task.state))
+                if completed_task.path:
+                    task.path = str(completed_task.path)
 
-            def stage_update(msg, reply_to, corr_id, mq_channel):
+                if self._workflow_writer and task.state in states.FINAL:
+                    self._workflow_writer.write('Task', task)
 
-                completed_stage = Stage()
-                completed_stage.from_dict(msg['object'])
-                self._logger.info('Received %s with state %s' % (completed_stage.uid, completed_stage.state))
+                self._updates.update('Task', task.uid, task.state)
 
-                found_stage = False
+            return
 
-                # Traverse the entire workflow to find the correct stage
-                for pipe in self._workflow:
+        if not full:
+            self._logger.error('Received delta update for unknown task %s, ignoring it' % completed_task.uid)
+            return
 
-                    if not pipe.completed:
+        # If there was a Task update, but the Task was not found in its Stage. This
+        # means that this was a Task that was added during runtime and the AppManager does not
+        # know about it. The current solution is going to be: add it to the workflow object in the
+        # AppManager via the synchronizer.
 
-                        if completed_stage.parent_pipeline['uid'] == pipe.uid:
-                            self._logger.info('Found parent pipeline: %s' % pipe.uid)
+        self._prof.prof('Adap: adding new task')
 
-                            for stage in pipe.stages:
+        self._logger.info('Adding new task %s to parent stage: %s' % (completed_task.uid, stage.uid))
 
-                                if (completed_stage.uid == stage.uid)and(completed_stage.state != stage.state):
+        stage.add_tasks(completed_task)
+        self._uid_map[completed_task.uid] = completed_task
 
-                                    self._logger.debug('Found stage %s' % stage.uid)
+        self._prof.prof('Adap: added new task')
 
-                                    stage.state = str(completed_stage.state)
+        self._updates.update('Task', completed_task.uid, completed_task.state)
 
-                                    mq_channel.basic_publish(exchange='',
-                                                             routing_key=reply_to,
-                                                             properties=pika.BasicProperties(
-                                                                 correlation_id=corr_id),
-                                                             body='%s-ack' % stage.uid)
+    def _update_stage(self, obj, full=True):
+        """
+        **Purpose**: Apply a Stage update, received as a dictionary, to the workflow of the AppManager. Only a 'full'
+        description can add a Stage the AppManager does not know yet.
+        """
 
-                                    self._prof.prof('publishing sync ack for obj with state %s' %
-                                                    msg['object']['state'],
-                                                    uid=msg['object']['uid']
-                                                    )
+        completed_stage = Stage()
+        completed_stage.from_dict(obj)
+        self._logger.debug('Received %s with state %s', completed_stage.uid, completed_stage.state)
 
-                                    mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
-                                    self._report.ok('Update: ')
-                                    self._report.info('Stage %s in state %s\n' % (stage.uid, stage.state))
+        # Find the parent pipeline of the stage via the uid map
+        pipe = self._uid_map.get(completed_stage.parent_pipeline['uid'])
 
-                                    found_stage = True
+        if (pipe is None) or pipe.completed:
+            return
 
-                            if not found_stage:
+        self._logger.debug('Found parent pipeline: %s', pipe.uid)
 
-                                # If there was a Stage update, but the Stage was not found in any of the Pipelines. This
-                                # means that this was a Stage that was added during runtime and the AppManager does not
-                                # know about it. The current solution is going to be: add it to the workflow object in the
-                                # AppManager via the synchronizer.
+        stage = self._uid_map.get(completed_stage.uid)
 
-                                self._prof.prof('Adap: adding new stage', uid=self._uid)
+        if stage is not None:
 
-                                self._logger.info('Adding new stage %s to parent pipeline: %s' % (completed_stage.uid,
-                                                                                                  pipe.uid))
+            if completed_stage.state != stage.state:
 
-                                pipe.add_stages(completed_stage)
-                                mq_channel.basic_publish(exchange='',
-                                                         routing_key=reply_to,
-                                                         properties=pika.BasicProperties(
-                                                             correlation_id=corr_id),
-                                                         body='%s-ack' % completed_stage.uid)
+                self._logger.debug('Found stage %s', stage.uid)
 
-                                self._prof.prof('Adap: adding new stage', uid=self._uid)
+                stage.state = str(completed_stage.state)
 
-                                self._prof.prof('publishing sync ack for obj with state %s' %
-                                                msg['object']['state'],
-                                                uid=msg['object']['uid']
-                                                )
+                if self._workflow_writer and stage.state in states.FINAL:
+                    self._workflow_writer.write('Stage', stage)
 
-                                mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
+                self._updates.update('Stage', stage.uid, stage.state)
 
-            def pipeline_update(msg, reply_to, corr_id, mq_channel):
+            return
 
-                completed_pipeline = Pipeline()
-                completed_pipeline.from_dict(msg['object'])
+        if not full:
+            self._logger.error('Received delta update for unknown stage %s, ignoring it' % completed_stage.uid)
+            return
 
-                self._logger.info('Received %s with state %s' % (completed_pipeline.uid, completed_pipeline.state))
+        # If there was a Stage update, but the Stage was not found in any of the Pipelines. This
+        # means that this was a Stage that was added during runtime and the AppManager does not
+        # know about it. The current solution is going to be: add it to the workflow object in the
+        # AppManager via the synchronizer.
 
-                # Traverse the entire workflow to find the correct pipeline
-                for pipe in self._workflow:
+        self._prof.prof('Adap: adding new stage', uid=self._uid)
 
-                    if not pipe.completed:
+        self._logger.info('Adding new stage %s to parent pipeline: %s' % (completed_stage.uid, pipe.uid))
 
-                        if (completed_pipeline.uid == pipe.uid)and(completed_pipeline.state != pipe.state):
+        pipe.add_stages(completed_stage)
+        self._uid_map[completed_stage.uid] = completed_stage
 
-                            pipe.state = str(completed_pipeline.state)
+        self._prof.prof('Adap: adding new stage', uid=self._uid)
 
-                            self._logger.info('Found pipeline %s, state %s, completed %s' % (pipe.uid,
-                                                                                             pipe.state,
-                                                                                             pipe.completed)
-                                              )
+    def _update_pipeline(self, obj):
+        """
+        **Purpose**: Apply a Pipeline update, received as a dictionary, to the workflow of the AppManager.
 
-                            # Reply with ack msg to the sender
-                            mq_channel.basic_publish(exchange='',
-                                                     routing_key=reply_to,
-                                                     properties=pika.BasicProperties(
-                                                         correlation_id=corr_id),
-                                                     body='%s-ack' % pipe.uid)
+        :return: the updated Pipeline if it has completed, None otherwise
+        """
 
-                            self._prof.prof('publishing sync ack for obj with state %s' %
-                                            msg['object']['state'],
-                                            uid=msg['object']['uid']
-                                            )
+        completed_pipeline = Pipeline()
+        completed_pipeline.from_dict(obj)
 
-                            mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
+        self._logger.debug('Received %s with state %s', completed_pipeline.uid, completed_pipeline.state)
 
-                            # Keep the assignment of the completed flag after sending the acknowledgment
-                            # back. Otherwise the MainThread takes lock over the pipeline because of logging
-                            # and profiling
-                            if completed_pipeline.completed:
-                                pipe._completed_flag.set()
-                            self._report.ok('Update: ')
-                            self._report.info('Pipeline %s in state %s\n' % (pipe.uid, pipe.state))
+        pipe = self._uid_map.get(completed_pipeline.uid)
 
-            mq_connection = pika.BlockingConnection(pika.ConnectionParameters(host=self._mq_hostname, port=self._port))
-            mq_channel = mq_connection.channel()
+        if (pipe is None) or pipe.completed:
+            return None
 
-            last = time.time()
+        if completed_pipeline.state != pipe.state:
 
-            while not self._terminate_sync.is_set():
+            pipe.state = str(completed_pipeline.state)
 
-                #-------------------------------------------------------------------------------------------------------
-                # Messages between tmgr Main thread and synchronizer -- only Task objects
+            self._logger.info('Found pipeline %s, state %s, completed %s', pipe.uid, pipe.state, pipe.completed)
 
-                method_frame, props, body = mq_channel.basic_get(queue='%s-tmgr-to-sync' % self._sid)
+            self._updates.update('Pipeline', pipe.uid, pipe.state)
 
-                """
-                The message received is a JSON object with the following structure:
+            if completed_pipeline.completed:
 
-                msg = {
-                        'type': 'Pipeline'/'Stage'/'Task',
-                        'object': json/dict
-                        }
-                """
+                if self._workflow_writer:
+                    self._workflow_writer.write('Pipeline', pipe)
 
-                if body:
+                return pipe
 
-                    msg = json.loads(body)
+        return None
 
-                    self._prof.prof('received obj with state %s for sync' %
-                                    msg['object']['state'], uid=msg['object']['uid'])
+    def _apply_sync_msg(self, msg):
+        """
+        **Purpose**: Apply all updates contained in one message received by the synchronizer. The message received is
+        a JSON object with one of the following structures:
 
-                    self._logger.debug('received %s with state %s for sync' %
-                                       (msg['object']['uid'], msg['object']['state']))
+        msg = {
+                'type': 'Pipeline'/'Stage'/'Task',
+                'object': json/dict
+                }
 
-                    if msg['type'] == 'Task':
-                        task_update(msg, '%s-sync-to-tmgr' % self._sid, props.correlation_id, mq_channel)
+        msg = {
+                'type': 'Pipeline'/'Stage'/'Task',
+                'objects': [json/dict, ...]
+                }
 
-                #-------------------------------------------------------------------------------------------------------
+        The second structure carries a bulk of updates of the same type which is applied and acknowledged as a unit.
+        Messages marked with 'delta': True carry compact updates (uid, parent uids, state and changed fields) of
+        objects the AppManager already knows, all other messages carry full object descriptions.
 
-                #-------------------------------------------------------------------------------------------------------
-                # Messages between callback thread and synchronizer -- only Task objects
+        :return: list of Pipelines that have completed with this message
+        """
 
-                method_frame, props, body = mq_channel.basic_get(queue='%s-cb-to-sync' % self._sid)
+        if 'objects' in msg:
+            objs = msg['objects']
+        else:
+            objs = [msg['object']]
 
-                """
-                The message received is a JSON object with the following structure:
+        full = not msg.get('delta', False)
+        completed_pipes = list()
 
-                msg = {
-                        'type': 'Pipeline'/'Stage'/'Task',
-                        'object': json/dict
-                        }
-                """
+        for obj in objs:
 
-                if body:
+            self._prof.prof('received obj with state %s for sync' % obj['state'], uid=obj['uid'])
 
-                    msg = json.loads(body)
+            self._logger.debug('received %s with state %s for sync', obj['uid'], obj['state'])
 
-                    self._prof.prof('received obj with state %s for sync' %
-                                    msg['object']['state'], uid=msg['object']['uid'])
+            if msg['type'] == 'Task':
+                self._update_task(obj, full)
 
-                    self._logger.debug('received %s with state %s for sync' %
-                                       (msg['object']['uid'], msg['object']['state']))
+            elif msg['type'] == 'Stage':
+                self._update_stage(obj, full)
 
-                    if msg['type'] == 'Task':
-                        task_update(msg, '%s-sync-to-cb' % self._sid, props.correlation_id, mq_channel)
+            elif msg['type'] == 'Pipeline':
+                pipe = self._update_pipeline(obj)
+                if pipe:
+                    completed_pipes.append(pipe)
 
-                #-------------------------------------------------------------------------------------------------------
+        return completed_pipes
 
-                #-------------------------------------------------------------------------------------------------------
-                # Messages between enqueue thread and synchronizer -- Task, Stage or Pipeline
-                method_frame, props, body = mq_channel.basic_get(queue='%s-enq-to-sync' % self._sid)
+    def _on_sync_msg(self, reply_to, mq_channel, method_frame, props, body):
+        """
+        **Purpose**: Consumer callback of the synchronizer. Applies the updates of one message and replies with an
+        ack msg to the sender, on the queue named in the reply_to property of the message if set, otherwise on the
+        'reply_to' queue.
+        """
 
-                if body:
+        with self._metrics.timer('sync.apply'):
+            completed_pipes = self._apply_sync_msg(json.loads(body))
 
-                    msg = json.loads(body)
+        # Reply with ack msg to the sender
+        mq_channel.basic_publish(exchange='',
+                                 routing_key=props.reply_to or reply_to,
+                                 properties=pika.BasicProperties(correlation_id=props.correlation_id),
+                                 body='ack')
 
-                    self._prof.prof('received obj with state %s for sync' %
-                                    msg['object']['state'], uid=msg['object']['uid'])
+        mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
 
-                    self._logger.debug('received %s with state %s for sync' %
-                                       (msg['object']['uid'], msg['object']['state']))
+        # Keep the assignment of the completed flag after sending the acknowledgment
+        # back. Otherwise the MainThread takes lock over the pipeline because of logging
+        # and profiling
+        for pipe in completed_pipes:
+            pipe._completed_flag.set()
 
-                    if msg['type'] == 'Task':
-                        task_update(msg, '%s-sync-to-enq' % self._sid, props.correlation_id, mq_channel)
+            # Placeholders are indexed by pipeline name: the entries of unnamed pipelines are all held under 'None',
+            # the completion of one of them does not make them evictable
+            if pipe.name is None:
+                continue
 
-                    elif msg['type'] == 'Stage':
-                        stage_update(msg, '%s-sync-to-enq' % self._sid, props.correlation_id, mq_channel)
+            # The tmgr can evict the placeholders of the pipeline
+            mq_channel.basic_publish(exchange='',
+                                     routing_key='%s-pipeline-done' % self._sid,
+                                     body=str(pipe.name))
 
-                    elif msg['type'] == 'Pipeline':
-                        pipeline_update(msg, '%s-sync-to-enq' % self._sid, props.correlation_id, mq_channel)
-                #-------------------------------------------------------------------------------------------------------
+    def _synchronizer(self):
+        """
+        **Purpose**: Thread in the master process to keep the workflow data
+        structure in appmanager up to date. We receive pipelines, stages and
+        tasks objects directly. The respective object is updated in this master
+        process.
 
-                #-------------------------------------------------------------------------------------------------------
-                # Messages between dequeue thread and synchronizer -- Task, Stage or Pipeline
-                method_frame, props, body = mq_channel.basic_get(queue='%s-deq-to-sync' % self._sid)
+        Details: Important to note that acknowledgements of the type
+        channel.basic_ack() is an acknowledgement to the server that the msg
+        was received. This is not to be confused with the Ack sent to the
+        enqueuer/dequeuer/task_manager through the sync-ack queue.
+        """
 
-                if body:
+        try:
 
-                    msg = json.loads(body)
+            self._prof.prof('synchronizer started', uid=self._uid)
 
-                    self._prof.prof('received obj with state %s for sync' %
-                                    msg['object']['state'], uid=msg['object']['uid'])
+            self._logger.info('synchronizer thread started')
 
-                    self._logger.debug('received %s with state %s for sync' %
-                                       (msg['object']['uid'], msg['object']['state']))
+            mq = get_connection_manager(self._mq_hostname, self._port)
+            mq_connection = mq.connection()
+            mq_channel = mq.channel()
+            mq_channel.basic_qos(prefetch_count=PREFETCH_COUNT)
 
-                    if msg['type'] == 'Task':
-                        task_update(msg, '%s-sync-to-deq' % self._sid, props.correlation_id, mq_channel)
+            # Messages between tmgr Main thread and synchronizer -- only Task objects
+            # Messages between callback thread and synchronizer -- only Task objects
+            # Messages between enqueue thread and synchronizer -- Task, Stage or Pipeline
+            # Messages between dequeue thread and synchronizer -- Task, Stage or Pipeline
+            sync_qs = [('%s-tmgr-to-sync' % self._sid, '%s-sync-to-tmgr' % self._sid),
+                       ('%s-cb-to-sync' % self._sid, '%s-sync-to-cb' % self._sid),
+                       ('%s-enq-to-sync' % self._sid, '%s-sync-to-enq' % self._sid),
+                       ('%s-deq-to-sync' % self._sid, '%s-sync-to-deq' % self._sid)]
 
-                    elif msg['type'] == 'Stage':
-                        stage_update(msg, '%s-sync-to-deq' % self._sid, props.correlation_id, mq_channel)
+            for queue, reply_to in sync_qs:
+                mq_channel.basic_consume(partial(self._on_sync_msg, reply_to), queue=queue)
 
-                    elif msg['type'] == 'Pipeline':
-                        pipeline_update(msg, '%s-sync-to-deq' % self._sid, props.correlation_id, mq_channel)
-                #-------------------------------------------------------------------------------------------------------
+            while not self._terminate_sync.is_set():
 
-                # Appease pika cos it thinks the connection is dead
-                now = time.time()
-                if now - last >= self._rmq_ping_interval:
-                    mq_connection.process_data_events()
-                    last = now
+                # Sleep until messages arrive, they are handled by _on_sync_msg
+                mq_connection.process_data_events(time_limit=CONSUME_TIMEOUT)
 
             self._prof.prof('terminating synchronizer', uid=self._uid)
 
@@ -957,4 +1054,12 @@ class AppManager(object):
             self._logger.exception('Unknown error in synchronizer: %s. \n Terminating thread' % ex)
             raise
 
-    # ------------------------------------------------------------------------------------------------------------------
+        finally:
+
+            # Unacknowledged messages of the consumers are requeued for a restarted synchronizer
+            try:
+                mq.close()
+            except:
+                self._logger.warning('mq_connection not created')
+
+    # ------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
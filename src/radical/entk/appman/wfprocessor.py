@@ -4,15 +4,23 @@ __license__ = "MIT"
 
 import radical.utils as ru
 from radical.entk.exceptions import *
+from radical.entk.utils.bin_profiler import get_profiler
 from multiprocessing import Process, Event
 from radical.entk import states, Pipeline, Task
-from radical.entk.utils.init_transition import transition
+from radical.entk.utils.init_transition import transition, bulk_transition
+from radical.entk.utils.sync_initiator import SyncInitiator
+from radical.entk.utils.codec import encode_tasks, decode_tasks
+from radical.entk.utils.mq_utils import CONSUME_TIMEOUT, PREFETCH_COUNT, get_connection_manager, select_queue
+from radical.entk.utils.metrics import Metrics
+from radical.entk.utils.log_utils import log_enabled
 import time
 from time import sleep
 import json
+import Queue
 import threading
 import pika
 import traceback
+import logging
 import os
 import uuid
 import time
@@ -33,6 +41,7 @@ class WFprocessor(object):
         :mq_hostname: (str) hostname where the RabbitMQ is alive
         :port: (int) port at which RabbitMQ can be accessed
         :resubmit_failed: (bool) True if failed tasks need to be resubmitted automatically
+        :dequeue_workers: (int) number of workers processing the tasks of each completed queue
     """
 
     def __init__(self,
@@ -42,7 +51,8 @@ class WFprocessor(object):
                  completed_queue,
                  mq_hostname,
                  port,
-                 resubmit_failed):
+                 resubmit_failed,
+                 dequeue_workers=1):
 
         # Mandatory arguments
         self._sid = sid
@@ -51,22 +61,33 @@ class WFprocessor(object):
         self._mq_hostname = mq_hostname
         self._port = port
         self._resubmit_failed = resubmit_failed
+        self._dequeue_workers = dequeue_workers
 
         # Assign validated workflow
         self._workflow = workflow
 
+        # uid --> Pipeline/Stage/Task of the workflow
+        self._uid_map = dict()
+
+        # Pipelines with a stage that might have become executable, fed by the dequeue thread
+        self._ready_pipes = Queue.Queue()
+
         # Create logger and profiler at their specific locations using the sid
         self._uid = ru.generate_id('wfprocessor.%(item_counter)04d', ru.ID_CUSTOM, namespace=self._sid)
         self._path = os.getcwd() + '/' + self._sid
         self._logger = ru.Logger('radical.entk.%s' %
                                  self._uid, path=self._path, targets=['2', '.'])
-        self._prof = ru.Profiler(name='radical.entk.%s' % self._uid + '-obj', path=self._path)
+        self._prof = get_profiler(name='radical.entk.%s' % self._uid + '-obj', path=self._path)
+
+        # Live latencies of the wfp process, dumped while it runs
+        self._metrics = Metrics(name='radical.entk.%s' % self._uid + '-proc', path=self._path)
 
         self._prof.prof('create wfp obj', uid=self._uid)
 
         # Defaults
         self._wfp_process = None
         self._rmq_ping_interval = os.getenv('RMQ_PING_INTERVAL', 10)
+        self._idle_sleep = float(os.getenv('ENTK_IDLE_SLEEP', 0.1))
 
         self._logger.info('Created WFProcessor object: %s' % self._uid)
         self._prof.prof('wfp obj created', uid=self._uid)
@@ -78,6 +99,10 @@ class WFprocessor(object):
     def workflow(self):
         return self._workflow
 
+    @property
+    def uid_map(self):
+        return self._uid_map
+
     # ------------------------------------------------------------------------------------------------------------------
     # Private Methods
     # ------------------------------------------------------------------------------------------------------------------
@@ -92,7 +117,7 @@ class WFprocessor(object):
             self._prof.prof('initializing workflow', uid=self._uid)
 
             for p in self._workflow:
-                p._assign_uid(self._sid)
+                p._assign_uid(self._sid, self._uid_map)
 
             self._prof.prof('workflow initialized', uid=self._uid)
 
@@ -100,6 +125,45 @@ class WFprocessor(object):
             self._logger.exception('Fatal error while initializing workflow: %s' % ex)
             raise
 
+    def _register_workflow(self):
+        """
+        **Purpose**: Fill the uid map from a workflow whose uids have already been assigned
+        """
+
+        for pipe in self._workflow:
+            self._uid_map[pipe.uid] = pipe
+            for stage in pipe.stages:
+                self._uid_map[stage.uid] = stage
+                for task in stage.tasks:
+                    self._uid_map[task.uid] = task
+
+    def _get_ready_pipes(self):
+        """
+        **Purpose**: Block until a pipeline is ready or CONSUME_TIMEOUT expires. Return all ready pipelines, in the
+        order in which they became ready and without duplicates.
+        """
+
+        try:
+            pipe = self._ready_pipes.get(timeout=CONSUME_TIMEOUT)
+        except Queue.Empty:
+            return []
+
+        ready_pipes = [pipe]
+        ready_uids = set([pipe.uid])
+
+        while True:
+
+            try:
+                pipe = self._ready_pipes.get_nowait()
+            except Queue.Empty:
+                break
+
+            if pipe.uid not in ready_uids:
+                ready_pipes.append(pipe)
+                ready_uids.add(pipe.uid)
+
+        return ready_pipes
+
     def _enqueue(self, local_prof):
         """
         **Purpose**: This is the function that is run in the enqueue thread. This function extracts Tasks from the
@@ -117,22 +181,45 @@ class WFprocessor(object):
             self._logger.info('enqueue-thread started')
 
             # Acquire a connection+channel to the rmq server
-            mq_connection = pika.BlockingConnection(pika.ConnectionParameters(host=self._mq_hostname, port=self._port))
-            mq_channel = mq_connection.channel()
+            mq = get_connection_manager(self._mq_hostname, self._port)
+            mq_connection = mq.connection()
+            mq_channel = mq.channel()
+
+            # State updates are pipelined, we only wait for the AppManager
+            # before handing tasks over to the tmgr
+            syncer = SyncInitiator(channel=mq_channel,
+                                   queue='%s-enq-to-sync' % self._sid,
+                                   logger=self._logger,
+                                   profiler=local_prof,
+                                   metrics=self._metrics)
+
+            # Every pipeline is looked at once, afterwards only when the
+            # dequeue thread reports that one of its stages may be executable
+            for pipe in self._workflow:
+                self._ready_pipes.put(pipe)
+
+            bulk_cnt = 0
 
-            last = time.time()
             while not self._enqueue_thread_terminate.is_set():
 
                 '''
-                We iterate through all pipelines to collect tasks from
-                stages that are pending scheduling. Once collected, these tasks
-                will be communicated to the tmgr in bulk.
+                We iterate through the pipelines that became ready to collect
+                tasks from stages that are pending scheduling. Once collected,
+                these tasks will be communicated to the tmgr in bulk.
                 '''
 
+                ready_pipes = self._get_ready_pipes()
+
+                if not ready_pipes:
+
+                    # Keep the connection alive while idle
+                    mq_connection.process_data_events()
+                    continue
+
                 workload = []
                 scheduled_stages = []
 
-                for pipe in self._workflow:
+                for pipe in ready_pipes:
 
                     with pipe.lock:
 
@@ -151,14 +238,19 @@ class WFprocessor(object):
                                            channel=mq_channel,
                                            queue='%s-enq-to-sync' % self._sid,
                                            profiler=local_prof,
-                                           logger=self._logger)
+                                           logger=self._logger,
+                                           syncer=syncer)
 
                             executable_stage = pipe.stages[pipe.current_stage - 1]
 
                             if not executable_stage.uid:
                                 executable_stage.parent_pipeline['uid'] = pipe.uid
                                 executable_stage.parent_pipeline['name'] = pipe.name
-                                executable_stage._assign_uid(self._sid)
+                                executable_stage._assign_uid(self._sid, self._uid_map)
+
+                                # Stage was added at runtime, the AppManager learns about it from its first updates
+                                syncer.require_full([executable_stage.uid] +
+                                                    [task.uid for task in executable_stage.tasks])
 
                             if executable_stage.state in [states.INITIAL, states.SCHEDULED]:
 
@@ -170,7 +262,8 @@ class WFprocessor(object):
                                                channel=mq_channel,
                                                queue='%s-enq-to-sync' % self._sid,
                                                profiler=local_prof,
-                                               logger=self._logger)
+                                               logger=self._logger,
+                                               syncer=syncer)
 
                                 executable_tasks = executable_stage.tasks
 
@@ -179,15 +272,6 @@ class WFprocessor(object):
                                     if (executable_task.state == states.INITIAL)or \
                                             ((executable_task.state == states.FAILED)and(self._resubmit_failed)):
 
-                                        # Set state of Tasks in current Stage to SCHEDULING
-                                        transition(obj=executable_task,
-                                                   obj_type='Task',
-                                                   new_state=states.SCHEDULING,
-                                                   channel=mq_channel,
-                                                   queue='%s-enq-to-sync' % self._sid,
-                                                   profiler=local_prof,
-                                                   logger=self._logger)
-
                                         # task_as_dict = json.dumps(executable_task.to_dict())
                                         workload.append(executable_task)
 
@@ -196,52 +280,70 @@ class WFprocessor(object):
 
                 if workload:
 
+                    bulk_start = time.time()
+
+                    # Set state of Tasks in current Stage to SCHEDULING
+                    bulk_transition(objs=workload,
+                                    obj_type='Task',
+                                    new_state=states.SCHEDULING,
+                                    channel=mq_channel,
+                                    queue='%s-enq-to-sync' % self._sid,
+                                    profiler=local_prof,
+                                    logger=self._logger,
+                                    syncer=syncer)
+
                     # Put the task on one of the pending_queues
-                    workload_as_dict = list()
-                    for task in workload:
-                        workload_as_dict.append(task.to_dict())
-                    workload_as_dict = json.dumps(workload_as_dict)
+                    workload_msg = encode_tasks(workload)
+
+                    # Set state of Tasks in current Stage to SCHEDULED
+                    bulk_transition(objs=workload,
+                                    obj_type='Task',
+                                    new_state=states.SCHEDULED,
+                                    channel=mq_channel,
+                                    queue='%s-enq-to-sync' % self._sid,
+                                    profiler=local_prof,
+                                    logger=self._logger,
+                                    syncer=syncer)
+
+                    # The AppManager needs to have seen the tasks as SCHEDULED
+                    # before the tmgr can move them any further
+                    syncer.flush()
+
+                    # Bulks are distributed round-robin over the pending queues
+                    pending_queue = self._pending_queue[bulk_cnt % len(self._pending_queue)]
+                    bulk_cnt += 1
 
                     mq_channel.basic_publish(exchange='',
-                                             routing_key=self._pending_queue[0],
-                                             body=workload_as_dict
+                                             routing_key=pending_queue,
+                                             body=workload_msg
                                              # properties=pika.BasicProperties(
                                              # make message persistent
                                              # delivery_mode = 2)
                                              )
 
-                    for task in workload:
+                    self._logger.info('%s tasks published to pending queue %s', len(workload), pending_queue)
 
-                        # Set state of Tasks in current Stage to SCHEDULED
-                        transition(obj=task,
-                                   obj_type='Task',
-                                   new_state=states.SCHEDULED,
-                                   channel=mq_channel,
-                                   queue='%s-enq-to-sync' % self._sid,
-                                   profiler=local_prof,
-                                   logger=self._logger)
+                    if log_enabled(self._logger, logging.DEBUG):
+                        for task in workload:
+                            self._logger.debug('Task %s published to pending queue %s', task.uid, pending_queue)
 
-                        self._logger.debug('Task %s published to pending queue' % task.uid)
+                    self._metrics.observe('enqueue.bulk', time.time() - bulk_start)
 
                 if scheduled_stages:
-                    for executable_stage in scheduled_stages:
 
-                        transition(obj=executable_stage,
-                                   obj_type='Stage',
-                                   new_state=states.SCHEDULED,
-                                   channel=mq_channel,
-                                   queue='%s-enq-to-sync' % self._sid,
-                                   profiler=local_prof,
-                                   logger=self._logger)
+                    bulk_transition(objs=scheduled_stages,
+                                    obj_type='Stage',
+                                    new_state=states.SCHEDULED,
+                                    channel=mq_channel,
+                                    queue='%s-enq-to-sync' % self._sid,
+                                    profiler=local_prof,
+                                    logger=self._logger,
+                                    syncer=syncer)
 
-                # Appease pika cos it thinks the connection is dead
-                now = time.time()
-                if now - last >= self._rmq_ping_interval:
-                    mq_connection.process_data_events()
-                    last = now
+                syncer.flush()
 
             self._logger.info('Enqueue thread terminated')
-            mq_connection.close()
+            mq.close()
 
             local_prof.prof('terminating enqueue-thread', uid=self._uid)
 
@@ -250,7 +352,7 @@ class WFprocessor(object):
             self._logger.error('Execution interrupted by user (you probably hit Ctrl+C), ' +
                                'trying to cancel enqueuer thread gracefully...')
 
-            mq_connection.close()
+            mq.close()
 
             raise KeyboardInterrupt
 
@@ -258,228 +360,369 @@ class WFprocessor(object):
 
             self._logger.exception('Error in enqueue-thread: %s' % ex)
             try:
-                mq_connection.close()
+                mq.close()
             except:
                 self._logger.warning('mq_connection not created')
 
             raise
 
-    def _dequeue(self, local_prof):
+    def _dequeue(self, local_prof, completed_queue=None):
         """
         **Purpose**: This is the function that is run in the dequeue thread. This function extracts Tasks from the
-        completed queus and updates the copy of workflow that exists in the WFprocessor object.
+        completed queue 'completed_queue' (by default the first completed queue) and updates the copy of workflow
+        that exists in the WFprocessor object. There is one dequeue thread per completed queue.
         Since this thread works on the copy of the workflow, every state update to the Task, Stage and Pipeline is
         communicated back to the AppManager (master process) via the 'sync_with_master' function that has dedicated
         queues to communicate with the master.
 
+        The completed tasks are processed by a pool of dequeue workers, partitioned by the uid of their pipeline: the
+        completions of different pipelines are processed concurrently, the completions of one pipeline in order by the
+        same worker. A message on the completed queue holds one task or a list of tasks. The dequeue thread only
+        consumes the completed queue and acknowledges a message once the workers have processed all its tasks.
+
         Details: Termination condition of this thread is set by the wfp process.
         """
 
+        workers = list()
+        workers_terminate = threading.Event()
+
         try:
 
             local_prof.prof('dequeue-thread started', uid=self._uid)
             self._logger.info('Dequeue thread started')
 
-            mq_connection = pika.BlockingConnection(pika.ConnectionParameters(host=self._mq_hostname, port=self._port))
-            mq_channel = mq_connection.channel()
+            mq = get_connection_manager(self._mq_hostname, self._port)
+            mq_connection = mq.connection()
+            mq_channel = mq.channel()
+            mq_channel.basic_qos(prefetch_count=PREFETCH_COUNT)
+
+            if not completed_queue:
+                completed_queue = self._completed_queue[0]
+
+            # Delivery tags of the processed tasks, handed back by the workers
+            done_queue = Queue.Queue()
+            work_queues = list()
+
+            for cnt in range(self._dequeue_workers):
 
-            last = time.time()
+                work_queue = Queue.Queue()
+                worker = threading.Thread(target=self._dequeue_worker,
+                                          args=(local_prof, work_queue, done_queue, workers_terminate),
+                                          name='dequeue-worker-%s' % cnt)
+                worker.start()
+
+                work_queues.append(work_queue)
+                workers.append(worker)
+
+            # Number of tasks of each message handed to the workers but not yet processed
+            in_progress = dict()
+
+            def on_completed_task(ch, method_frame, props, body):
+
+                # A message holds one completed task or a list of them
+                tasks = decode_tasks(body)
+
+                if not tasks:
+                    ch.basic_ack(delivery_tag=method_frame.delivery_tag)
+                    return
+
+                in_progress[method_frame.delivery_tag] = len(tasks)
+
+                for completed_task in tasks:
+
+                    self._logger.debug('Got finished task %s from queue', completed_task.uid)
+
+                    work_queue = select_queue(work_queues, completed_task.parent_pipeline['uid'])
+                    work_queue.put((method_frame.delivery_tag, completed_task))
+
+            mq_channel.basic_consume(on_completed_task, queue=completed_queue)
 
             while not self._dequeue_thread_terminate.is_set():
 
-                try:
+                # Sleep until completed tasks arrive. While workers are busy, wake up
+                # frequently to acknowledge what they processed.
+                if in_progress:
+                    mq_connection.process_data_events(time_limit=0.01)
+                else:
+                    mq_connection.process_data_events(time_limit=CONSUME_TIMEOUT)
 
-                    method_frame, header_frame, body = mq_channel.basic_get(queue=self._completed_queue[0])
+                while True:
 
-                    if body:
+                    try:
+                        delivery_tag = done_queue.get_nowait()
+                    except Queue.Empty:
+                        break
 
-                        # Get task from the message
-                        completed_task = Task()
-                        completed_task.from_dict(json.loads(body))
-                        self._logger.info('Got finished task %s from queue' % (completed_task.uid))
+                    # Acknowledge a message once all its tasks are processed
+                    in_progress[delivery_tag] -= 1
+                    if not in_progress[delivery_tag]:
+                        del in_progress[delivery_tag]
+                        mq_channel.basic_ack(delivery_tag=delivery_tag)
 
-                        transition(obj=completed_task,
-                                   obj_type='Task',
-                                   new_state=states.DEQUEUEING,
-                                   channel=mq_channel,
+                for worker in workers:
+                    if not worker.is_alive():
+                        raise EnTKError('Dequeue worker %s died' % worker.name)
+
+            self._logger.info('Terminated dequeue thread')
+            mq.close()
+
+            local_prof.prof('terminating dequeue-thread', uid=self._uid)
+
+        except KeyboardInterrupt:
+
+            self._logger.error('Execution interrupted by user (you probably hit Ctrl+C), ' +
+                               'trying to exit gracefully...')
+
+            mq.close()
+
+            raise KeyboardInterrupt
+
+        except Exception, ex:
+            self._logger.exception('Error in dequeue-thread: %s' % ex)
+
+            try:
+                mq.close()
+            except:
+                self._logger.warning('mq_connection not created')
+
+            raise EnTKError(text=ex)
+
+        finally:
+
+            # Unacknowledged completed tasks are requeued once the connection is closed
+            workers_terminate.set()
+            for worker in workers:
+                worker.join()
+
+    def _dequeue_worker(self, local_prof, work_queue, done_queue, terminate):
+        """
+        **Purpose**: This is the function that is run in the dequeue worker threads. A worker processes the completed
+        tasks put on its 'work_queue' by the dequeue thread, in order, and hands the delivery tag of the message of each
+        processed task back via 'done_queue'. Every worker has its own connection to communicate with the master.
+        """
+
+        try:
+
+            mq = get_connection_manager(self._mq_hostname, self._port)
+            mq_connection = mq.connection()
+            mq_channel = mq.channel()
+
+            # State updates are pipelined, we only wait for the AppManager
+            # before acknowledging a completed task. All workers publish
+            # to the same queue, each receives its acks privately.
+            syncer = SyncInitiator(channel=mq_channel,
                                    queue='%s-deq-to-sync' % self._sid,
+                                   logger=self._logger,
                                    profiler=local_prof,
-                                   logger=self._logger)
+                                   metrics=self._metrics)
 
-                        # Traverse the entire workflow to find out the correct Task
-                        for pipe in self._workflow:
+            while not terminate.is_set():
 
-                            with pipe.lock:
+                try:
+                    delivery_tag, completed_task = work_queue.get(timeout=CONSUME_TIMEOUT)
+
+                except Queue.Empty:
+
+                    # Keep the connection alive while idle
+                    mq_connection.process_data_events()
+                    continue
 
-                                if not pipe.completed:
+                with self._metrics.timer('dequeue.task'):
 
-                                    if completed_task.parent_pipeline['uid'] == pipe.uid:
+                    pipe = self._dequeue_task(completed_task, mq_channel, syncer, local_prof)
 
-                                        self._logger.debug('Found parent pipeline: %s' % pipe.uid)
+                    # Do not acknowledge the completed task before the AppManager has seen all its updates
+                    syncer.flush()
+                done_queue.put(delivery_tag)
 
-                                        for stage in pipe.stages:
+                # Hand the pipeline over to the enqueuer only once the AppManager
+                # has seen the completion of its previous stage
+                if pipe:
+                    self._ready_pipes.put(pipe)
 
-                                            if completed_task.parent_stage['uid'] == stage.uid:
-                                                self._logger.debug('Found parent stage: %s' % (stage.uid))
+            mq.close()
 
-                                                transition(obj=completed_task,
-                                                           obj_type='Task',
-                                                           new_state=states.DEQUEUED,
-                                                           channel=mq_channel,
-                                                           queue='%s-deq-to-sync' % self._sid,
-                                                           profiler=local_prof,
-                                                           logger=self._logger)
+        except Exception, ex:
 
-                                                if completed_task.exit_code:
-                                                    completed_task.state = states.FAILED
-                                                else:
-                                                    completed_task.state = states.DONE
+            self._logger.exception('Error in dequeue worker: %s' % ex)
 
-                                                for task in stage.tasks:
+            try:
+                mq.close()
+            except:
+                self._logger.warning('mq_connection not created')
 
-                                                    if task.uid == completed_task.uid:
-                                                        task.state = str(completed_task.state)
+            raise
 
-                                                        if (task.state == states.FAILED) and (self._resubmit_failed):
-                                                            task.state = states.INITIAL
+    def _dequeue_task(self, completed_task, mq_channel, syncer, local_prof):
+        """
+        **Purpose**: Process one completed task: update the task, its stage and its pipeline in the copy of the
+        workflow and execute the post-exec of a completed stage.
 
-                                                        transition(obj=task,
-                                                                   obj_type='Task',
-                                                                   new_state=task.state,
-                                                                   channel=mq_channel,
-                                                                   queue='%s-deq-to-sync' % self._sid,
-                                                                   profiler=local_prof,
-                                                                   logger=self._logger)
+        :return: the parent Pipeline if one of its stages may have become executable, None otherwise
+        """
 
-                                                        if stage._check_stage_complete():
+        transition(obj=completed_task,
+                   obj_type='Task',
+                   new_state=states.DEQUEUEING,
+                   channel=mq_channel,
+                   queue='%s-deq-to-sync' % self._sid,
+                   profiler=local_prof,
+                   logger=self._logger,
+                   syncer=syncer)
 
-                                                            transition(obj=stage,
-                                                                       obj_type='Stage',
-                                                                       new_state=states.DONE,
-                                                                       channel=mq_channel,
-                                                                       queue='%s-deq-to-sync' % self._sid,
-                                                                       profiler=local_prof,
-                                                                       logger=self._logger)
+        # Set if one of the stages of the pipeline may have become executable
+        pipe_ready = False
 
-                                                            # Check if Stage has a post-exec that needs to be
-                                                            # executed
+        # Resolve the Task and its parents through the uid map
+        pipe = self._uid_map.get(completed_task.parent_pipeline['uid'])
+        stage = self._uid_map.get(completed_task.parent_stage['uid'])
+        task = self._uid_map.get(completed_task.uid)
 
-                                                            if stage.post_exec['condition']:
+        if (pipe is None) or (stage is None) or (task is None):
+            self._logger.error('Task %s or one of its parents not found in workflow' %
+                               completed_task.uid)
 
-                                                                try:
+        else:
 
-                                                                    self._logger.info(
-                                                                        'Executing post-exec for stage %s' % stage.uid)
-                                                                    self._prof.prof('Adap: executing post-exec', 
-                                                                        uid=self._uid)
+            with pipe.lock:
 
-                                                                    func_condition = stage.post_exec['condition']
-                                                                    func_on_true = stage.post_exec['on_true']
-                                                                    func_on_false = stage.post_exec['on_false']
+                if not pipe.completed:
 
-                                                                    if func_condition():
-                                                                        func_on_true()
-                                                                    else:
-                                                                        func_on_false()
+                    transition(obj=completed_task,
+                               obj_type='Task',
+                               new_state=states.DEQUEUED,
+                               channel=mq_channel,
+                               queue='%s-deq-to-sync' % self._sid,
+                               profiler=local_prof,
+                               logger=self._logger,
+                               syncer=syncer)
 
-                                                                    self._logger.info(
-                                                                        'Post-exec executed for stage %s' % stage.uid)
-                                                                    self._prof.prof('Adap: post-exec executed', uid=self._uid)
+                    if completed_task.exit_code:
+                        completed_task.state = states.FAILED
+                    else:
+                        completed_task.state = states.DONE
 
-                                                                except Exception, ex:
-                                                                    self._logger.exception(
-                                                                        'Execution failed in post_exec of stage %s' % stage.uid)
-                                                                    raise
+                    task.state = str(completed_task.state)
 
-                                                            pipe._increment_stage()
+                    if (task.state == states.FAILED) and (self._resubmit_failed):
+                        task.state = states.INITIAL
 
-                                                            if pipe.completed:
+                    # A resubmitted task is picked up by the enqueuer, whose
+                    # updates travel on a different queue: block until the
+                    # AppManager has seen the reset
+                    transition(obj=task,
+                               obj_type='Task',
+                               new_state=task.state,
+                               channel=mq_channel,
+                               queue='%s-deq-to-sync' % self._sid,
+                               profiler=local_prof,
+                               logger=self._logger,
+                               syncer=syncer,
+                               blocking=(task.state == states.INITIAL))
 
-                                                                transition(obj=pipe,
-                                                                           obj_type='Pipeline',
-                                                                           new_state=states.DONE,
-                                                                           channel=mq_channel,
-                                                                           queue='%s-deq-to-sync' % self._sid,
-                                                                           profiler=local_prof,
-                                                                           logger=self._logger)
+                    if task.state == states.INITIAL:
+                        pipe_ready = True
 
-                                                        # Found the task and processed it -- no more iterations needed
+                    if stage._check_stage_complete():
 
-                                                        break
+                        transition(obj=stage,
+                                   obj_type='Stage',
+                                   new_state=states.DONE,
+                                   channel=mq_channel,
+                                   queue='%s-deq-to-sync' % self._sid,
+                                   profiler=local_prof,
+                                   logger=self._logger,
+                                   syncer=syncer)
 
-                                                # Found the stage and processed it -- no more iterations neeeded
-                                                break
+                        # Check if Stage has a post-exec that needs to be
+                        # executed
 
-                                        # Found the pipeline and processed it -- no more iterations neeeded
-                                        break
+                        if stage.post_exec['condition']:
 
-                        mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
+                            try:
 
-                    # Appease pika cos it thinks the connection is dead
-                    now = time.time()
-                    if now - last >= self._rmq_ping_interval:
-                        mq_connection.process_data_events()
-                        last = now
+                                self._logger.info(
+                                    'Executing post-exec for stage %s' % stage.uid)
+                                self._prof.prof('Adap: executing post-exec', 
+                                    uid=self._uid)
 
-                except Exception, ex:
-                    self._logger.error('Unable to receive message from completed queue: %s' % ex)
-                    raise
+                                func_condition = stage.post_exec['condition']
+                                func_on_true = stage.post_exec['on_true']
+                                func_on_false = stage.post_exec['on_false']
 
-            self._logger.info('Terminated dequeue thread')
-            mq_connection.close()
+                                if func_condition():
+                                    func_on_true()
+                                else:
+                                    func_on_false()
 
-            local_prof.prof('terminating dequeue-thread', uid=self._uid)
+                                self._logger.info(
+                                    'Post-exec executed for stage %s' % stage.uid)
+                                self._prof.prof('Adap: post-exec executed', uid=self._uid)
 
-        except KeyboardInterrupt:
+                            except Exception, ex:
+                                self._logger.exception(
+                                    'Execution failed in post_exec of stage %s' % stage.uid)
+                                raise
 
-            self._logger.error('Execution interrupted by user (you probably hit Ctrl+C), ' +
-                               'trying to exit gracefully...')
+                        pipe._increment_stage()
 
-            mq_connection.close()
+                        if pipe.completed:
 
-            raise KeyboardInterrupt
+                            transition(obj=pipe,
+                                       obj_type='Pipeline',
+                                       new_state=states.DONE,
+                                       channel=mq_channel,
+                                       queue='%s-deq-to-sync' % self._sid,
+                                       profiler=local_prof,
+                                       logger=self._logger,
+                                       syncer=syncer)
 
-        except Exception, ex:
-            self._logger.exception('Error in dequeue-thread: %s' % ex)
+                        else:
+                            pipe_ready = True
 
-            try:
-                mq_connection.close()
-            except:
-                self._logger.warning('mq_connection not created')
+        if pipe_ready:
+            return pipe
 
-            raise EnTKError(text=ex)
+        return None
 
     def _wfp(self):
         """
         **Purpose**: This is the function executed in the wfp process. The function is used to simply create
-        and spawn two threads: enqueue, dequeue. The enqueue thread pushes ready tasks to the queues in the pending_q slow
-        list whereas the dequeue thread pulls completed tasks from the queues in the completed_q. This function is also
-        responsible for the termination of these threads and hence blocking.
+        and spawn the threads: one enqueue thread and one dequeue thread per completed queue. The enqueue thread pushes
+        ready tasks to the queues in the pending_q list whereas the dequeue threads pull completed tasks from the queues
+        in the completed_q. This function is also responsible for the termination of these threads and hence blocking.
         """
 
         try:
 
-            local_prof = ru.Profiler(name='radical.entk.%s' % self._uid + '-proc', path=self._path)
+            local_prof = get_profiler(name='radical.entk.%s' % self._uid + '-proc', path=self._path)
 
             local_prof.prof('wfp process started', uid=self._uid)
 
             self._logger.info('WFprocessor started')
+            self._metrics.start()
 
             # Process should run till terminate condtion is encountered
             while (not self._wfp_terminate.is_set()):
 
                 try:
 
-                    # Start dequeue thread
-                    if (not self._dequeue_thread) or (not self._dequeue_thread.is_alive()):
+                    # Start one dequeue thread per completed queue
+                    if not self._dequeue_threads:
+                        self._dequeue_threads = [None] * len(self._completed_queue)
+
+                    for cnt, completed_queue in enumerate(self._completed_queue):
 
-                        local_prof.prof('creating dequeue-thread', uid=self._uid)
-                        self._dequeue_thread = threading.Thread(
-                            target=self._dequeue, args=(local_prof,), name='dequeue-thread')
+                        if (not self._dequeue_threads[cnt]) or (not self._dequeue_threads[cnt].is_alive()):
 
-                        self._logger.info('Starting dequeue-thread')
-                        local_prof.prof('starting dequeue-thread', uid=self._uid)
-                        self._dequeue_thread.start()
+                            local_prof.prof('creating dequeue-thread', uid=self._uid)
+                            self._dequeue_threads[cnt] = threading.Thread(
+                                target=self._dequeue, args=(local_prof, completed_queue),
+                                name='dequeue-thread-%s' % cnt)
+
+                            self._logger.info('Starting dequeue-thread for %s' % completed_queue)
+                            local_prof.prof('starting dequeue-thread', uid=self._uid)
+                            self._dequeue_threads[cnt].start()
 
                     # Start enqueue thread
                     if (not self._enqueue_thread) or (not self._enqueue_thread.is_alive()):
@@ -492,6 +735,9 @@ class WFprocessor(object):
                         local_prof.prof('starting enqueue-thread', uid=self._uid)
                         self._enqueue_thread.start()
 
+                    # Only watch over the threads, do not spin
+                    time.sleep(self._idle_sleep)
+
                 except Exception, ex:
                     self._logger.error('WFProcessor interrupted')
                     raise
@@ -501,9 +747,12 @@ class WFprocessor(object):
             self._logger.info('Terminating enqueue-thread')
             self._enqueue_thread_terminate.set()
             self._enqueue_thread.join()
-            self._logger.info('Terminating dequeue-thread')
+            self._logger.info('Terminating dequeue-threads')
             self._dequeue_thread_terminate.set()
-            self._dequeue_thread.join()
+            for thread in self._dequeue_threads:
+                thread.join()
+
+            self._metrics.stop()
 
             local_prof.prof('termination done', uid=self._uid)
 
@@ -523,12 +772,14 @@ class WFprocessor(object):
                     self._enqueue_thread_terminate.set()
                     self._enqueue_thread.join()
 
-            if self._dequeue_thread:
+            if self._dequeue_threads:
 
                 if not self._dequeue_thread_terminate.is_set():
-                    self._logger.info('Terminating dequeue-thread')
+                    self._logger.info('Terminating dequeue-threads')
                     self._dequeue_thread_terminate.set()
-                    self._dequeue_thread.join()
+                    for thread in self._dequeue_threads:
+                        if thread:
+                            thread.join()
 
             self._logger.info('WFprocessor process terminated')
 
@@ -544,12 +795,14 @@ class WFprocessor(object):
                     self._enqueue_thread_terminate.set()
                     self._enqueue_thread.join()
 
-            if self._dequeue_thread:
+            if self._dequeue_threads:
 
                 if not self._dequeue_thread_terminate.is_set():
-                    self._logger.info('Terminating dequeue-thread')
+                    self._logger.info('Terminating dequeue-threads')
                     self._dequeue_thread_terminate.set()
-                    self._dequeue_thread.join()
+                    for thread in self._dequeue_threads:
+                        if thread:
+                            thread.join()
 
             self._logger.info('WFprocessor process terminated')
 
@@ -575,7 +828,7 @@ class WFprocessor(object):
                 self._wfp_process = Process(target=self._wfp, name='wfprocessor')
 
                 self._enqueue_thread = None
-                self._dequeue_thread = None
+                self._dequeue_threads = list()
                 self._enqueue_thread_terminate = threading.Event()
                 self._dequeue_thread_terminate = threading.Event()
 
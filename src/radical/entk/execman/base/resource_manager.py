@@ -4,6 +4,7 @@ __license__ = "MIT"
 
 import radical.utils as ru
 from radical.entk.exceptions import *
+from radical.entk.utils.bin_profiler import get_profiler
 import radical.pilot as rp
 import os
 
@@ -53,7 +54,7 @@ class Base_ResourceManager(object):
         self._path = os.getcwd() + '/' + self._sid
         self._logger = ru.Logger('radical.entk.%s' %
                                  self._uid, path=self._path, targets=['2', '.'])
-        self._prof = ru.Profiler(name='radical.entk.%s' % self._uid, path=self._path)
+        self._prof = get_profiler(name='radical.entk.%s' % self._uid, path=self._path)
 
         # Shared data list
         self._shared_data = list()
@@ -4,6 +4,7 @@ __license__ = "MIT"
 
 import radical.utils as ru
 from radical.entk.exceptions import *
+from radical.entk.utils.bin_profiler import get_profiler
 import threading
 from multiprocessing import Process, Event
 import Queue
@@ -14,6 +15,8 @@ import traceback
 import os
 import uuid
 from resource_manager import Base_ResourceManager
+from radical.entk.utils.mq_utils import get_connection_manager
+from radical.entk.utils.metrics import Metrics
 
 
 class Base_TaskManager(object):
@@ -24,14 +27,15 @@ class Base_TaskManager(object):
     the completed_queue for other components of EnTK to process.
 
     :arguments:
-        :pending_queue: List of queue(s) with tasks ready to be executed. Currently, only one queue.
-        :completed_queue: List of queue(s) with tasks that have finished execution. Currently, only one queue.
+        :pending_queue: List of queue(s) with tasks ready to be executed. All queues are consumed.
+        :completed_queue: List of queue(s) with tasks that have finished execution. The tasks of a pipeline are
+            always pushed to the same queue.
         :rmgr: ResourceManager object to be used to access the Pilot where the tasks can be submitted
         :mq_hostname: Name of the host where RabbitMQ is running
         :port: port at which rabbitMQ can be accessed
 
-    Currently, EnTK is configured to work with one pending queue and one completed queue. In the future, the number of 
-    queues can be varied for different throughput requirements at the cost of additional Memory and CPU consumption.
+    The number of pending and completed queues can be varied for different throughput requirements at the cost of
+    additional Memory and CPU consumption.
     """
 
     def __init__(self,
@@ -80,15 +84,25 @@ class Base_TaskManager(object):
         self._path = os.getcwd() + '/' + self._sid
         self._logger = ru.Logger('radical.entk.%s' %
                                  self._uid, path=self._path, targets=['2', '.'])
-        self._prof = ru.Profiler(name='radical.entk.%s' % self._uid + '-obj', path=self._path)
-
-        # Thread should run till terminate condtion is encountered
-        mq_connection = pika.BlockingConnection(pika.ConnectionParameters(host=mq_hostname, port=port))
+        self._prof = get_profiler(name='radical.entk.%s' % self._uid + '-obj', path=self._path)
 
         self._hb_request_q = '%s-hb-request' % self._sid
         self._hb_response_q = '%s-hb-response' % self._sid
 
-        mq_channel = mq_connection.channel()
+        # Names of completed pipelines, published by the AppManager
+        self._pipeline_done_q = '%s-pipeline-done' % self._sid
+
+        # Paths of completed tasks, kept across restarts of the tmgr process
+        self._placeholder_path = os.path.join(self._path, 'placeholders.jsonl')
+
+        # Uids of the tasks of the bulk being submitted which have reached the RTS, kept across restarts of the tmgr
+        # process until the bulk is acknowledged
+        self._submitted_path = os.path.join(self._path, 'submitted.txt')
+
+        # Live latencies of the tmgr process, dumped while it runs
+        self._metrics = Metrics(name='radical.entk.%s' % self._uid + '-proc', path=self._path)
+
+        mq_channel = get_connection_manager(mq_hostname, port).channel()
 
         # To respond to heartbeat - get request from rpc_queue
         mq_channel.queue_delete(queue=self._hb_response_q)
@@ -102,8 +116,6 @@ class Base_TaskManager(object):
         self._hb_thread = None
         self._hb_interval = int(os.getenv('ENTK_HB_INTERVAL', 30))
 
-        mq_connection.close()
-
     # ------------------------------------------------------------------------------------------------------------------
     # Private Methods
     # ------------------------------------------------------------------------------------------------------------------
@@ -123,8 +135,9 @@ class Base_TaskManager(object):
 
             self._prof.prof('heartbeat thread started', uid=self._uid)
 
-            mq_connection = pika.BlockingConnection(pika.ConnectionParameters(host=self._mq_hostname, port=self._port))
-            mq_channel = mq_connection.channel()
+            mq = get_connection_manager(self._mq_hostname, self._port)
+            mq_connection = mq.connection()
+            mq_channel = mq.channel()
 
             response = True
             while (response and (not self._hb_terminate.is_set())):
@@ -173,12 +186,49 @@ class Base_TaskManager(object):
         finally:
 
             try:
-                mq_connection.close()
+                mq.close()
             except:
                 self._logger.warning('mq_connection not created')
 
             self._prof.prof('terminating heartbeat thread', uid=self._uid)
 
+    def _heartbeat_response(self, mq_channel, method_frame, props, body):
+        """
+        **Purpose**: Consumer callback on the heartbeat-req queue in the tmgr process. Every 'request' msg is answered
+        with a 'response' msg, carrying the same correlation id, on the 'heartbeart-res' queue.
+        """
+
+        try:
+
+            self._logger.info('Received heartbeat request')
+
+            mq_channel.basic_publish(exchange='',
+                                     routing_key=self._hb_response_q,
+                                     properties=pika.BasicProperties(correlation_id=props.correlation_id),
+                                     body='response')
+
+            self._logger.info('Sent heartbeat response')
+            mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
+
+        except Exception, ex:
+            self._logger.exception('Failed to respond to heartbeat request, error: %s' % ex)
+            raise
+
+    def _pipeline_done(self, placeholders, mq_channel, method_frame, props, body):
+        """
+        **Purpose**: Consumer callback on the pipeline-done queue in the tmgr process. The tasks of the completed
+        pipeline named in the msg become eligible for eviction from the PlaceholderStore 'placeholders'.
+        """
+
+        try:
+
+            placeholders.pipeline_done(body)
+            mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
+
+        except Exception, ex:
+            self._logger.exception('Failed to mark pipeline %s as done, error: %s' % (body, ex))
+            raise
+
     def _tmgr(self, uid, rmgr, logger, mq_hostname, port, pending_queue, completed_queue):
         """
         **Purpose**: Method to be run by the tmgr process. This method receives a Task from the pending_queue
@@ -265,15 +315,12 @@ class Base_TaskManager(object):
 
             if not (self.check_heartbeat() or self.check_manager()):
 
-                mq_connection = pika.BlockingConnection(pika.ConnectionParameters(host=self._mq_hostname, port=self._port))
-                mq_channel = mq_connection.channel()
+                mq_channel = get_connection_manager(self._mq_hostname, self._port).channel()
 
                 # To respond to heartbeat - get request from rpc_queue
                 mq_channel.queue_delete(queue=self._hb_response_q)
                 mq_channel.queue_delete(queue=self._hb_request_q)
 
-                mq_connection.close()
-
     def start_manager(self):
         """
         **Purpose**: Method to start the tmgr process. The tmgr function
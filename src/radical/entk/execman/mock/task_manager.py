@@ -4,6 +4,7 @@ __license__ = "MIT"
 
 import radical.utils as ru
 from radical.entk.exceptions import *
+from radical.entk.utils.bin_profiler import get_profiler
 import threading
 from multiprocessing import Process, Event
 import Queue
@@ -12,10 +13,15 @@ import time
 import json
 import pika
 import traceback
+import logging
 import os
 import uuid
 from ..base.task_manager import Base_TaskManager
-from radical.entk.utils.init_transition import transition
+from radical.entk.utils.init_transition import bulk_transition
+from radical.entk.utils.sync_initiator import SyncInitiator
+from radical.entk.utils.codec import encode_tasks, decode_tasks
+from radical.entk.utils.mq_utils import PREFETCH_COUNT, get_connection_manager, consume_queues, select_queue
+from radical.entk.utils.log_utils import log_enabled
 
 
 class TaskManager(Base_TaskManager):
@@ -26,14 +32,15 @@ class TaskManager(Base_TaskManager):
     the completed_queue for other components of EnTK to process.
 
     :arguments:
-        :pending_queue: List of queue(s) with tasks ready to be executed. Currently, only one queue.
-        :completed_queue: List of queue(s) with tasks that have finished execution. Currently, only one queue.
+        :pending_queue: List of queue(s) with tasks ready to be executed. All queues are consumed.
+        :completed_queue: List of queue(s) with tasks that have finished execution. The tasks of a pipeline are
+            always pushed to the same queue.
         :rmgr: ResourceManager object to be used to access the Pilot where the tasks can be submitted
         :mq_hostname: Name of the host where RabbitMQ is running
         :port: port at which rabbitMQ can be accessed
 
-    Currently, EnTK is configured to work with one pending queue and one completed queue. In the future, the number of 
-    queues can be varied for different throughput requirements at the cost of additional Memory and CPU consumption.
+    The number of pending and completed queues can be varied for different throughput requirements at the cost of
+    additional Memory and CPU consumption.
     """
 
     def __init__(self, sid, pending_queue, completed_queue,
@@ -74,10 +81,11 @@ class TaskManager(Base_TaskManager):
 
         try:
 
-            local_prof = ru.Profiler(name='radical.entk.%s' % self._uid + '-proc', path=self._path)
+            local_prof = get_profiler(name='radical.entk.%s' % self._uid + '-proc', path=self._path)
 
             local_prof.prof('tmgr process started', uid=self._uid)
             logger.info('Task Manager process started')
+            self._metrics.start()
 
             placeholder_dict = dict()
 
@@ -96,64 +104,92 @@ class TaskManager(Base_TaskManager):
                     placeholder_dict[parent_pipeline][parent_stage][str(task.name)] = str(task.path)
 
             # Thread should run till terminate condtion is encountered
-            mq_connection = pika.BlockingConnection(pika.ConnectionParameters(host=mq_hostname, port=port))
-            mq_channel = mq_connection.channel()
+            mq = get_connection_manager(mq_hostname, port)
+            mq_connection = mq.connection()
+            mq_channel = mq.channel()
+            mq_channel.basic_qos(prefetch_count=PREFETCH_COUNT)
+
+            # State updates are pipelined, we only wait for the AppManager
+            # before acknowledging or forwarding a bulk of tasks
+            tmgr_syncer = SyncInitiator(channel=mq_channel,
+                                        queue='%s-tmgr-to-sync' % self._sid,
+                                        logger=self._logger,
+                                        profiler=local_prof,
+                                        metrics=self._metrics)
+            cb_syncer = SyncInitiator(channel=mq_channel,
+                                      queue='%s-cb-to-sync' % self._sid,
+                                      logger=logger,
+                                      profiler=local_prof,
+                                      metrics=self._metrics)
+
+            # Heartbeat requests are answered whenever the connection processes events
+            mq_channel.basic_consume(self._heartbeat_response, queue=self._hb_request_q)
 
             local_prof.prof('tmgr infrastructure setup done', uid=uid)
 
-            last = time.time()
-            while not self._tmgr_terminate.is_set():
+            # Sleep until tasks arrive on any of the pending queues, wake up every
+            # CONSUME_TIMEOUT secs to check for termination
+            for method_frame, header_frame, body in consume_queues(mq_connection, mq_channel,
+                                                                   pending_queue, self._tmgr_terminate):
 
                 try:
 
-                    method_frame, header_frame, body = mq_channel.basic_get(queue=pending_queue[0])
-
                     if body:
 
-                        body = json.loads(body)
-                        bulk_tasks = list()
-                        bulk_cuds = list()
+                        bulk_start = time.time()
+                        bulk_tasks = decode_tasks(body)
+
+                        bulk_transition(objs=bulk_tasks,
+                                        obj_type='Task',
+                                        new_state=states.SUBMITTING,
+                                        channel=mq_channel,
+                                        queue='%s-tmgr-to-sync' % self._sid,
+                                        profiler=local_prof,
+                                        logger=self._logger,
+                                        syncer=tmgr_syncer)
+
+                        bulk_transition(objs=bulk_tasks,
+                                        obj_type='Task',
+                                        new_state=states.SUBMITTED,
+                                        channel=mq_channel,
+                                        queue='%s-tmgr-to-sync' % self._sid,
+                                        profiler=local_prof,
+                                        logger=self._logger,
+                                        syncer=tmgr_syncer)
+
+                        self._logger.info('%s tasks submitted to RTS', len(bulk_tasks))
+
+                        if log_enabled(self._logger, logging.DEBUG):
+                            for task in bulk_tasks:
+                                self._logger.debug('Task %s submitted to RTS', task.uid)
+
+                        # Completions are synced through a different queue
+                        tmgr_syncer.flush()
+                        mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
 
-                        for task in body:
-                            t = Task()
-                            t.from_dict(task)
-                            bulk_tasks.append(t)
+                        self._metrics.observe('tmgr.bulk', time.time() - bulk_start)
 
-                            transition(obj=t,
-                                       obj_type='Task',
-                                       new_state=states.SUBMITTING,
-                                       channel=mq_channel,
-                                       queue='%s-tmgr-to-sync' % self._sid,
-                                       profiler=local_prof,
-                                       logger=self._logger)
+                        bulk_transition(objs=bulk_tasks,
+                                        obj_type='Task',
+                                        new_state=states.COMPLETED,
+                                        channel=mq_channel,
+                                        queue='%s-cb-to-sync' % self._sid,
+                                        profiler=local_prof,
+                                        logger=logger,
+                                        syncer=cb_syncer)
 
-                        for task in bulk_tasks:
-
-                            transition(obj=task,
-                                       obj_type='Task',
-                                       new_state=states.SUBMITTED,
-                                       channel=mq_channel,
-                                       queue='%s-tmgr-to-sync' % self._sid,
-                                       profiler=local_prof,
-                                       logger=self._logger)
-                            self._logger.info('Task %s submitted to RTS' % (task.uid))
-
-                        mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
+                        # The dequeuer must not see the tasks before the AppManager does
+                        cb_syncer.flush()
 
                         for task in bulk_tasks:
 
-                            transition(obj=task,
-                                       obj_type='Task',
-                                       new_state=states.COMPLETED,
-                                       channel=mq_channel,
-                                       queue='%s-cb-to-sync' % self._sid,
-                                       profiler=local_prof,
-                                       logger=logger)
+                            task_as_dict = encode_tasks([task])
 
-                            task_as_dict = json.dumps(task.to_dict())
+                            # All tasks of a pipeline are dequeued from the same completed queue
+                            queue = select_queue(completed_queue, task.parent_pipeline['uid'])
 
                             mq_channel.basic_publish(exchange='',
-                                                     routing_key='%s-completedq-1' % self._sid,
+                                                     routing_key=queue,
                                                      body=task_as_dict
                                                      # properties=pika.BasicProperties(
                                                      # make message persistent
@@ -161,44 +197,17 @@ class TaskManager(Base_TaskManager):
                                                      #)
                                                      )
 
-                            logger.info('Pushed task %s with state %s to completed queue %s' % (
-                                task.uid,
-                                task.state,
-                                completed_queue[0])
-                            )
+                            logger.debug('Pushed task %s with state %s to completed queue %s',
+                                         task.uid, task.state, queue)
 
-                    # Appease pika cos it thinks the connection is dead
-                    now = time.time()
-                    if now - last >= self._rmq_ping_interval:
-                        mq_connection.process_data_events()
-                        last = now
+                    # Dispatch pending heartbeat requests
+                    mq_connection.process_data_events()
 
                 except Exception as ex:
                     logger.exception('Error in tmgr: %s' % ex)
                     raise
 
-                try:
-
-                    # Get request from heartbeat-req for heartbeat response
-                    method_frame, props, body = mq_channel.basic_get(queue=self._hb_request_q)
-
-                    if body:
-
-                        logger.info('Received heartbeat request')
-
-                        mq_channel.basic_publish(exchange='',
-                                                 routing_key=self._hb_response_q,
-                                                 properties=pika.BasicProperties(correlation_id=props.correlation_id),
-                                                 body='response')
-
-                        logger.info('Sent heartbeat response')
-                        mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
-
-                except Exception, ex:
-                    logger.exception('Failed to respond to heartbeat request, error: %s' % ex)
-                    raise
-
-            mq_connection.close()
+            mq.close()
 
         except KeyboardInterrupt:
 
@@ -214,10 +223,12 @@ class TaskManager(Base_TaskManager):
         finally:
 
             try:
-                mq_connection.close()
+                mq.close()
             except:
                 self._logger.warning('mq_connection not created')
 
+            self._metrics.stop()
+
             local_prof.prof('terminating tmgr process', uid=uid)
             local_prof.close()
 
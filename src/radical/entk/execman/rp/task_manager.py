@@ -4,22 +4,48 @@ __license__ = "MIT"
 
 import radical.utils as ru
 from radical.entk.exceptions import *
+from radical.entk.utils.bin_profiler import get_profiler
 import threading
 from multiprocessing import Process, Event
+from multiprocessing.pool import ThreadPool
+from itertools import izip
 import Queue
 from radical.entk import states, Task
-from radical.entk.utils.init_transition import transition
+from radical.entk.utils.init_transition import bulk_transition
+from radical.entk.utils.sync_initiator import SyncInitiator
+from radical.entk.utils.codec import encode_tasks, decode_tasks
+from radical.entk.utils.placeholder_store import PlaceholderStore
+from radical.entk.utils.log_utils import log_enabled
+from radical.entk.utils.mq_utils import CONSUME_TIMEOUT, PREFETCH_COUNT, get_connection_manager, consume_queues, select_queue
 import time
 import json
 import pika
 import traceback
+import logging
 import os
 import radical.pilot as rp
 from task_processor import create_cud_from_task, create_task_from_cu
 import uuid
+from functools import partial
 from ..base.task_manager import Base_TaskManager
 
 
+# Maximum number of completed tasks pushed to the completed queues at once
+COMPLETED_BULK_SIZE = int(os.getenv('ENTK_COMPLETED_BULK_SIZE', 64))
+
+# Maximum time (secs) a completed task waits for a bulk to fill up
+COMPLETED_BULK_TIMEOUT = float(os.getenv('ENTK_COMPLETED_BULK_TIMEOUT', 0.1))
+
+# Maximum number of tasks submitted to RP at once, larger bulks are submitted in sub-bulks
+SUBMIT_BULK_SIZE = int(os.getenv('ENTK_SUBMIT_BULK_SIZE', 256))
+
+# Number of threads building the CUDs of the next sub-bulks while a sub-bulk is submitted
+CUD_WORKERS = int(os.getenv('ENTK_CUD_WORKERS', 2))
+
+# Number of completed pipelines whose task paths are kept for placeholders, 0 keeps all
+PLACEHOLDER_PIPELINES = int(os.getenv('ENTK_PLACEHOLDER_PIPELINES', 0))
+
+
 class TaskManager(Base_TaskManager):
 
     """
@@ -29,14 +55,15 @@ class TaskManager(Base_TaskManager):
 
 
     :arguments:
-        :pending_queue: List of queue(s) with tasks ready to be executed. Currently, only one queue.
-        :completed_queue: List of queue(s) with tasks that have finished execution. Currently, only one queue.
+        :pending_queue: List of queue(s) with tasks ready to be executed. All queues are consumed.
+        :completed_queue: List of queue(s) with tasks that have finished execution. The tasks of a pipeline are
+            always pushed to the same queue.
         :rmgr: ResourceManager object to be used to access the Pilot where the tasks can be submitted
         :mq_hostname: Name of the host where RabbitMQ is running
         :port: port at which rabbitMQ can be accessed
 
-    Currently, EnTK is configured to work with one pending queue and one completed queue. In the future, the number of 
-    queues can be varied for different throughput requirements at the cost of additional Memory and CPU consumption.
+    The number of pending and completed queues can be varied for different throughput requirements at the cost of
+    additional Memory and CPU consumption.
     """
 
     def __init__(self, sid, pending_queue, completed_queue,
@@ -71,97 +98,62 @@ class TaskManager(Base_TaskManager):
         'response' message to the heartbeart-response queue.
 
         **Details**: The AppManager can re-invoke the tmgr process with this function if the execution of the workflow is 
-        still incomplete. There is also population of a dictionary, placeholder_dict, which stores the path of each of
-        the tasks on the remote machine. 
+        still incomplete. There is also population of a PlaceholderStore, placeholder_dict, which stores the path of
+        each of the tasks on the remote machine. The store is persisted in the session folder and reloaded when the
+        tmgr process is re-invoked.
         """
 
         try:
 
-            local_prof = ru.Profiler(name='radical.entk.%s' % self._uid + '-proc', path=self._path)
+            local_prof = get_profiler(name='radical.entk.%s' % self._uid + '-proc', path=self._path)
 
             local_prof.prof('tmgr process started', uid=self._uid)
             logger.info('Task Manager process started')
+            self._metrics.start()
 
-            placeholder_dict = dict()
+            placeholder_dict = PlaceholderStore(path=self._placeholder_path,
+                                                max_pipelines=PLACEHOLDER_PIPELINES)
 
             def load_placeholder(task, rts_uid):
 
-                parent_pipeline = str(task.parent_pipeline['name'])
-                parent_stage = str(task.parent_stage['name'])
+                if task.name is not None:
+                    placeholder_dict.add(task.parent_pipeline['name'], task.parent_stage['name'], task.name,
+                                         task.path, rts_uid)
 
-                if parent_pipeline not in placeholder_dict:
-                    placeholder_dict[parent_pipeline] = dict()
+            def build_cuds(sub_bulk):
 
-                if parent_stage not in placeholder_dict[parent_pipeline]:
-                    placeholder_dict[parent_pipeline][parent_stage] = dict()
+                tasks, stage_caches = sub_bulk
 
-                if None not in [parent_pipeline, parent_stage, task.name]:
-                    placeholder_dict[parent_pipeline][parent_stage][str(task.name)] = {'path': str(task.path),
-                                                                                        'rts_uid': rts_uid}
+                cuds = list()
 
-            def heartbeat_response(mq_channel):
+                for t in tasks:
 
-                try:
-
-                    # Get request from heartbeat-req for heartbeat response
-                    hb_method_frame, hb_props, hb_body = mq_channel.basic_get(queue=self._hb_request_q)
-
-                    if hb_body:
+                    with self._metrics.timer('tmgr.create_cud'):
 
-                        logger.info('Received heartbeat request')
+                        # Staging paths are resolved once per stage
+                        cuds.append(create_cud_from_task(t, placeholder_dict, local_prof,
+                                                         stage_caches.setdefault(t.parent_stage['uid'], dict())))
 
-                        mq_channel.basic_publish(exchange='',
-                                                routing_key=self._hb_response_q,
-                                                properties=pika.BasicProperties(correlation_id=hb_props.correlation_id),
-                                                body='response')
+                return cuds
 
-                        logger.info('Sent heartbeat response')
-                        mq_channel.basic_ack(delivery_tag=hb_method_frame.delivery_tag)
-
-                except Exception, ex:
-                    logger.exception('Failed to respond to heartbeat request, error: %s' % ex)
-                    raise
+            # Completed tasks are buffered by the RP callback and published in bulk
+            # by the completion publisher thread
+            completed_tasks = Queue.Queue()
 
             def unit_state_cb(unit, state):
 
                 try:
 
-                    logger.debug('Unit %s in state %s' % (unit.uid, unit.state))
+                    logger.debug('Unit %s in state %s', unit.uid, unit.state)
 
                     if unit.state in rp.FINAL:
 
-                        # Acquire a connection+channel to the rmq server
-                        mq_connection = pika.BlockingConnection(pika.ConnectionParameters(host=mq_hostname, port=port))
-                        mq_channel = mq_connection.channel()
-
                         task = None
                         task = create_task_from_cu(unit, local_prof)
 
-                        transition(obj=task,
-                                obj_type='Task',
-                                new_state=states.COMPLETED,
-                                channel=mq_channel,
-                                queue='%s-cb-to-sync' % self._sid,
-                                profiler=local_prof,
-                                logger=logger)
-
                         load_placeholder(task, unit.uid)
 
-                        task_as_dict = json.dumps(task.to_dict())
-
-                        mq_channel.basic_publish(exchange='',
-                                                routing_key='%s-completedq-1' % self._sid,
-                                                body=task_as_dict
-                                                # properties=pika.BasicProperties(
-                                                # make message persistent
-                                                #    delivery_mode = 2,
-                                                #)
-                                                )
-
-                        logger.info('Pushed task %s with state %s to completed queue %s' % (task.uid, task.state,
-                                                                                            completed_queue[0]))
-
-                        mq_connection.close()
+                        completed_tasks.put(task)
 
                 except KeyboardInterrupt:
                     self._logger.exception('Execution interrupted by user (you probably hit Ctrl+C), ' +
@@ -172,90 +164,150 @@ class TaskManager(Base_TaskManager):
                 except Exception, ex:
                     self._logger.exception('Error in RP callback thread: %s' % ex)
 
+            publisher = threading.Thread(target=self._publish_completions,
+                                         name='completion-publisher',
+                                         args=(mq_hostname, port, completed_queue, completed_tasks,
+                                               logger, local_prof))
+            publisher.daemon = True
+            publisher.start()
+
+            # CUDs are built by a pool of threads, ahead of the sub-bulk being submitted
+            cud_pool = ThreadPool(CUD_WORKERS)
+
             if not umgr:
                 umgr = rp.UnitManager(session=rmgr._session)
                 umgr.add_pilots(rmgr.pilot)
                 umgr.register_callback(unit_state_cb)
 
             # Acquire a connection+channel to the rmq server
-            mq_connection = pika.BlockingConnection(pika.ConnectionParameters(host=mq_hostname, port=port))
-            mq_channel = mq_connection.channel()
+            mq = get_connection_manager(mq_hostname, port)
+            mq_connection = mq.connection()
+            mq_channel = mq.channel()
+            mq_channel.basic_qos(prefetch_count=PREFETCH_COUNT)
 
             # Make sure the heartbeat response queue is empty
             mq_channel.queue_delete(queue=self._hb_response_q)
             mq_channel.queue_declare(queue=self._hb_response_q)
 
+            # State updates are pipelined, we only wait for the AppManager
+            # before handing a bulk over to RP and before acknowledging it
+            syncer = SyncInitiator(channel=mq_channel,
+                                   queue='%s-tmgr-to-sync' % self._sid,
+                                   logger=self._logger,
+                                   profiler=local_prof,
+                                   metrics=self._metrics)
+
+            # Heartbeat requests are answered whenever the connection processes events
+            mq_channel.basic_consume(self._heartbeat_response, queue=self._hb_request_q)
+
+            # Placeholders of completed pipelines can be evicted
+            mq_channel.basic_consume(partial(self._pipeline_done, placeholder_dict), queue=self._pipeline_done_q)
+
+            # Tasks of an unacknowledged bulk which a previous tmgr process submitted before it failed, they are
+            # skipped when the bulk is redelivered
+            skipped = _load_submitted(self._submitted_path)
+            submitted_log = open(self._submitted_path, 'a')
+
             local_prof.prof('tmgr infrastructure setup done', uid=uid)
 
-            last = time.time()
-            while not self._tmgr_terminate.is_set():
+            # Sleep until tasks arrive on any of the pending queues, wake up every
+            # CONSUME_TIMEOUT secs to check for termination
+            for method_frame, header_frame, body in consume_queues(mq_connection, mq_channel,
+                                                                   pending_queue, self._tmgr_terminate):
 
                 try:
 
-                    # Get tasks from the pending queue
-                    method_frame, header_frame, body = mq_channel.basic_get(queue=pending_queue[0])
+                    if not publisher.is_alive():
+                        raise EnTKError('Completion publisher died')
 
                     if body:
 
-                        body = json.loads(body)
-                        bulk_tasks = list()
-                        bulk_cuds = list()
-
-                        for task in body:
-                            t = Task()
-                            t.from_dict(task)
-                            bulk_tasks.append(t)
-                            bulk_cuds.append(create_cud_from_task(t, placeholder_dict, local_prof))
-
-                            transition(obj=t,
-                                    obj_type='Task',
-                                    new_state=states.SUBMITTING,
-                                    channel=mq_channel,
-                                    queue='%s-tmgr-to-sync' % self._sid,
-                                    profiler=local_prof,
-                                    logger=self._logger)
-
-                        # To accommodate long cud creation times
-                        heartbeat_response(mq_channel)
-
-                        now = time.time()
-                        if now - last >= self._rmq_ping_interval:
-                            mq_connection.process_data_events()
-                            last = now
+                        bulk_start = time.time()
+                        bulk_tasks = decode_tasks(body)
 
-                        umgr.submit_units(bulk_cuds)
+                        if skipped:
+                            bulk_uids = set([t.uid for t in bulk_tasks])
+                            bulk_tasks = [t for t in bulk_tasks if t.uid not in skipped]
 
-                        for task in bulk_tasks:
+                        stage_caches = dict()
+                        sub_bulks = [(bulk_tasks[start:start + SUBMIT_BULK_SIZE], stage_caches)
+                                     for start in range(0, len(bulk_tasks), SUBMIT_BULK_SIZE)]
 
-                            transition(obj=task,
-                                    obj_type='Task',
-                                    new_state=states.SUBMITTED,
-                                    channel=mq_channel,
-                                    queue='%s-tmgr-to-sync' % self._sid,
-                                    profiler=local_prof,
-                                    logger=self._logger)
-                            self._logger.info('Task %s submitted to RTS' % (task.uid))
+                        # Each sub-bulk is submitted as soon as its CUDs are built
+                        cud_bulks = cud_pool.imap(build_cuds, sub_bulks)
 
+                        for (sub_bulk_tasks, _), sub_bulk_cuds in izip(sub_bulks, cud_bulks):
 
-                        # To accommodate long cud submission times
-                        heartbeat_response(mq_channel)
+                            bulk_transition(objs=sub_bulk_tasks,
+                                            obj_type='Task',
+                                            new_state=states.SUBMITTING,
+                                            channel=mq_channel,
+                                            queue='%s-tmgr-to-sync' % self._sid,
+                                            profiler=local_prof,
+                                            logger=self._logger,
+                                            syncer=syncer)
 
-                        # Appease pika cos it thinks the connection is dead
-                        now = time.time()
-                        if now - last >= self._rmq_ping_interval:
+                            # To accommodate long cud creation times
                             mq_connection.process_data_events()
-                            last = now
+
+                            # Completions are synced by the callback through a different queue
+                            syncer.flush()
+
+                            with self._metrics.timer('tmgr.submit_units'):
+                                umgr.submit_units(sub_bulk_cuds)
+
+                            # The bulk is acknowledged once all its sub-bulks are submitted, a redelivery after a
+                            # failure skips the sub-bulks recorded here
+                            submitted_log.write(''.join(['%s\n' % t.uid for t in sub_bulk_tasks]))
+                            submitted_log.flush()
+
+                            bulk_transition(objs=sub_bulk_tasks,
+                                            obj_type='Task',
+                                            new_state=states.SUBMITTED,
+                                            channel=mq_channel,
+                                            queue='%s-tmgr-to-sync' % self._sid,
+                                            profiler=local_prof,
+                                            logger=self._logger,
+                                            syncer=syncer)
+
+                            self._logger.info('%s tasks submitted to RTS', len(sub_bulk_tasks))
+
+                            if log_enabled(self._logger, logging.DEBUG):
+                                for task in sub_bulk_tasks:
+                                    self._logger.debug('Task %s submitted to RTS', task.uid)
+
+                            syncer.flush()
 
                         mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
 
-                    heartbeat_response(mq_channel)
+                        # Only the tasks of unacknowledged bulks are kept in the record
+                        if skipped:
+                            skipped -= bulk_uids
+
+                        submitted_log.truncate(0)
+                        submitted_log.write(''.join(['%s\n' % task_uid for task_uid in skipped]))
+                        submitted_log.flush()
+
+                        self._metrics.observe('tmgr.bulk', time.time() - bulk_start)
+
+                    # Dispatch pending heartbeat requests, also accommodates long cud submission times
+                    mq_connection.process_data_events()
 
                 except Exception, ex:
                     logger.exception('Error in task execution: %s' % ex)
                     raise
 
+            publisher.join()
+
+            cud_pool.close()
+            cud_pool.join()
+
+            placeholder_dict.close()
+            submitted_log.close()
+            self._metrics.stop()
+
             local_prof.prof('terminating tmgr process', uid=uid)
-            mq_connection.close()
+            mq.close()
             local_prof.close()
 
         except KeyboardInterrupt:
@@ -269,6 +321,95 @@ class TaskManager(Base_TaskManager):
             print traceback.format_exc()
             raise EnTKError(ex)
 
+    def _publish_completions(self, mq_hostname, port, completed_queue, completed_tasks, logger, local_prof):
+        """
+        **Purpose**: Method to be run by the completion publisher thread of the tmgr process. The thread collects the
+        tasks buffered by the RP callback in 'completed_tasks', syncs their completion with the AppManager and pushes
+        them to the completed queues. A bulk is flushed once it holds COMPLETED_BULK_SIZE tasks or its oldest task
+        waited for COMPLETED_BULK_TIMEOUT secs. All tasks of a bulk going to the same completed queue are pushed as one
+        message.
+
+        **Details**: The thread uses one connection for its lifetime and terminates once the tmgr is terminated and
+        all buffered tasks are flushed.
+        """
+
+        try:
+
+            mq = get_connection_manager(mq_hostname, port)
+            mq_connection = mq.connection()
+            mq_channel = mq.channel()
+
+            syncer = SyncInitiator(channel=mq_channel,
+                                   queue='%s-cb-to-sync' % self._sid,
+                                   logger=logger,
+                                   profiler=local_prof,
+                                   metrics=self._metrics)
+
+            while not (self._tmgr_terminate.is_set() and completed_tasks.empty()):
+
+                bulk = list()
+
+                try:
+                    bulk.append(completed_tasks.get(timeout=CONSUME_TIMEOUT))
+                except Queue.Empty:
+
+                    # Keep the connection alive while idle
+                    mq_connection.process_data_events()
+                    continue
+
+                deadline = time.time() + COMPLETED_BULK_TIMEOUT
+
+                while len(bulk) < COMPLETED_BULK_SIZE:
+
+                    try:
+                        bulk.append(completed_tasks.get(timeout=max(deadline - time.time(), 0)))
+                    except Queue.Empty:
+                        break
+
+                bulk_transition(objs=bulk,
+                                obj_type='Task',
+                                new_state=states.COMPLETED,
+                                channel=mq_channel,
+                                queue='%s-cb-to-sync' % self._sid,
+                                profiler=local_prof,
+                                logger=logger,
+                                syncer=syncer)
+
+                # The dequeuer must not see the tasks before the AppManager does
+                syncer.flush()
+
+                # All tasks of a pipeline are dequeued from the same completed queue
+                queued_tasks = dict()
+                for task in bulk:
+                    queue = select_queue(completed_queue, task.parent_pipeline['uid'])
+                    queued_tasks.setdefault(queue, list()).append(task)
+
+                for queue, tasks in queued_tasks.iteritems():
+
+                    mq_channel.basic_publish(exchange='',
+                                             routing_key=queue,
+                                             body=encode_tasks(tasks)
+                                             # properties=pika.BasicProperties(
+                                             # make message persistent
+                                             #    delivery_mode = 2,
+                                             #)
+                                             )
+
+                    logger.info('Pushed %s completed tasks to completed queue %s', len(tasks), queue)
+
+            mq.close()
+
+        except Exception, ex:
+
+            logger.exception('Error in completion publisher: %s' % ex)
+
+            try:
+                mq.close()
+            except:
+                logger.warning('mq_connection not created')
+
+            raise
+
     # ------------------------------------------------------------------------------------------------------------------
     # Public Methods
     # ------------------------------------------------------------------------------------------------------------------
@@ -315,3 +456,17 @@ class TaskManager(Base_TaskManager):
         else:
             self._logger.warn('tmgr process already running, but attempted to restart!')
     # ------------------------------------------------------------------------------------------------------------------
+
+
+def _load_submitted(path):
+    """
+    **Purpose**: Read the uids of the tasks recorded as submitted in the file 'path'.
+
+    :return: set of uids
+    """
+
+    if not os.path.exists(path):
+        return set()
+
+    with open(path) as fp:
+        return set([line.strip() for line in fp if line.strip()])
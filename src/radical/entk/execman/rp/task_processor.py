@@ -3,18 +3,139 @@ from radical.entk import Task
 import radical.utils as ru
 import traceback
 from radical.entk.exceptions import *
+from radical.entk.utils.placeholder_store import PlaceholderStore
 import os
+import re
 
 logger = ru.Logger('radical.entk.task_processor')
 
 
+# Placeholders refer to the sandbox of another task:
+# $Pipeline_{pipeline.name}_Stage_{stage.name}_Task_{task.name}
+_PLACEHOLDER = re.compile(r'^\$Pipeline_([^_]+)_Stage_([^_]+)_Task_([^_]+)$')
+
+# Parsed staging directives and placeholders by raw string. Workflows reuse the same directives for many tasks, so
+# each of them is parsed once.
+_parsed_directives = dict()
+_parsed_placeholders = dict()
+_PARSED_MAX = 100000
+
+
+def _cache_parsed(cache, raw, parsed):
+    """
+    **Purpose**: Add a parsed string to 'cache', dropping all entries once the cache is full.
+    """
+
+    if len(cache) >= _PARSED_MAX:
+        cache.clear()
+
+    cache[raw] = parsed
+
+    return parsed
+
+
+def _parse_directive(path):
+    """
+    **Purpose**: Split a staging path of the form 'source > target' or 'source'.
+
+    :return: tuple of source, target (None if not specified) and the placeholder in the path (None if there is none)
+    """
+
+    try:
+        return _parsed_directives[path]
+    except KeyError:
+        pass
+
+    parts = path.split('>')
+    source = parts[0].strip()
+    target = None
+    placeholder = None
+
+    if len(parts) > 1:
+        target = parts[1].strip()
+
+    if '$' in path:
+        if target is None or source.startswith('$'):
+            placeholder = source.split('/')[0]
+        else:
+            placeholder = target.split('/')[0]
+
+    return _cache_parsed(_parsed_directives, path, (source, target, placeholder))
+
+
+def _parse_placeholder(placeholder):
+    """
+    **Purpose**: Parse a placeholder.
+
+    :return: tuple of the pipeline, stage and task name the placeholder refers to, None for $SHARED
+    """
+
+    try:
+        return _parsed_placeholders[placeholder]
+    except KeyError:
+        pass
+
+    if placeholder == '$SHARED':
+        return _cache_parsed(_parsed_placeholders, placeholder, None)
+
+    match = _PLACEHOLDER.match(placeholder)
+
+    if not match:
+        raise ValueError(
+            obj='placeholder',
+            attribute='length',
+            expected_value='$Pipeline_{pipeline.uid}_Stage_{stage.uid}_Task_{task.uid} or $SHARED',
+            actual_value=placeholder.split('_'))
+
+    return _cache_parsed(_parsed_placeholders, placeholder, match.groups())
+
+
+def _resolve_placeholder(placeholder, placeholder_dict, shared):
+    """
+    **Purpose**: Get the path a placeholder refers to, 'shared' for $SHARED.
+    """
+
+    names = _parse_placeholder(placeholder)
+
+    if names is None:
+        return shared
+
+    pipeline_name, stage_name, task_name = names
+
+    if isinstance(placeholder_dict, PlaceholderStore):
+
+        path = placeholder_dict.get_path(pipeline_name, stage_name, task_name)
+
+        if path is not None:
+            return path
+
+        logger.warning('%s not assigned to any task in Stage %s Pipeline %s' %
+                       (task_name, stage_name, pipeline_name))
+
+    elif pipeline_name not in placeholder_dict:
+        logger.warning('%s not assigned to any Pipeline' % (pipeline_name))
+
+    elif stage_name not in placeholder_dict[pipeline_name]:
+        logger.warning('%s not assigned to any Stage in Pipeline %s' % (
+            stage_name, pipeline_name))
+
+    elif task_name not in placeholder_dict[pipeline_name][stage_name]:
+        logger.warning('%s not assigned to any task in Stage %s Pipeline %s' %
+                       (task_name, stage_name, pipeline_name))
+
+    else:
+        return placeholder_dict[pipeline_name][stage_name][task_name]['path']
+
+    raise EnTKError('Placeholder %s cannot be resolved' % placeholder)
+
+
 def resolve_placeholders(path, placeholder_dict):
     """
     **Purpose**: Substitute placeholders in staging attributes of a Task with actual paths to the corresponding tasks.
 
     :arguments:
         :path: string describing the staging paths, possibly containing a placeholder
-        :placeholder_dict: dictionary holding the values for placeholders
+        :placeholder_dict: PlaceholderStore or dictionary holding the values for placeholders
 
     """
 
@@ -29,50 +150,9 @@ def resolve_placeholders(path, placeholder_dict):
         if '$' not in path:
             return path
 
-        # Extract placeholder from path
-        if len(path.split('>')) == 1:
-            placeholder = path.split('/')[0]
-        else:
-            if path.split('>')[0].strip().startswith('$'):
-                placeholder = path.split('>')[0].strip().split('/')[0]
-            else:
-                placeholder = path.split('>')[1].strip().split('/')[0]
-
-        # SHARED
-        if placeholder == "$SHARED":
-            return path.replace(placeholder, 'pilot://')
-
-        # Expected placeholder format:
-        # $Pipeline_{pipeline.uid}_Stage_{stage.uid}_Task_{task.uid}
-
-        broken_placeholder = placeholder.split('/')[0].split('_')
-
-        if not len(broken_placeholder) == 6:
-            raise ValueError(
-                obj='placeholder',
-                attribute='length',
-                expected_value='$Pipeline_{pipeline.uid}_Stage_{stage.uid}_Task_{task.uid} or $SHARED',
-                actual_value=broken_placeholder)
-
-        pipeline_name = broken_placeholder[1]
-        stage_name = broken_placeholder[3]
-        task_name = broken_placeholder[5]
-
-        if pipeline_name in placeholder_dict.keys():
-            if stage_name in placeholder_dict[pipeline_name].keys():
-                if task_name in placeholder_dict[pipeline_name][stage_name].keys():
-                    resolved_placeholder = path.replace(placeholder, placeholder_dict[
-                                                        pipeline_name][stage_name][task_name]['path'])
-                else:
-                    logger.warning('%s not assigned to any task in Stage %s Pipeline %s' %
-                                   (task_name, stage_name, pipeline_name))
-            else:
-                logger.warning('%s not assigned to any Stage in Pipeline %s' % (
-                    stage_name, pipeline_name))
-        else:
-            logger.warning('%s not assigned to any Pipeline' % (pipeline_name))
+        placeholder = _parse_directive(path)[2]
 
-        return resolved_placeholder
+        return path.replace(placeholder, _resolve_placeholder(placeholder, placeholder_dict, 'pilot://'))
 
     except Exception, ex:
 
@@ -94,139 +174,120 @@ def resolve_arguments(args, placeholder_dict):
 
             placeholder = entry.split('/')[0]
 
-            if placeholder == "$SHARED":
-                entry = entry.replace(placeholder, '$RP_PILOT_STAGING')
+            try:
+                entry = entry.replace(placeholder, _resolve_placeholder(placeholder, placeholder_dict,
+                                                                        '$RP_PILOT_STAGING'))
 
-            else:
-                broken_placeholder = placeholder.split('_')
-
-                if not len(broken_placeholder) == 6:
-                    raise ValueError(
-                        obj='placeholder',
-                        attribute='length',
-                        expected_value='$Pipeline_{pipeline.uid}_Stage_{stage.uid}_Task_{task.uid} or $SHARED',
-                        actual_value=broken_placeholder)
+            except EnTKError as ex:
 
-                pipeline_name = broken_placeholder[1]
-                stage_name = broken_placeholder[3]
-                task_name = broken_placeholder[5]
+                # Unknown placeholder formats are errors
+                if isinstance(ex, ValueError):
+                    raise
 
-                try:
-                    entry = entry.replace(
-                        placeholder, placeholder_dict[pipeline_name][stage_name][task_name]['path'])
-
-                except Exception as ex:
-                    logger.warning('Argument parsing failed. Task %s of Stage %s in Pipeline %s does not exist' %
-                                   (task_name, stage_name, pipeline_name))
+                logger.warning('Argument parsing failed. Placeholder %s cannot be resolved' % placeholder)
 
         resolved_args.append(entry)
 
     return resolved_args
 
 
-def get_input_list_from_task(task, placeholder_dict):
+def _resolve_directive(path, placeholder_dict):
+    """
+    **Purpose**: Resolve a staging path into the source and target of an RP directive.
     """
-    Purpose: Parse a Task object to extract the files to be staged as the output. 
 
-    Details: The extracted data is then converted into the appropriate RP directive depending on whether the data
-    is to be copied/downloaded.
+    try:
 
-    :arguments: 
-        :task: EnTK Task object
-        :placeholder_dict: dictionary holding the values for placeholders
+        if isinstance(path, unicode):
+            path = str(path)
 
-    :return: list of RP directives for the files that need to be staged out
-    """
+        if not isinstance(path, str):
+            raise TypeError(expected_type=str, actual_type=type(path))
 
-    try:
+        source, target, placeholder = _parse_directive(path)
 
-        if not isinstance(task, Task):
-            raise TypeError(expected_type=Task, actual_type=type(task))
+        if placeholder:
 
-        input_data = []
+            value = _resolve_placeholder(placeholder, placeholder_dict, 'pilot://')
+            source = source.replace(placeholder, value)
 
-        if task.link_input_data:
+            if target is not None:
+                target = target.replace(placeholder, value)
+
+        if target is None:
+            target = os.path.basename(source)
 
-            for path in task.link_input_data:
+        return source, target
 
-                path = resolve_placeholders(path, placeholder_dict)
+    except Exception, ex:
 
-                if len(path.split('>')) > 1:
+        logger.error('Failed to resolve placeholder %s, error: %s' %
+                     (path, ex))
+        raise
 
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': path.split('>')[1].strip(),
-                        'action': rp.LINK
-                    }
-                else:
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': os.path.basename(path.split('>')[0].strip()),
-                        'action': rp.LINK
-                    }
-                input_data.append(temp)
 
-        if task.upload_input_data:
+def _get_directives(paths, placeholder_dict, action=None, cache=None):
+    """
+    **Purpose**: Convert the staging paths of a Task into RP directives with 'action', no action is set for uploads
+    and downloads. Paths resolved before are looked up in 'cache', a dictionary shared by the tasks of a stage.
+    """
 
-            for path in task.upload_input_data:
+    directives = list()
 
-                path = resolve_placeholders(path, placeholder_dict)
+    for path in paths:
 
-                if len(path.split('>')) > 1:
+        if cache is None:
+            source, target = _resolve_directive(path, placeholder_dict)
 
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': path.split('>')[1].strip()
-                    }
-                else:
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': os.path.basename(path.split('>')[0].strip())
-                    }
-                input_data.append(temp)
+        elif path in cache:
+            source, target = cache[path]
 
-        if task.copy_input_data:
+        else:
+            source, target = cache[path] = _resolve_directive(path, placeholder_dict)
 
-            for path in task.copy_input_data:
+        directive = {'source': source, 'target': target}
 
-                path = resolve_placeholders(path, placeholder_dict)
+        if action:
+            directive['action'] = action
 
-                if len(path.split('>')) > 1:
+        directives.append(directive)
 
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': path.split('>')[1].strip(),
-                        'action': rp.COPY
-                    }
-                else:
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': os.path.basename(path.split('>')[0].strip()),
-                        'action': rp.COPY
-                    }
-                input_data.append(temp)
+    return directives
 
-        if task.move_input_data:
 
-            for path in task.move_input_data:
+def get_input_list_from_task(task, placeholder_dict, cache=None):
+    """
+    Purpose: Parse a Task object to extract the files to be staged as the output. 
+
+    Details: The extracted data is then converted into the appropriate RP directive depending on whether the data
+    is to be copied/downloaded.
+
+    :arguments: 
+        :task: EnTK Task object
+        :placeholder_dict: PlaceholderStore or dictionary holding the values for placeholders
+        :cache: dictionary of resolved staging paths, shared by the tasks of a stage (optional)
+
+    :return: list of RP directives for the files that need to be staged out
+    """
 
-                path = resolve_placeholders(path, placeholder_dict)
+    try:
 
-                if len(path.split('>')) > 1:
+        if not isinstance(task, Task):
+            raise TypeError(expected_type=Task, actual_type=type(task))
+
+        input_data = []
+
+        if task.link_input_data:
+            input_data.extend(_get_directives(task.link_input_data, placeholder_dict, rp.LINK, cache))
+
+        if task.upload_input_data:
+            input_data.extend(_get_directives(task.upload_input_data, placeholder_dict, None, cache))
 
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': path.split('>')[1].strip(),
-                        'action': rp.MOVE
-                    }
-                else:
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': os.path.basename(path.split('>')[0].strip()),
-                        'action': rp.MOVE
-                    }
+        if task.copy_input_data:
+            input_data.extend(_get_directives(task.copy_input_data, placeholder_dict, rp.COPY, cache))
 
-                input_data.append(temp)
+        if task.move_input_data:
+            input_data.extend(_get_directives(task.move_input_data, placeholder_dict, rp.MOVE, cache))
 
         return input_data
 
@@ -237,7 +298,7 @@ def get_input_list_from_task(task, placeholder_dict):
         raise
 
 
-def get_output_list_from_task(task, placeholder_dict):
+def get_output_list_from_task(task, placeholder_dict, cache=None):
     """
     Purpose: Parse a Task object to extract the files to be staged as the output. 
 
@@ -246,7 +307,8 @@ def get_output_list_from_task(task, placeholder_dict):
 
     :arguments: 
         :task: EnTK Task object
-        :placeholder_dict: dictionary holding the values for placeholders
+        :placeholder_dict: PlaceholderStore or dictionary holding the values for placeholders
+        :cache: dictionary of resolved staging paths, shared by the tasks of a stage (optional)
 
     :return: list of RP directives for the files that need to be staged out
 
@@ -260,67 +322,13 @@ def get_output_list_from_task(task, placeholder_dict):
         output_data = []
 
         if task.copy_output_data:
-
-            for path in task.copy_output_data:
-
-                path = resolve_placeholders(path, placeholder_dict)
-
-                if len(path.split('>')) > 1:
-
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': path.split('>')[1].strip(),
-                        'action': rp.COPY
-                    }
-                else:
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': os.path.basename(path.split('>')[0].strip()),
-                        'action': rp.COPY
-                    }
-                output_data.append(temp)
+            output_data.extend(_get_directives(task.copy_output_data, placeholder_dict, rp.COPY, cache))
 
         if task.download_output_data:
-
-            for path in task.download_output_data:
-
-                path = resolve_placeholders(path, placeholder_dict)
-
-                if len(path.split('>')) > 1:
-
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': path.split('>')[1].strip()
-                    }
-                else:
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': os.path.basename(path.split('>')[0].strip())
-                    }
-                output_data.append(temp)
+            output_data.extend(_get_directives(task.download_output_data, placeholder_dict, None, cache))
 
         if task.move_output_data:
-
-            for path in task.move_output_data:
-
-                path = resolve_placeholders(path, placeholder_dict)
-
-                if len(path.split('>')) > 1:
-
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': path.split('>')[1].strip(),
-                        'action': rp.MOVE
-                    }
-                else:
-                    temp = {
-                        'source': path.split('>')[0].strip(),
-                        'target': os.path.basename(path.split('>')[0].strip()),
-                        'action': rp.MOVE
-                    }
-                    
-                output_data.append(temp)
-
+            output_data.extend(_get_directives(task.move_output_data, placeholder_dict, rp.MOVE, cache))
 
         return output_data
 
@@ -330,20 +338,21 @@ def get_output_list_from_task(task, placeholder_dict):
         raise
 
 
-def create_cud_from_task(task, placeholder_dict, prof=None):
+def create_cud_from_task(task, placeholder_dict, prof=None, cache=None):
     """
     Purpose: Create a Compute Unit description based on the defined Task.
 
     :arguments: 
         :task: EnTK Task object
-        :placeholder_dict: dictionary holding the values for placeholders
+        :placeholder_dict: PlaceholderStore or dictionary holding the values for placeholders
+        :cache: dictionary of resolved staging paths, shared by the tasks of a stage (optional)
 
     :return: ComputeUnitDescription
     """
 
     try:
 
-        logger.debug('Creating CU from Task %s' % (task.uid))
+        logger.debug('Creating CU from Task %s', task.uid)
 
         if prof:
             prof.prof('cud from task - create', uid=task.uid)
@@ -370,13 +379,13 @@ def create_cud_from_task(task, placeholder_dict, prof=None):
         if task.lfs_per_process:
             cud.lfs_per_process = task.lfs_per_process
 
-        cud.input_staging = get_input_list_from_task(task, placeholder_dict)
-        cud.output_staging = get_output_list_from_task(task, placeholder_dict)
+        cud.input_staging = get_input_list_from_task(task, placeholder_dict, cache)
+        cud.output_staging = get_output_list_from_task(task, placeholder_dict, cache)
 
         if prof:
             prof.prof('cud from task - done', uid=task.uid)
 
-        logger.debug('CU %s created from Task %s' % (cud.name, task.uid))
+        logger.debug('CU %s created from Task %s', cud.name, task.uid)
 
         return cud
 
@@ -403,7 +412,7 @@ def create_task_from_cu(cu, prof=None):
 
     try:
 
-        logger.debug('Create Task from CU %s' % cu.name)
+        logger.debug('Create Task from CU %s', cu.name)
 
         if prof:
             prof.prof('task from cu - create',
@@ -416,7 +425,6 @@ def create_task_from_cu(cu, prof=None):
         task.parent_stage['name'] = cu.name.split(',')[3].strip()
         task.parent_pipeline['uid'] = cu.name.split(',')[4].strip()
         task.parent_pipeline['name'] = cu.name.split(',')[5].strip()
-        task.rts_uid = cu.uid
 
         if cu.exit_code is not None:
             task.exit_code = cu.exit_code
@@ -432,7 +440,7 @@ def create_task_from_cu(cu, prof=None):
         if prof:
             prof.prof('task from cu - done', uid=cu.name.split(',')[0].strip())
 
-        logger.debug('Task %s created from CU %s' % (task.uid, cu.name))
+        logger.debug('Task %s created from CU %s', task.uid, cu.name)
 
         return task
 
@@ -314,14 +314,17 @@ class Pipeline(object):
         for stage in self._stages:
             stage._validate()
 
-    def _assign_uid(self, sid):
+    def _assign_uid(self, sid, registry=None):
         """
         Purpose: Assign a uid to the current object based on the sid passed. Pass the current uid to children of
-        current object
+        current object. If a registry (dict) is passed, the current object and its children are added to it by uid.
         """
         self._uid = ru.generate_id('pipeline.%(item_counter)04d', ru.ID_CUSTOM, namespace=sid)
+        if registry is not None:
+            registry[self._uid] = self
+
         for stage in self._stages:
-            stage._assign_uid(sid)
+            stage._assign_uid(sid, registry)
 
         self._pass_uid()
 
@@ -1,10 +1,16 @@
+import threading
 import radical.utils as ru
 from radical.entk.exceptions import *
 from radical.entk.task.task import Task
+from radical.entk.task.task_array import TaskArray
 from radical.entk import states
 from collections import Iterable
 
 
+_DONE = states._task_state_codes[states.DONE]
+_FAILED = states._task_state_codes[states.FAILED]
+
+
 class Stage(object):
 
     """
@@ -26,6 +32,13 @@ class Stage(object):
         # To change states
         self._task_count = len(self._tasks)
 
+        # Number of tasks in each state, indexed by task state code. The counters are updated by the tasks, the
+        # tracked tasks are those registered with the counters. The counters are updated by the threads moving the
+        # tasks (enqueue, dequeue) and are protected by a lock.
+        self._task_state_counts = [0] * len(states._task_state_names)
+        self._tracked_tasks = 0
+        self._counts_lock = threading.Lock()
+
         # Pipeline this stage belongs to
         self._p_pipeline = {'uid': None, 'name': None}
 
@@ -54,11 +67,26 @@ class Stage(object):
         Tasks of the stage
 
         :getter: Returns all the tasks of the current stage
-        :setter: Assigns tasks to the current stage
+        :setter: Assigns tasks to the current stage, the members of TaskArrays are assigned as tasks
         :type: set of Tasks
         """
         return self._tasks
 
+    @property
+    def progress(self):
+        """
+        Progress of the stage
+
+        :getter: Returns the number of tasks of the current stage in each task state
+        :type: dict
+        """
+
+        if self._tracked_tasks != len(self._tasks):
+            self._track_tasks(self._tasks, reset=True)
+
+        with self._counts_lock:
+            return dict(zip(states._task_state_names, self._task_state_counts))
+
     @property
     def state(self):
         """
@@ -132,8 +160,12 @@ class Stage(object):
 
     @tasks.setter
     def tasks(self, val):
-        self._tasks = self._validate_entities(val)
+        tasks = self._validate_entities(val)
+        for task in self._tasks - tasks:
+            self._untrack_task(task)
+        self._tasks = tasks
         self._task_count = len(self._tasks)
+        self._track_tasks(self._tasks, reset=True)
 
     @parent_pipeline.setter
     def parent_pipeline(self, value):
@@ -207,11 +239,13 @@ class Stage(object):
 
     def add_tasks(self, val):
         """
-        Adds tasks to the existing set of tasks of the Stage
+        Adds tasks to the existing set of tasks of the Stage. The members of a TaskArray are added as tasks of the
+        Stage.
 
-        :argument: set of tasks
+        :argument: set or list of Tasks and TaskArrays, a Task or a TaskArray
         """
         tasks = self._validate_entities(val)
+        self._track_tasks(tasks - self._tasks)
         self._tasks.update(tasks)
         self._task_count = len(self._tasks)
 
@@ -298,22 +332,83 @@ class Stage(object):
     def _check_stage_complete(self):
         """
         Purpose: Check if all tasks of the current stage have completed, i.e., are in either DONE or FAILED state.
+        The check uses the state counters of the stage and does not visit the tasks.
         """
 
         try:
 
-            for task in self._tasks:
-                if task.state not in [states.DONE, states.FAILED]:
-                    return False
+            # Tasks added to the set returned by 'tasks' are not tracked yet
+            if self._tracked_tasks != len(self._tasks):
+                self._track_tasks(self._tasks, reset=True)
+
+            with self._counts_lock:
+                completed = self._task_state_counts[_DONE] + self._task_state_counts[_FAILED]
 
-            return True
+            return completed == len(self._tasks)
 
         except Exception, ex:
             raise EnTKError(text=ex)
 
+    def _track_tasks(self, tasks, reset=False):
+        """
+        Purpose: Register 'tasks' with the state counters of the current stage. If 'reset' is True, the counters are
+        reset first, 'tasks' are then expected to be all tasks of the stage. Tasks of another stage are removed from
+        that stage first.
+        """
+
+        tasks = list(tasks)
+
+        for task in tasks:
+            if task._stage is not None and task._stage is not self:
+                task._stage._untrack_task(task)
+
+        with self._counts_lock:
+
+            if reset:
+                self._task_state_counts = [0] * len(states._task_state_names)
+                self._tracked_tasks = 0
+
+            for task in tasks:
+                task._stage = self
+                self._task_state_counts[task._state] += 1
+                self._tracked_tasks += 1
+
+    def _untrack_task(self, task):
+        """
+        Purpose: Remove 'task' from the current stage and from its state counters, when it is moved to another stage.
+        """
+
+        with self._counts_lock:
+
+            if task._stage is self:
+                task._stage = None
+                self._task_state_counts[task._state] -= 1
+                self._tracked_tasks -= 1
+
+            self._tasks.discard(task)
+            self._task_count = len(self._tasks)
+
+    def _task_state_changed(self, task, new_state):
+        """
+        Purpose: Move 'task', one of the tasks of the current stage, to the state code 'new_state' and update the
+        state counters of the current stage.
+        """
+
+        with self._counts_lock:
+
+            if task._stage is self:
+                self._task_state_counts[task._state] -= 1
+                self._task_state_counts[new_state] += 1
+                task._state = new_state
+                return
+
+        # The task was moved to another stage meanwhile
+        task._set_state(new_state)
+
     def _validate_entities(self, tasks):
         """
-        Purpose: Validate whether the 'tasks' is of type set. Validate the description of each Task.
+        Purpose: Validate whether the 'tasks' is of type set. Validate the description of each Task. TaskArrays are
+        replaced by their members.
         """
 
         if not tasks:
@@ -326,6 +421,15 @@ class Stage(object):
             else:
                 tasks = set(tasks)
 
+        arrays = [t for t in tasks if isinstance(t, TaskArray)]
+
+        if arrays:
+
+            tasks = tasks - set(arrays)
+
+            for array in arrays:
+                tasks.update(array._members())
+
         for t in tasks:
 
             if not isinstance(t, Task):
@@ -354,14 +458,17 @@ class Stage(object):
         for task in self._tasks:
             task._validate()
 
-    def _assign_uid(self, sid):
+    def _assign_uid(self, sid, registry=None):
         """
         Purpose: Assign a uid to the current object based on the sid passed. Pass the current uid to children of
-        current object
+        current object. If a registry (dict) is passed, the current object and its children are added to it by uid.
         """
         self._uid = ru.generate_id('stage.%(item_counter)04d', ru.ID_CUSTOM, namespace=sid)
+        if registry is not None:
+            registry[self._uid] = self
+
         for task in self._tasks:
-            task._assign_uid(sid)
+            task._assign_uid(sid, registry)
 
         self._pass_uid()
 
@@ -373,9 +480,8 @@ class Stage(object):
         :return: list of updated Tasks
         """
 
+        # Each task gets its own parent dictionaries, they may be modified through the task
         for task in self._tasks:
-            task.parent_stage['uid'] = self._uid
-            task.parent_stage['name'] = self._name
-            task.parent_pipeline['uid'] = self._p_pipeline['uid']
-            task.parent_pipeline['name'] = self._p_pipeline['name']
+            task.parent_stage = {'uid': self._uid, 'name': self._name}
+            task.parent_pipeline = {'uid': self._p_pipeline['uid'], 'name': self._p_pipeline['name']}
     # ------------------------------------------------------------------------------------------------------------------
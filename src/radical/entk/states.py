@@ -97,3 +97,10 @@ for k, v in _task_state_values.iteritems():
         _task_state_inv[v].append(k)
     else:
         _task_state_inv[v] = k
+
+# Compact codes of the task states, Tasks store their state and state history as codes. Unlike the values of
+# state_numbers, every state has its own code.
+_task_state_names = [INITIAL, SCHEDULING, SCHEDULED, SUBMITTING, SUBMITTED, COMPLETED,
+                     DEQUEUEING, DEQUEUED, DONE, FAILED, CANCELED]
+
+_task_state_codes = dict((state, code) for code, state in enumerate(_task_state_names))
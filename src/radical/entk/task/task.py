@@ -1,8 +1,42 @@
 import radical.utils as ru
+from functools import wraps
 from radical.entk.exceptions import *
 from radical.entk import states
 
 
+# Defaults shared by all Tasks until they are modified
+_CPU_REQS = {'processes': 1,
+             'process_type': None,
+             'threads_per_process': 1,
+             'thread_type': None
+             }
+_GPU_REQS = {'processes': 0,
+             'process_type': None,
+             'threads_per_process': 0,
+             'thread_type': None
+             }
+_NO_PARENT = {'uid': None, 'name': None}
+
+_INITIAL = states._task_state_codes[states.INITIAL]
+
+
+def _expanded(method):
+    """
+    Purpose: Decorate the methods accessing the description of a Task, so that a member of a TaskArray expands its
+    description from the template of the array before the method runs.
+    """
+
+    @wraps(method)
+    def wrapper(self, *args):
+
+        if self._array is not None:
+            self._expand()
+
+        return method(self, *args)
+
+    return wrapper
+
+
 class Task(object):
 
     """
@@ -15,53 +49,67 @@ class Task(object):
     function. This is to avoid creating Tasks with new `uid` as tasks with new
     `uid` offset the uid count file in radical.utils and can potentially affect
     the profiling if not taken care.
+
+    To hold large ensembles, a Task is kept compact: its attributes live in slots, the state and the state history
+    are stored as codes (the history as an interned string, shared by all Tasks with the same history), lists are only
+    allocated once accessed or assigned and the default resource requirements and parents are shared until modified.
+    Since the attributes live in slots, attributes other than those defined by Task cannot be set on a Task. The
+    state history is returned as a new list built from the codes, modifying that list does not change the history.
+    The members of a TaskArray hold no description until one of their attributes is accessed, see TaskArray.
     """
 
+    __slots__ = ['_uid', '_name', '_state', '_state_history',
+                 '_pre_exec', '_executable', '_arguments', '_post_exec',
+                 '_cpu_reqs', '_gpu_reqs', '_lfs_per_process',
+                 '_upload_input_data', '_copy_input_data', '_link_input_data', '_move_input_data',
+                 '_copy_output_data', '_move_output_data', '_download_output_data',
+                 '_path', '_exit_code', '_tag', '_p_stage', '_p_pipeline', '_stage',
+                 '_array', '_index']
+
     def __init__(self):
 
         self._uid = None
         self._name = None
 
-        self._state = states.INITIAL
-
-        # Attributes necessary for execution
-        self._pre_exec = list()
-        self._executable = list()
-        self._arguments = list()
-        self._post_exec = list()
-        self._cpu_reqs = {'processes': 1,
-                          'process_type': None,
-                          'threads_per_process': 1,
-                          'thread_type': None
-                          }
-        self._gpu_reqs = {'processes': 0,
-                          'process_type': None,
-                          'threads_per_process': 0,
-                          'thread_type': None
-                          }
+        self._state = _INITIAL
+
+        # Attributes necessary for execution, empty lists are None
+        self._pre_exec = None
+        self._executable = None
+        self._arguments = None
+        self._post_exec = None
+        self._cpu_reqs = _CPU_REQS
+        self._gpu_reqs = _GPU_REQS
         self._lfs_per_process = 0
 
         # Data staging attributes
-        self._upload_input_data = list()
-        self._copy_input_data = list()
-        self._link_input_data = list()
-        self._move_input_data = list()
-        self._copy_output_data = list()
-        self._move_output_data = list()
-        self._download_output_data = list()
+        self._upload_input_data = None
+        self._copy_input_data = None
+        self._link_input_data = None
+        self._move_input_data = None
+        self._copy_output_data = None
+        self._move_output_data = None
+        self._download_output_data = None
 
         self._path = None
         self._exit_code = None
         self._tag = None
 
-        # Keep track of states attained
-        self._state_history = [states.INITIAL]
+        # Keep track of states attained, one character per state code
+        self._state_history = intern(chr(_INITIAL))
 
         # The following help in updation
         # Stage this task belongs to
-        self._p_stage = {'uid': None, 'name': None}
+        self._p_stage = _NO_PARENT
         # Pipeline this task belongs to
-        self._p_pipeline = {'uid': None, 'name': None}
+        self._p_pipeline = _NO_PARENT
+
+        # Stage object counting the states of its tasks
+        self._stage = None
+
+        # TaskArray describing this task and index of this task in it, until the description is expanded
+        self._array = None
+        self._index = None
 
     # ------------------------------------------------------------------------------------------------------------------
     # Getter functions
@@ -78,6 +126,7 @@ class Task(object):
         return self._uid
 
     @property
+    @_expanded
     def name(self):
         """
         Name of the task. Do not use a ',' or '_' in an object's name.
@@ -98,9 +147,10 @@ class Task(object):
         :type: String
         """
 
-        return self._state
+        return states._task_state_names[self._state]
 
     @property
+    @_expanded
     def pre_exec(self):
         """
         List of commands to be executed prior to the executable
@@ -109,9 +159,14 @@ class Task(object):
         :setter: assign the list of commands
         :arguments: list of strings
         """
+
+        if self._pre_exec is None:
+            self._pre_exec = list()
+
         return self._pre_exec
 
     @property
+    @_expanded
     def executable(self):
         """
         A unix-based kernel to be executed
@@ -120,9 +175,14 @@ class Task(object):
         :setter: assigns the executable for the current task
         :arguments: string
         """
+
+        if self._executable is None:
+            self._executable = list()
+
         return self._executable
 
     @property
+    @_expanded
     def arguments(self):
         """
         List of arguments to be supplied to the executable
@@ -131,9 +191,14 @@ class Task(object):
         :setter: assigns a list of arguments to the current task
         :arguments: list of strings
         """
+
+        if self._arguments is None:
+            self._arguments = list()
+
         return self._arguments
 
     @property
+    @_expanded
     def post_exec(self):
         """
         List of commands to be executed post executable
@@ -143,9 +208,13 @@ class Task(object):
         :arguments: list of strings
         """
 
+        if self._post_exec is None:
+            self._post_exec = list()
+
         return self._post_exec
 
     @property
+    @_expanded
     def cpu_reqs(self):
         """
         **Purpose:** The CPU requirements of the current Task.
@@ -184,9 +253,13 @@ class Task(object):
 
         """
 
+        if self._cpu_reqs is _CPU_REQS:
+            self._cpu_reqs = dict(_CPU_REQS)
+
         return self._cpu_reqs
 
     @property
+    @_expanded
     def gpu_reqs(self):
         """
         **Purpose:** The GPU requirements of the current Task.
@@ -224,16 +297,22 @@ class Task(object):
 
         """
 
+        if self._gpu_reqs is _GPU_REQS:
+            self._gpu_reqs = dict(_GPU_REQS)
+
         return self._gpu_reqs
 
     @property
+    @_expanded
     def lfs_per_process(self):
         """
         Set the amount of local file-storage space required by the task
         """
+
         return self._lfs_per_process
 
     @property
+    @_expanded
     def upload_input_data(self):
         """
         List of files to be transferred from local machine to the location of the current task
@@ -244,9 +323,13 @@ class Task(object):
         :arguments: list of strings
         """
 
+        if self._upload_input_data is None:
+            self._upload_input_data = list()
+
         return self._upload_input_data
 
     @property
+    @_expanded
     def copy_input_data(self):
         """
         List of files to be copied from a location on the remote machine to the location of
@@ -257,9 +340,13 @@ class Task(object):
         :arguments: list of strings
         """
 
+        if self._copy_input_data is None:
+            self._copy_input_data = list()
+
         return self._copy_input_data
 
     @property
+    @_expanded
     def link_input_data(self):
         """
         List of files to be linked from a location on the remote machine to the location of
@@ -270,10 +357,14 @@ class Task(object):
         :arguments: list of strings
         """
 
+        if self._link_input_data is None:
+            self._link_input_data = list()
+
         return self._link_input_data
 
 
     @property
+    @_expanded
     def move_input_data(self):
         """
         List of files to be move from a location on the remote machine to the location of
@@ -284,9 +375,13 @@ class Task(object):
         :arguments: list of strings
         """
 
+        if self._move_input_data is None:
+            self._move_input_data = list()
+
         return self._move_input_data
 
     @property
+    @_expanded
     def copy_output_data(self):
         """
         List of files to be copied from the location of the current task to another location
@@ -297,10 +392,14 @@ class Task(object):
         :arguments: list of strings
         """
 
+        if self._copy_output_data is None:
+            self._copy_output_data = list()
+
         return self._copy_output_data
 
 
     @property
+    @_expanded
     def move_output_data(self):
         """
         List of files to be copied from the location of the current task to another location
@@ -311,9 +410,13 @@ class Task(object):
         :arguments: list of strings
         """
 
+        if self._move_output_data is None:
+            self._move_output_data = list()
+
         return self._move_output_data
 
     @property
+    @_expanded
     def download_output_data(self):
         """
         List of files to be downloaded from the location of the current task to a location
@@ -323,6 +426,10 @@ class Task(object):
         :setter: assign the list of files
         :arguments: list of strings
         """
+
+        if self._download_output_data is None:
+            self._download_output_data = list()
+
         return self._download_output_data
 
     @property
@@ -346,6 +453,7 @@ class Task(object):
         return self._path
 
     @property
+    @_expanded
     def tag(self):
         """
         Set the tag for the task that can be used while scheduling by the RTS
@@ -361,6 +469,9 @@ class Task(object):
         :getter: Returns the stage this task belongs to
         :setter: Assigns the stage uid this task belongs to
         """
+        if self._p_stage is _NO_PARENT:
+            self._p_stage = dict(_NO_PARENT)
+
         return self._p_stage
 
     @property
@@ -369,18 +480,21 @@ class Task(object):
         :getter: Returns the pipeline this task belongs to
         :setter: Assigns the pipeline uid this task belongs to
         """
+        if self._p_pipeline is _NO_PARENT:
+            self._p_pipeline = dict(_NO_PARENT)
 
         return self._p_pipeline
 
     @property
     def state_history(self):
         """
-        Returns a list of the states obtained in temporal order
+        Returns a list of the states obtained in temporal order. The list is built from the state codes of the task
+        on each access, modifying it has no effect: the history only changes by assigning a state.
 
         :return: list
         """
 
-        return self._state_history
+        return [states._task_state_names[ord(code)] for code in self._state_history]
 
     # ------------------------------------------------------------------------------------------------------------------
     # Setter functions
@@ -394,6 +508,7 @@ class Task(object):
             raise TypeError(expected_type=str, actual_type=type(val))
 
     @name.setter
+    @_expanded
     def name(self, value):
         if isinstance(value, str):
             if ',' in value:
@@ -407,9 +522,9 @@ class Task(object):
     @state.setter
     def state(self, value):
         if isinstance(value, str):
-            if value in states._task_state_values.keys():
-                self._state = value
-                self._state_history.append(value)
+            if value in states._task_state_values:
+                self._set_state(states._task_state_codes[value])
+                self._state_history = intern(self._state_history + chr(self._state))
             else:
                 raise ValueError(obj=self._uid,
                                  attribute='state',
@@ -419,6 +534,7 @@ class Task(object):
             raise TypeError(expected_type=str, actual_type=type(val))
 
     @pre_exec.setter
+    @_expanded
     def pre_exec(self, val):
         if isinstance(val, list):
             self._pre_exec = val
@@ -426,6 +542,7 @@ class Task(object):
             raise TypeError(expected_type=list, actual_type=type(val))
 
     @executable.setter
+    @_expanded
     def executable(self, val):
         if isinstance(val, list):
             self._executable = val
@@ -435,6 +552,7 @@ class Task(object):
             raise TypeError(expected_type='list or str', actual_type=type(val))
 
     @arguments.setter
+    @_expanded
     def arguments(self, val):
         if isinstance(val, list):
             self._arguments = val
@@ -442,6 +560,7 @@ class Task(object):
             raise TypeError(expected_type=list, actual_type=type(val))
 
     @post_exec.setter
+    @_expanded
     def post_exec(self, val):
         if isinstance(val, list):
             self._post_exec = val
@@ -449,9 +568,13 @@ class Task(object):
             raise TypeError(expected_type=list, actual_type=type(val))
 
     @cpu_reqs.setter
+    @_expanded
     def cpu_reqs(self, val):
         if isinstance(val, dict):
 
+            if self._cpu_reqs is _CPU_REQS:
+                self._cpu_reqs = dict(_CPU_REQS)
+
             expected_keys = set(
                 ['processes', 'threads_per_process', 'process_type', 'thread_type'])
 
@@ -498,9 +621,13 @@ class Task(object):
                     obj='cpu_reqs', missing_attribute=expected_keys - set(val.keys()))
 
     @gpu_reqs.setter
+    @_expanded
     def gpu_reqs(self, val):
         if isinstance(val, dict):
 
+            if self._gpu_reqs is _GPU_REQS:
+                self._gpu_reqs = dict(_GPU_REQS)
+
             expected_keys = set(
                 ['processes', 'threads_per_process', 'process_type', 'thread_type'])
 
@@ -547,6 +674,7 @@ class Task(object):
                     obj='gpu_reqs', missing_attribute=expected_keys - set(val.keys()))
 
     @lfs_per_process.setter
+    @_expanded
     def lfs_per_process(self, val):
         if isinstance(val, int):
             self._lfs_per_process = val
@@ -554,6 +682,7 @@ class Task(object):
             raise TypeError(expected_type=int, actual_value=type(val))
 
     @upload_input_data.setter
+    @_expanded
     def upload_input_data(self, val):
         if isinstance(val, list):
             self._upload_input_data = val
@@ -561,6 +690,7 @@ class Task(object):
             raise TypeError(expected_type=list, actual_type=type(val))
 
     @copy_input_data.setter
+    @_expanded
     def copy_input_data(self, val):
         if isinstance(val, list):
             self._copy_input_data = val
@@ -569,6 +699,7 @@ class Task(object):
 
 
     @move_input_data.setter
+    @_expanded
     def move_input_data(self, val):
         if isinstance(val, list):
             self._move_input_data = val
@@ -576,6 +707,7 @@ class Task(object):
             raise TypeError(expected_type=list, actual_type=type(val))
 
     @link_input_data.setter
+    @_expanded
     def link_input_data(self, val):
         if isinstance(val, list):
             self._link_input_data = val
@@ -583,6 +715,7 @@ class Task(object):
             raise TypeError(expected_type=list, actual_type=type(val))
 
     @copy_output_data.setter
+    @_expanded
     def copy_output_data(self, val):
         if isinstance(val, list):
             self._copy_output_data = val
@@ -591,6 +724,7 @@ class Task(object):
 
 
     @move_output_data.setter
+    @_expanded
     def move_output_data(self, val):
         if isinstance(val, list):
             self._move_output_data = val
@@ -598,6 +732,7 @@ class Task(object):
             raise TypeError(expected_type=list, actual_type=type(val))
 
     @download_output_data.setter
+    @_expanded
     def download_output_data(self, val):
         if isinstance(val, list):
             self._download_output_data = val
@@ -621,6 +756,7 @@ class Task(object):
                             actual_type=type(val))
 
     @tag.setter
+    @_expanded
     def tag(self, val):
         if isinstance(val, str):
             self._tag = val
@@ -631,6 +767,9 @@ class Task(object):
     @parent_stage.setter
     def parent_stage(self, val):
         if isinstance(val, dict):
+            # A task assigned to another stage is removed from its old stage
+            if self._stage is not None and val.get('uid') != self._stage.uid:
+                self._stage._untrack_task(self)
             self._p_stage = val
         else:
             raise TypeError(expected_type=dict, actual_type=type(val))
@@ -653,38 +792,17 @@ class Task(object):
         :return: python dictionary
         """
 
-        task_desc_as_dict = {
-            'uid': self._uid,
-            'name': self._name,
-            'state': self._state,
-            'state_history': self._state_history,
-
-            'pre_exec': self._pre_exec,
-            'executable': self._executable,
-            'arguments': self._arguments,
-            'post_exec': self._post_exec,
-            'cpu_reqs': self._cpu_reqs,
-            'gpu_reqs': self._gpu_reqs,
-            'lfs_per_process': self._lfs_per_process,
-
-            'upload_input_data': self._upload_input_data,
-            'copy_input_data': self._copy_input_data,
-            'link_input_data': self._link_input_data,
-            'move_input_data': self._move_input_data,
-            'copy_output_data': self._copy_output_data,
-            'move_output_data': self._move_output_data,
-            'download_output_data': self._download_output_data,
-
-            'exit_code': self._exit_code,
-            'path': self._path,
-            'tag': self._tag,
+        if self._array is not None:
+            # Members of a TaskArray are described without expanding them
+            task_desc_as_dict = self._array._describe(self._index)
+        else:
+            task_desc_as_dict = self._description()
 
-            'parent_stage': self._p_stage,
-            'parent_pipeline': self._p_pipeline,
-        }
+        task_desc_as_dict.update(self._to_member_dict())
 
         return task_desc_as_dict
 
+    @_expanded
     def from_dict(self, d):
         """
         Create a Task from a dictionary. The change is in inplace.
@@ -703,58 +821,64 @@ class Task(object):
 
         if 'state' in d:
             if isinstance(d['state'], str) or isinstance(d['state'], unicode):
-                self._state = d['state']
+                if d['state'] in states._task_state_codes:
+                    self._set_state(states._task_state_codes[d['state']])
+                else:
+                    raise ValueError(obj=self._uid,
+                                     attribute='state',
+                                     expected_value=states._task_state_names,
+                                     actual_value=d['state'])
             else:
                 raise TypeError(entity='state', expected_type=str,
                                 actual_type=type(d['state']))
         else:
-            self._state = states.INITIAL
+            self._set_state(_INITIAL)
 
         if 'state_history' in d:
             if isinstance(d['state_history'], list):
-                self._state_history = d['state_history']
+                self._state_history = _encode_state_history(d['state_history'])
             else:
                 raise TypeError(entity='state_history', expected_type=list, actual_type=type(
                     d['state_history']))
 
         if 'pre_exec' in d:
             if isinstance(d['pre_exec'], list):
-                self._pre_exec = d['pre_exec']
+                self._pre_exec = d['pre_exec'] or None
             else:
                 raise TypeError(expected_type=list,
                                 actual_type=type(d['pre_exec']))
 
         if 'executable' in d:
             if isinstance(d['executable'], list):
-                self._executable = d['executable']
+                self._executable = d['executable'] or None
             else:
                 raise TypeError(expected_type=list,
                                 actual_type=type(d['executable']))
 
         if 'arguments' in d:
             if isinstance(d['arguments'], list):
-                self._arguments = d['arguments']
+                self._arguments = d['arguments'] or None
             else:
                 raise TypeError(expected_type=list,
                                 actual_type=type(d['arguments']))
 
         if 'post_exec' in d:
             if isinstance(d['post_exec'], list):
-                self._post_exec = d['post_exec']
+                self._post_exec = d['post_exec'] or None
             else:
                 raise TypeError(expected_type=list,
                                 actual_type=type(d['post_exec']))
 
         if 'cpu_reqs' in d:
             if isinstance(d['cpu_reqs'], dict):
-                self._cpu_reqs = d['cpu_reqs']
+                self._cpu_reqs = _share_reqs(d['cpu_reqs'], _CPU_REQS)
             else:
                 raise TypeError(expected_type=dict,
                                 actual_type=type(d['cpu_reqs']))
 
         if 'gpu_reqs' in d:
             if isinstance(d['gpu_reqs'], dict):
-                self._gpu_reqs = d['gpu_reqs']
+                self._gpu_reqs = _share_reqs(d['gpu_reqs'], _GPU_REQS)
             else:
                 raise TypeError(expected_type=dict,
                                 actual_type=type(d['gpu_reqs']))
@@ -769,28 +893,28 @@ class Task(object):
 
         if 'upload_input_data' in d:
             if isinstance(d['upload_input_data'], list):
-                self._upload_input_data = d['upload_input_data']
+                self._upload_input_data = d['upload_input_data'] or None
             else:
                 raise TypeError(expected_type=list,
                                 actual_type=type(d['upload_input_data']))
 
         if 'copy_input_data' in d:
             if isinstance(d['copy_input_data'], list):
-                self._copy_input_data = d['copy_input_data']
+                self._copy_input_data = d['copy_input_data'] or None
             else:
                 raise TypeError(expected_type=list,
                                 actual_type=type(d['copy_input_data']))
 
         if 'link_input_data' in d:
             if isinstance(d['link_input_data'], list):
-                self._link_input_data = d['link_input_data']
+                self._link_input_data = d['link_input_data'] or None
             else:
                 raise TypeError(expected_type=list,
                                 actual_type=type(d['link_input_data']))
 
         if 'move_input_data' in d:
             if isinstance(d['move_input_data'], list):
-                self._move_input_data = d['move_input_data']
+                self._move_input_data = d['move_input_data'] or None
             else:
                 raise TypeError(expected_type=list,
                                 actual_type=type(d['move_input_data']))
@@ -798,21 +922,21 @@ class Task(object):
 
         if 'copy_output_data' in d:
             if isinstance(d['copy_output_data'], list):
-                self._copy_output_data = d['copy_output_data']
+                self._copy_output_data = d['copy_output_data'] or None
             else:
                 raise TypeError(expected_type=list,
                                 actual_type=type(d['copy_output_data']))
 
         if 'move_output_data' in d:
             if isinstance(d['move_output_data'], list):
-                self._move_output_data = d['move_output_data']
+                self._move_output_data = d['move_output_data'] or None
             else:
                 raise TypeError(expected_type=list,
                                 actual_type=type(d['move_output_data']))
 
         if 'download_output_data' in d:
             if isinstance(d['download_output_data'], list):
-                self._download_output_data = d['download_output_data']
+                self._download_output_data = d['download_output_data'] or None
             else:
                 raise TypeError(expected_type=list, actual_type=type(
                     d['download_output_data']))
@@ -855,16 +979,187 @@ class Task(object):
                 raise TypeError(entity='parent_pipeline', expected_type=dict, actual_type=type(
                     d['parent_pipeline']))
 
+    @classmethod
+    def _from_trusted_dict(cls, d):
+        """
+        Create a Task from a dictionary produced by `to_dict` of another EnTK component. Unlike `from_dict`, the
+        fields are not validated and the dictionary has to be complete.
+
+        :argument: python dictionary
+        :return: Task
+        """
+
+        task = cls.__new__(cls)
+
+        task._uid = d['uid']
+        task._state = states._task_state_codes[d['state']]
+        task._state_history = _encode_state_history(d['state_history'])
+
+        task._load_description(d)
+
+        task._exit_code = d['exit_code']
+        task._path = d['path']
+
+        task._p_stage = d['parent_stage']
+        task._p_pipeline = d['parent_pipeline']
+        task._stage = None
+
+        task._array = None
+        task._index = None
+
+        return task
+
+    @classmethod
+    def _from_member_dict(cls, d, array):
+        """
+        Create the member of the TaskArray 'array' from a dictionary produced by `_to_member_dict`, with the index of
+        the member added. The description of the member is expanded from the array once it is accessed.
+
+        :argument: python dictionary, TaskArray
+        :return: Task
+        """
+
+        task = cls.__new__(cls)
+
+        task._uid = d['uid']
+        task._state = states._task_state_codes[d['state']]
+        task._state_history = _encode_state_history(d['state_history'])
+
+        task._name = None
+        task._pre_exec = None
+        task._executable = None
+        task._arguments = None
+        task._post_exec = None
+        task._cpu_reqs = _CPU_REQS
+        task._gpu_reqs = _GPU_REQS
+        task._lfs_per_process = 0
+
+        task._upload_input_data = None
+        task._copy_input_data = None
+        task._link_input_data = None
+        task._move_input_data = None
+        task._copy_output_data = None
+        task._move_output_data = None
+        task._download_output_data = None
+        task._tag = None
+
+        task._exit_code = d['exit_code']
+        task._path = d['path']
+
+        task._p_stage = d['parent_stage']
+        task._p_pipeline = d['parent_pipeline']
+        task._stage = None
+
+        task._array = array
+        task._index = d['index']
+
+        return task
+
     # ------------------------------------------------------------------------------------------------------------------
     # Private methods
     # ------------------------------------------------------------------------------------------------------------------
 
-    def _assign_uid(self, sid):
+    def _assign_uid(self, sid, registry=None):
         """
-        Purpose: Assign a uid to the current object based on the sid passed
+        Purpose: Assign a uid to the current object based on the sid passed. If a registry (dict) is passed, the
+        current object is added to it by uid.
         """
         self._uid = ru.generate_id(
             'task.%(item_counter)04d', ru.ID_CUSTOM, namespace=sid)
+        if registry is not None:
+            registry[self._uid] = self
+
+    def _description(self):
+        """
+        Purpose: Return the attributes describing the current task, as dictionary in the format of `to_dict`.
+        """
+
+        return {
+            'name': self._name,
+
+            'pre_exec': self._pre_exec or list(),
+            'executable': self._executable or list(),
+            'arguments': self._arguments or list(),
+            'post_exec': self._post_exec or list(),
+            'cpu_reqs': dict(self._cpu_reqs),
+            'gpu_reqs': dict(self._gpu_reqs),
+            'lfs_per_process': self._lfs_per_process,
+
+            'upload_input_data': self._upload_input_data or list(),
+            'copy_input_data': self._copy_input_data or list(),
+            'link_input_data': self._link_input_data or list(),
+            'move_input_data': self._move_input_data or list(),
+            'copy_output_data': self._copy_output_data or list(),
+            'move_output_data': self._move_output_data or list(),
+            'download_output_data': self._download_output_data or list(),
+
+            'tag': self._tag,
+        }
+
+    def _to_member_dict(self):
+        """
+        Purpose: Return the attributes of the current task which are not part of its description, as dictionary in
+        the format of `to_dict`. Members of a TaskArray which are not expanded are sent as these attributes only.
+        """
+
+        return {
+            'uid': self._uid,
+            'state': states._task_state_names[self._state],
+            'state_history': self.state_history,
+
+            'exit_code': self._exit_code,
+            'path': self._path,
+
+            'parent_stage': dict(self._p_stage),
+            'parent_pipeline': dict(self._p_pipeline),
+        }
+
+    def _load_description(self, d):
+        """
+        Purpose: Set the attributes describing the current task from a trusted dictionary in the format of `to_dict`.
+        """
+
+        self._name = d['name']
+
+        self._pre_exec = d['pre_exec'] or None
+        self._executable = d['executable'] or None
+        self._arguments = d['arguments'] or None
+        self._post_exec = d['post_exec'] or None
+        self._cpu_reqs = _share_reqs(d['cpu_reqs'], _CPU_REQS)
+        self._gpu_reqs = _share_reqs(d['gpu_reqs'], _GPU_REQS)
+        self._lfs_per_process = d['lfs_per_process']
+
+        self._upload_input_data = d['upload_input_data'] or None
+        self._copy_input_data = d['copy_input_data'] or None
+        self._link_input_data = d['link_input_data'] or None
+        self._move_input_data = d['move_input_data'] or None
+        self._copy_output_data = d['copy_output_data'] or None
+        self._move_output_data = d['move_output_data'] or None
+        self._download_output_data = d['download_output_data'] or None
+
+        self._tag = str(d['tag']) if d['tag'] else d['tag']
+
+    def _expand(self):
+        """
+        Purpose: Expand the description of the current task, a member of a TaskArray, from the template of the array.
+        Afterwards the task is independent of the array.
+        """
+
+        array = self._array
+        self._array = None
+        self._load_description(array._describe(self._index))
+
+    def _set_state(self, code):
+        """
+        Purpose: Set the state code of the task and update the state counters of its stage.
+        """
+
+        stage = self._stage
+
+        if stage is not None:
+            stage._task_state_changed(self, code)
+        else:
+            self._state = code
 
     def _validate(self):
         """
@@ -872,13 +1167,36 @@ class Task(object):
         task.
         """
 
-        if self._state is not states.INITIAL:
+        if self._state != _INITIAL:
             raise ValueError(obj=self._uid,
                              attribute='state',
                              expected_value=states.INITIAL,
-                             actual_value=self._state)
+                             actual_value=self.state)
+
+        # The template of a TaskArray is validated once for all its members
+        if self._array is not None:
+            return
 
         if not self._executable:
             raise MissingError(obj=self._uid,
                                missing_attribute='executable')
     # ------------------------------------------------------------------------------------------------------------------
+
+
+def _encode_state_history(state_history):
+    """
+    Purpose: Encode a list of task states as string of state codes, shared by all Tasks with the same history.
+    """
+
+    return intern(''.join([chr(states._task_state_codes[state]) for state in state_history]))
+
+
+def _share_reqs(reqs, default):
+    """
+    Purpose: Return the shared 'default' resource requirements if 'reqs' is equal to them, 'reqs' otherwise.
+    """
+
+    if reqs == default:
+        return default
+
+    return reqs
@@ -0,0 +1,234 @@
+import re
+from radical.entk.exceptions import *
+from radical.entk.task.task import Task
+
+
+# Placeholders in the attributes of the template of a TaskArray, e.g. 'input.{index}.dat'
+_PLACEHOLDER = re.compile(r'\{(\w+)\}')
+
+# Attributes of the template which may hold placeholders
+_STR_ATTRS = ['name', 'tag']
+_LIST_ATTRS = ['pre_exec', 'executable', 'arguments', 'post_exec',
+               'upload_input_data', 'copy_input_data', 'link_input_data', 'move_input_data',
+               'copy_output_data', 'move_output_data', 'download_output_data']
+
+
+class TaskArray(object):
+
+    """
+    A TaskArray describes a number of homogeneous Tasks with one template Task. The members of the array differ only
+    in the placeholders of the string attributes of the template (name, tag, pre_exec, executable, arguments,
+    post_exec and the data staging lists): '{index}' is replaced by the index of the member, '{<key>}' by the value of
+    <key> in the row of 'params' of the member. Placeholders of other names, e.g. '${HOME}', are left as they are.
+    If the name of the template holds no placeholder, '-{index}' is appended to it, so that the members have distinct
+    names.
+
+        t = Task()
+        t.executable = ['/bin/cat']
+        t.arguments = ['{input}']
+        t.copy_input_data = ['$SHARED/{input}']
+
+        s = Stage()
+        s.add_tasks(TaskArray(t, params=[{'input': 'a.dat'}, {'input': 'b.dat'}]))
+
+    The template is validated once for all members. When the array is added to a Stage, its members are created as
+    Tasks without description, which is expanded from the template once an attribute of the description of a member
+    is accessed. Members which are not expanded are sent between the EnTK components as their index, state and
+    parents, with one copy of the template per message.
+
+    :arguments:
+        :template: Task describing all members, it is not part of the array
+        :size: number of members, indexed from 0, at least 1
+        :params: list with one dict of placeholder values per member, sets the size if it is not given
+    """
+
+    def __init__(self, template, size=None, params=None):
+
+        if not isinstance(template, Task):
+            raise TypeError(expected_type=Task, actual_type=type(template))
+
+        template._validate()
+
+        if params is not None:
+
+            if not isinstance(params, list):
+                raise TypeError(expected_type=list, actual_type=type(params))
+
+            for row in params:
+                if not isinstance(row, dict):
+                    raise TypeError(entity='params', expected_type=dict, actual_type=type(row))
+
+            if size is None:
+                size = len(params)
+
+            elif size != len(params):
+                raise ValueError(obj='TaskArray',
+                                 attribute='size',
+                                 expected_value=len(params),
+                                 actual_value=size)
+
+        if not isinstance(size, (int, long)) or isinstance(size, bool):
+            raise TypeError(entity='size', expected_type=int, actual_type=type(size))
+
+        if size <= 0:
+            raise ValueError(obj='TaskArray',
+                             attribute='size',
+                             expected_value='a positive number',
+                             actual_value=size)
+
+        # The template is copied, later changes of the template Task do not change the array
+        self._template = template._description()
+
+        for attr in _LIST_ATTRS:
+            self._template[attr] = list(self._template[attr])
+
+        # Members of a named template get distinct names
+        if self._template['name'] and not _has_placeholder(self._template['name']):
+            self._template['name'] = '%s-{index}' % self._template['name']
+
+        self._size = size
+        self._params = params
+
+        self._find_placeholders()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Getter functions
+    # ------------------------------------------------------------------------------------------------------------------
+
+    @property
+    def size(self):
+        """
+        :getter: Returns the number of members of the array
+        """
+
+        return self._size
+
+    @property
+    def params(self):
+        """
+        :getter: Returns the placeholder values of the members, None if the members differ by their index only
+        """
+
+        return self._params
+
+    def __len__(self):
+
+        return self._size
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Private methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def _members(self):
+        """
+        Purpose: Create the members of the array, as Tasks without description.
+
+        :return: list of Tasks
+        """
+
+        members = list()
+
+        for index in xrange(self._size):
+
+            task = Task()
+            task._array = self
+            task._index = index
+            members.append(task)
+
+        return members
+
+    def _describe(self, index):
+        """
+        Purpose: Return the description of the member 'index', as dictionary in the format of `Task.to_dict`. All
+        lists and dicts of the description are copies.
+        """
+
+        values = {'index': index}
+
+        if self._params:
+            values.update(self._params[index])
+
+        description = dict(self._template)
+
+        for attr in _LIST_ATTRS:
+            description[attr] = list(description[attr])
+
+        description['cpu_reqs'] = dict(description['cpu_reqs'])
+        description['gpu_reqs'] = dict(description['gpu_reqs'])
+
+        for attr, positions in self._placeholders.iteritems():
+
+            if positions is None:
+                description[attr] = _substitute(description[attr], values)
+            else:
+                items = description[attr]
+                for pos in positions:
+                    items[pos] = _substitute(items[pos], values)
+
+        return description
+
+    def _to_dict(self):
+        """
+        Purpose: Return the array as dictionary for a message. The placeholder values are sent with the members.
+        """
+
+        return {'template': self._template,
+                'size': self._size}
+
+    @classmethod
+    def _from_dict(cls, d):
+        """
+        Purpose: Create an array from a dictionary produced by `_to_dict`. The placeholder values of the members are
+        added to 'params', indexed by the index of the member, as the members are decoded.
+        """
+
+        array = cls.__new__(cls)
+
+        array._template = d['template']
+        array._size = d['size']
+        array._params = dict()
+
+        array._find_placeholders()
+
+        return array
+
+    def _find_placeholders(self):
+        """
+        Purpose: Find the attributes of the template holding placeholders, so that only these are substituted for
+        each member. Strings map to None, lists to the positions of their items holding placeholders.
+        """
+
+        self._placeholders = dict()
+
+        for attr in _STR_ATTRS:
+            if _has_placeholder(self._template[attr]):
+                self._placeholders[attr] = None
+
+        for attr in _LIST_ATTRS:
+
+            positions = [pos for pos, item in enumerate(self._template[attr]) if _has_placeholder(item)]
+
+            if positions:
+                self._placeholders[attr] = positions
+
+
+def _has_placeholder(value):
+
+    return isinstance(value, basestring) and _PLACEHOLDER.search(value) is not None
+
+
+def _substitute(string, values):
+    """
+    Purpose: Replace the placeholders of 'string' which have a value in 'values'.
+    """
+
+    def replace(match):
+
+        key = match.group(1)
+
+        if key in values:
+            return '%s' % (values[key],)
+
+        return match.group(0)
+
+    return _PLACEHOLDER.sub(replace, string)
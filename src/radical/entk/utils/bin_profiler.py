@@ -0,0 +1,317 @@
+import os
+import glob
+import errno
+import time
+import atexit
+import socket
+import struct
+import weakref
+import threading
+import radical.utils as ru
+from radical.entk.exceptions import *
+
+
+# Profiling mode: 'text' writes .prof files via ru.Profiler, 'binary' buffers fixed-width records and writes .bprof
+# files, which are converted to .prof files by convert_profiles()
+PROFILE_MODE = os.getenv('ENTK_PROFILE_MODE', 'text')
+
+# Number of events a BinaryProfiler buffers before writing them in one go
+PROF_BUFFER = int(os.getenv('ENTK_PROF_BUFFER', 4096))
+
+# Header of the .prof files, as written by ru.Profiler
+PROF_HEADER = '#time,event,comp,thread,uid,state,msg\n'
+
+_MAGIC = 'ENTKBPROF1'
+
+# A .bprof file starts with the magic string and the name of the profiler. It is followed by records: an event is a
+# kind byte, its time and the codes of its event, uid, state, msg and thread. The codes refer to the strings defined
+# before by string records: kind byte, code and length of the string.
+_HEADER = struct.Struct('<10sI')
+_EVENT = struct.Struct('<cdIIIII')
+_STRING = struct.Struct('<cII')
+
+# Profilers of this process, flushed by flush_profilers()
+_profilers = weakref.WeakSet()
+
+
+def profiling_enabled():
+
+    return bool(os.environ.get('RADICAL_ENTK_PROFILE') or os.environ.get('RADICAL_PROFILE'))
+
+
+def get_profiler(name, path):
+    """
+    **Purpose**: Create the profiler 'name' writing to the folder 'path': a BinaryProfiler if profiling is enabled and
+    $ENTK_PROFILE_MODE is 'binary', a ru.Profiler otherwise.
+    """
+
+    if PROFILE_MODE == 'binary' and profiling_enabled():
+        return BinaryProfiler(name=name, path=path)
+
+    return ru.Profiler(name=name, path=path)
+
+
+def flush_profilers():
+    """
+    **Purpose**: Write the buffered events of all BinaryProfilers of this process
+    """
+
+    for profiler in list(_profilers):
+        profiler.flush()
+
+
+class BinaryProfiler(object):
+
+    """
+    A BinaryProfiler is a drop-in replacement for ru.Profiler with a lower overhead per event. Events are packed into
+    fixed-width binary records and buffered in memory, the buffer is written to '<path>/<name>.bprof' once it holds
+    PROF_BUFFER events, on flush() and on close(). Event names, uids, states, msgs and thread names are interned: every
+    distinct string is written to the file once and referred to by its code afterwards.
+
+    The files are converted to the .prof format of ru.Profiler by convert_profiles().
+
+    Every profiler and every process using a profiler inherited via fork writes to a file of its own, e.g.
+    '<path>/<name>.1.bprof' if '<path>/<name>.bprof' exists. Events buffered before a fork are written by the parent
+    only.
+    """
+
+    def __init__(self, name, path=None):
+
+        self._name = name
+        self._path = path or os.getcwd()
+        self._lock = threading.Lock()
+
+        self._open()
+
+        _profilers.add(self)
+
+        try:
+            hostname = socket.gethostname()
+            ip = socket.gethostbyname(hostname)
+        except socket.error:
+            hostname, ip = 'localhost', '127.0.0.1'
+
+        now = time.time()
+        self.prof('sync_abs', msg='%s:%s:%s:%s:%s' % (hostname, ip, now, now, 'sys'), timestamp=now)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Getter functions
+    # ------------------------------------------------------------------------------------------------------------------
+
+    @property
+    def enabled(self):
+
+        return True
+
+    @property
+    def path(self):
+        """
+        :getter: Returns the file the events of this process are written to
+        """
+
+        return self._file_path
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Public methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def prof(self, event, uid=None, state=None, msg=None, timestamp=None, logger=None, comp=None, tid=None):
+
+        if not timestamp:
+            timestamp = time.time()
+
+        if not tid:
+            tid = threading.current_thread().name
+
+        with self._lock:
+
+            if os.getpid() != self._pid:
+                self._open()
+
+            self._buffer.append(_EVENT.pack('E', timestamp,
+                                            self._intern(event),
+                                            self._intern(uid),
+                                            self._intern(state),
+                                            self._intern(msg),
+                                            self._intern(tid)))
+
+            if len(self._buffer) >= PROF_BUFFER:
+                self._flush()
+
+    def flush(self):
+
+        with self._lock:
+
+            if os.getpid() == self._pid:
+                self._flush()
+
+    def close(self):
+
+        self.flush()
+        _profilers.discard(self)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Private methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def _open(self):
+        """
+        Start a new file for the current process, with its own string table
+        """
+
+        self._pid = os.getpid()
+        self._buffer = list()
+        self._strings = {'': 0}
+
+        if not os.path.isdir(self._path):
+            try:
+                os.makedirs(self._path)
+            except OSError:
+                pass
+
+        cnt = 0
+
+        while True:
+
+            if cnt:
+                path = os.path.join(self._path, '%s.%s.bprof' % (self._name, cnt))
+            else:
+                path = os.path.join(self._path, '%s.bprof' % self._name)
+
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+
+            except OSError as ex:
+                if ex.errno != errno.EEXIST:
+                    raise
+                cnt += 1
+
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(_HEADER.pack(_MAGIC, len(self._name)) + self._name)
+
+        self._file_path = path
+
+    def _intern(self, string):
+
+        if string is None:
+            return 0
+
+        if not isinstance(string, basestring):
+            string = str(string)
+
+        code = self._strings.get(string)
+
+        if code is None:
+
+            code = len(self._strings)
+            self._strings[string] = code
+
+            if isinstance(string, unicode):
+                data = string.encode('utf-8')
+            else:
+                data = string
+
+            self._buffer.append(_STRING.pack('S', code, len(data)) + data)
+
+        return code
+
+    def _flush(self):
+
+        if not self._buffer:
+            return
+
+        with open(self._file_path, 'ab') as fp:
+            fp.write(''.join(self._buffer))
+
+        self._buffer = list()
+
+
+def read_binary_profile(path):
+    """
+    **Purpose**: Read the events of the .bprof file 'path'. A record truncated by a killed process ends the file.
+
+    :return: (name of the profiler, list of (time, event, thread, uid, state, msg) tuples)
+    """
+
+    with open(path, 'rb') as fp:
+        data = fp.read()
+
+    if len(data) < _HEADER.size or data[:len(_MAGIC)] != _MAGIC:
+        raise EnTKError('%s is not a binary profile' % path)
+
+    _, length = _HEADER.unpack_from(data, 0)
+    offset = _HEADER.size + length
+    name = data[_HEADER.size:offset]
+    strings = ['']
+    events = list()
+
+    while offset < len(data):
+
+        kind = data[offset]
+
+        if kind == 'E':
+
+            if offset + _EVENT.size > len(data):
+                break
+
+            _, timestamp, event, uid, state, msg, tid = _EVENT.unpack_from(data, offset)
+            events.append((timestamp, strings[event], strings[tid], strings[uid], strings[state], strings[msg]))
+            offset += _EVENT.size
+
+        elif kind == 'S':
+
+            if offset + _STRING.size > len(data):
+                break
+
+            _, code, length = _STRING.unpack_from(data, offset)
+            offset += _STRING.size
+
+            if offset + length > len(data):
+                break
+
+            strings.append(data[offset:offset + length])
+            offset += length
+
+        else:
+            raise EnTKError('Corrupt record at byte %s of %s' % (offset, path))
+
+    return name, events
+
+
+def convert_profiles(src):
+    """
+    **Purpose**: Convert the .bprof files in the folder 'src' to .prof files as written by ru.Profiler, so that they
+    can be analysed by radical.analytics and get_session_profile(). The files of the processes forked from one
+    profiler are merged into the .prof file of the profiler.
+
+    :return: list of the .prof files written
+    """
+
+    converted = dict()
+
+    for path in sorted(glob.glob(os.path.join(src, '*.bprof'))):
+
+        name, events = read_binary_profile(path)
+        converted.setdefault(name, list()).extend(events)
+
+    written = list()
+
+    for name, events in converted.items():
+
+        events.sort(key=lambda event: event[0])
+        prof_path = os.path.join(src, '%s.prof' % name)
+
+        with open(prof_path, 'w') as fp:
+
+            fp.write(PROF_HEADER)
+
+            for timestamp, event, tid, uid, state, msg in events:
+                fp.write('%.4f,%s,%s,%s,%s,%s,%s\n' % (timestamp, event, name, tid, uid, state, msg))
+
+        written.append(prof_path)
+
+    return written
+
+
+atexit.register(flush_profilers)
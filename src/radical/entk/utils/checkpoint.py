@@ -0,0 +1,187 @@
+import os
+import re
+import json
+import radical.utils as ru
+from radical.entk.exceptions import *
+from radical.entk.pipeline.pipeline import Pipeline
+from radical.entk.stage.stage import Stage
+from radical.entk.task.task import Task
+from radical.entk.utils.placeholder_store import PlaceholderStore
+from radical.entk import states
+
+
+# Name of the checkpoint file in the session folder
+CHECKPOINT_FILE = 'checkpoint.json'
+
+# Uids generated by EnTK, e.g. 'task.0042'
+_UID = re.compile(r'^(pipeline|stage|task)\.(\d+)$')
+
+
+def write_checkpoint(workflow, sid):
+    """
+    **Purpose**: Write the state of all pipelines, stages and tasks of 'workflow', including the current stage of each
+    pipeline and the paths of the tasks, to the checkpoint file in the session folder 'sid'. The file is replaced
+    atomically, a killed client leaves the previous checkpoint in place.
+    """
+
+    pipelines = list()
+
+    for pipe in list(workflow):
+
+        p = pipe.to_dict()
+        p['current_stage'] = pipe.current_stage
+        p['stages'] = list()
+
+        for stage in list(pipe.stages):
+
+            s = stage.to_dict()
+            s['tasks'] = [task.to_dict() for task in list(stage.tasks)]
+            p['stages'].append(s)
+
+        pipelines.append(p)
+
+    try:
+        os.mkdir(sid)
+    except OSError:
+        pass
+
+    path = os.path.join(sid, CHECKPOINT_FILE)
+    tmp = '%s.tmp' % path
+
+    with open(tmp, 'w') as fp:
+        json.dump({'sid': sid, 'pipelines': pipelines}, fp)
+
+    os.rename(tmp, path)
+
+
+def read_checkpoint(session_dir):
+    """
+    **Purpose**: Read the checkpoint file in the session folder 'session_dir'.
+    """
+
+    path = os.path.join(session_dir, CHECKPOINT_FILE)
+
+    if not os.path.isfile(path):
+        raise EnTKError('No checkpoint found at %s' % path)
+
+    return ru.read_json(path)
+
+
+def restore_workflow(checkpoint, workflow=None):
+    """
+    **Purpose**: Rebuild the workflow of a checkpoint with its uids, so that it can be resumed. DONE stages and the
+    DONE and FAILED tasks keep their state, all other stages and tasks are reset to INITIAL to be resubmitted. The
+    current stage of each pipeline is moved past the stages that are complete.
+
+    The post_exec of stages cannot be checkpointed. It is taken from 'workflow', if given, matching pipelines by name
+    and stages by position.
+
+    :return: set of Pipelines
+    """
+
+    post_execs = dict()
+
+    for pipe in workflow or list():
+        for cnt, stage in enumerate(pipe.stages):
+            if stage.post_exec['condition']:
+                post_execs[(pipe.name, cnt)] = stage.post_exec
+
+    restored = set()
+
+    for p in checkpoint['pipelines']:
+
+        pipe = Pipeline()
+        stages = list()
+
+        for cnt, s in enumerate(p['stages']):
+
+            tasks = list()
+
+            for t in s['tasks']:
+
+                task = Task._from_trusted_dict(t)
+
+                if task.state not in [states.DONE, states.FAILED]:
+                    task.state = states.INITIAL
+
+                tasks.append(task)
+
+            stage = Stage()
+            stage.from_dict(s)
+            stage.tasks = tasks
+
+            if stage.state != states.DONE:
+
+                if stage._check_stage_complete():
+                    stage.state = states.DONE
+                else:
+                    stage.state = states.INITIAL
+
+            if (p['name'], cnt) in post_execs:
+                stage.post_exec = post_execs[(p['name'], cnt)]
+
+            stages.append(stage)
+
+        pipe.stages = stages
+        pipe.from_dict(p)
+        pipe._cur_stage = max(p['current_stage'], 1)
+
+        # Skip the stages which are complete
+        while (not pipe.completed) and stages[pipe._cur_stage - 1].state == states.DONE:
+
+            pipe._increment_stage()
+
+            if pipe.completed:
+                pipe.state = states.DONE
+
+        restored.add(pipe)
+
+    return restored
+
+
+def restore_id_counters(workflow, sid):
+    """
+    **Purpose**: Advance the uid counters of the namespace 'sid' beyond the uids of a restored workflow, so that
+    pipelines, stages and tasks added to it get new uids.
+    """
+
+    counters = {'pipeline': -1, 'stage': -1, 'task': -1}
+
+    def count(uid):
+
+        match = _UID.match(uid or '')
+        if match:
+            counters[match.group(1)] = max(counters[match.group(1)], int(match.group(2)))
+
+    for pipe in workflow:
+        count(pipe.uid)
+        for stage in pipe.stages:
+            count(stage.uid)
+            for task in stage.tasks:
+                count(task.uid)
+
+    for prefix, last in counters.items():
+        for _ in range(last + 1):
+            ru.generate_id('%s.%%(item_counter)04d' % prefix, ru.ID_CUSTOM, namespace=sid)
+
+
+def seed_placeholders(workflow, path):
+    """
+    **Purpose**: Add the paths of the DONE tasks of a restored workflow to the PlaceholderStore file 'path' of the task
+    manager, so that placeholders referring to them resolve.
+    """
+
+    folder = os.path.dirname(path)
+
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+
+    store = PlaceholderStore(path=path)
+
+    for pipe in workflow:
+        for stage in pipe.stages:
+            for task in stage.tasks:
+                if task.state == states.DONE and task.path and task.name is not None:
+                    store.add(pipe.name, stage.name, task.name, task.path)
+
+    store.close()
@@ -0,0 +1,161 @@
+import os
+import json
+import cPickle
+from radical.entk.exceptions import *
+from radical.entk.task.task import Task
+from radical.entk.task.task_array import TaskArray
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# Codecs Task messages can be encoded with
+CODECS = ['json', 'pickle', 'msgpack']
+
+# Codec used to encode the Task messages between the WFprocessor and the TaskManager
+TASK_CODEC = os.getenv('ENTK_TASK_CODEC', 'json')
+
+# Header of msgpack encoded messages. JSON messages start with '[' or '{', pickled messages with '\x80'.
+_MSGPACK_HEADER = '\x01'
+_PICKLE_HEADER = '\x80'
+_JSON_HEADERS = ('[', '{')
+
+
+def encode_tasks(tasks, codec=None):
+    """
+    **Purpose**: Encode the list of Tasks 'tasks' as message body with 'codec', by default TASK_CODEC. JSON messages
+    can be read by any EnTK component, 'pickle' and 'msgpack' messages are more compact and faster to encode and
+    decode. Messages are decoded by decode_tasks() with the same codec. 'msgpack' requires msgpack>=0.5.2, installed
+    with the 'msgpack' extra of radical.entk.
+
+    Unpickling a message can run arbitrary code: use 'pickle' only if no one but EnTK can publish to the queues of
+    the session.
+
+    Members of TaskArrays which are not expanded are encoded compactly: the message holds the template of each array
+    once, and for each member its index, placeholder values, state and parents.
+    """
+
+    if not codec:
+        codec = TASK_CODEC
+
+    tasks_as_dict = list()
+
+    # Position of each TaskArray in the message, by id
+    arrays = dict()
+    arrays_as_dict = list()
+
+    for task in tasks:
+
+        if task._array is None:
+            tasks_as_dict.append(task.to_dict())
+            continue
+
+        array = task._array
+
+        if id(array) not in arrays:
+            arrays[id(array)] = len(arrays_as_dict)
+            arrays_as_dict.append(array._to_dict())
+
+        member_as_dict = task._to_member_dict()
+        member_as_dict['array'] = arrays[id(array)]
+        member_as_dict['index'] = task._index
+
+        if array._params:
+            member_as_dict['params'] = array._params[task._index]
+
+        tasks_as_dict.append(member_as_dict)
+
+    if arrays_as_dict:
+        tasks_as_dict = {'arrays': arrays_as_dict, 'tasks': tasks_as_dict}
+
+    if codec == 'json':
+        return json.dumps(tasks_as_dict)
+
+    elif codec == 'pickle':
+        return cPickle.dumps(tasks_as_dict, cPickle.HIGHEST_PROTOCOL)
+
+    elif codec == 'msgpack':
+
+        if not msgpack:
+            raise EnTKError('Task codec msgpack requires the msgpack module')
+
+        return _MSGPACK_HEADER + msgpack.packb(tasks_as_dict, use_bin_type=True)
+
+    raise ValueError(obj='codec', attribute='codec', expected_value=CODECS, actual_value=codec)
+
+
+def decode_tasks(body, codec=None):
+    """
+    **Purpose**: Decode a message body holding one Task or a list of Tasks, encoded with 'codec', by default
+    TASK_CODEC. Bodies not encoded with 'codec' are rejected, so that e.g. a pickled body is never unpickled if the
+    codec is 'json'. The Tasks are trusted internal messages and are created without validating their fields.
+    Members of TaskArrays are decoded as members of a copy of their array, their description is expanded once it is
+    accessed.
+
+    :return: list of Tasks
+    """
+
+    if not codec:
+        codec = TASK_CODEC
+
+    if codec == 'json':
+
+        if not body.lstrip().startswith(_JSON_HEADERS):
+            raise EnTKError('Task message is not encoded with codec json')
+
+        tasks_as_dict = json.loads(body)
+
+    elif codec == 'pickle':
+
+        if not body.startswith(_PICKLE_HEADER):
+            raise EnTKError('Task message is not encoded with codec pickle')
+
+        tasks_as_dict = cPickle.loads(body)
+
+    elif codec == 'msgpack':
+
+        if not msgpack:
+            raise EnTKError('Task codec msgpack requires the msgpack module')
+
+        if not body.startswith(_MSGPACK_HEADER):
+            raise EnTKError('Task message is not encoded with codec msgpack')
+
+        tasks_as_dict = msgpack.unpackb(body[len(_MSGPACK_HEADER):], raw=False)
+
+    else:
+        raise ValueError(obj='codec', attribute='codec', expected_value=CODECS, actual_value=codec)
+
+    if isinstance(tasks_as_dict, dict):
+
+        if 'arrays' not in tasks_as_dict:
+            return [Task._from_trusted_dict(tasks_as_dict)]
+
+        return _decode_members(tasks_as_dict)
+
+    return [Task._from_trusted_dict(task_as_dict) for task_as_dict in tasks_as_dict]
+
+
+def _decode_members(message):
+    """
+    Purpose: Decode a message holding members of TaskArrays, and possibly other Tasks.
+    """
+
+    arrays = [TaskArray._from_dict(array_as_dict) for array_as_dict in message['arrays']]
+    tasks = list()
+
+    for task_as_dict in message['tasks']:
+
+        if 'array' not in task_as_dict:
+            tasks.append(Task._from_trusted_dict(task_as_dict))
+            continue
+
+        array = arrays[task_as_dict['array']]
+
+        if 'params' in task_as_dict:
+            array._params[task_as_dict['index']] = task_as_dict['params']
+
+        tasks.append(Task._from_member_dict(task_as_dict, array))
+
+    return tasks
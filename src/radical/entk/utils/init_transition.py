@@ -1,7 +1,27 @@
-from sync_initiator import sync_with_master
+from sync_initiator import sync_with_master, SyncInitiator
 
 
-def transition(obj, obj_type, new_state, channel, queue, profiler, logger):
+def transition(obj, obj_type, new_state, channel, queue, profiler, logger, syncer=None, blocking=False):
+    """
+    **Purpose**: Move 'obj' to 'new_state' and communicate the change to the AppManager.
+
+    If a SyncInitiator is passed as 'syncer', the update is published through it and the call only waits for the
+    acknowledgement of the AppManager if 'blocking' is True. Without a 'syncer', every transition is a blocking
+    round-trip to the AppManager.
+    """
+
+    def sync():
+
+        if syncer:
+            syncer.sync(obj=obj, obj_type=obj_type, blocking=blocking)
+
+        else:
+            sync_with_master(obj=obj,
+                             obj_type=obj_type,
+                             channel=channel,
+                             queue=queue,
+                             logger=logger,
+                             local_prof=profiler)
 
     try:
         old_state = obj.state
@@ -19,23 +39,80 @@ def transition(obj, obj_type, new_state, channel, queue, profiler, logger):
                       state=obj.state,
                       msg=msg)
 
-        sync_with_master(obj=obj,
-                         obj_type=obj_type,
-                         channel=channel,
-                         queue=queue,
-                         logger=logger,
-                         local_prof=profiler)
+        sync()
 
-        logger.info('Transition of %s to new state %s successful' % (obj.uid, new_state))
+        logger.debug('Transition of %s to new state %s successful', obj.uid, new_state)
 
     except Exception, ex:
 
         logger.exception('Transition of %s to %s state failed, error: %s' % (obj.uid, new_state, ex))
         obj.state = old_state
-        sync_with_master(obj=obj,
-                         obj_type=obj_type,
-                         channel=channel,
-                         queue=queue,
-                         logger=logger,
-                         local_prof=profiler)
+        sync()
+        raise
+
+
+def bulk_transition(objs, obj_type, new_state, channel, queue, profiler, logger, syncer=None, blocking=False):
+    """
+    **Purpose**: Move all objects in 'objs' to 'new_state' and communicate the change to the AppManager as one
+    message, which the AppManager applies and acknowledges as a unit.
+
+    If a SyncInitiator is passed as 'syncer', the update is published through it and the call only waits for the
+    acknowledgement of the AppManager if 'blocking' is True. Without a 'syncer', the call is a blocking
+    round-trip to the AppManager through a temporary SyncInitiator.
+    """
+
+    objs = list(objs)
+    if not objs:
+        return
+
+    # A temporary SyncInitiator stops consuming from the reply queue once done, see SyncInitiator.close()
+    temporary = not syncer
+
+    if temporary:
+        syncer = SyncInitiator(channel=channel, queue=queue, logger=logger, profiler=profiler)
+        blocking = True
+
+    try:
+        _bulk_transition(objs, obj_type, new_state, profiler, logger, syncer, blocking)
+
+    finally:
+        if temporary:
+            syncer.close()
+
+
+def _bulk_transition(objs, obj_type, new_state, profiler, logger, syncer, blocking):
+
+    old_states = list()
+
+    try:
+
+        for obj in objs:
+
+            old_states.append(obj.state)
+            obj.state = new_state
+
+            if obj_type == 'Task':
+                msg = obj.parent_stage['uid']
+            elif obj_type == 'Stage':
+                msg = obj.parent_pipeline['uid']
+            else:
+                msg = None
+
+            profiler.prof('advance',
+                          uid=obj.uid,
+                          state=obj.state,
+                          msg=msg)
+
+        syncer.sync_bulk(objs=objs, obj_type=obj_type, blocking=blocking)
+
+        logger.info('Transition of %s %ss to new state %s successful', len(objs), obj_type, new_state)
+
+    except Exception, ex:
+
+        logger.exception('Transition of %s %ss to %s state failed, error: %s' % (len(objs), obj_type, new_state, ex))
+
+        for obj, old_state in zip(objs, old_states):
+            obj.state = old_state
+
+        syncer.sync_bulk(objs=objs[:len(old_states)], obj_type=obj_type, blocking=blocking)
         raise
@@ -0,0 +1,478 @@
+import time
+import uuid
+import pika
+import threading
+from collections import deque
+from multiprocessing import current_process
+from multiprocessing.managers import BaseManager
+from radical.entk.exceptions import *
+
+
+# Time (secs) a consumer waiting without time limit re-checks the broker
+_POLL_INTERVAL = 1.0
+
+
+class LocalBroker(object):
+
+    """
+    A LocalBroker holds message queues with the subset of the RabbitMQ semantics EnTK relies on: a message is
+    delivered to one consumer, messages unacknowledged when the connection of their consumer is closed are requeued,
+    exclusive queues are deleted together with the connection which declared them and messages published to a queue
+    which does not exist are dropped.
+
+    The broker lives in a server process started via start_local_broker() and is shared by all processes forked
+    afterwards. Every method is called by the LocalConnection 'conn_id' of a client.
+    """
+
+    def __init__(self):
+
+        # queue name --> deque of (body, properties)
+        self._queues = dict()
+
+        # delivery tag --> (conn_id, queue name, body, properties)
+        self._unacked = dict()
+
+        # conn_id --> set of exclusive queue names
+        self._exclusive = dict()
+
+        self._tag = 0
+        self._next = 0
+        self._cond = threading.Condition()
+
+    def queue_declare(self, conn_id, queue, exclusive, passive=False):
+        """
+        **Purpose**: Declare the queue 'queue', a new queue with a generated name if 'queue' is empty. A passive
+        declare only checks that the queue exists.
+
+        :return: (queue, number of messages in the queue), None for a passive declare of a missing queue
+        """
+
+        with self._cond:
+
+            if passive:
+
+                if queue not in self._queues:
+                    return None
+
+                return queue, len(self._queues[queue])
+
+            if not queue:
+                queue = 'amq.gen-%s' % uuid.uuid4()
+
+            if queue not in self._queues:
+                self._queues[queue] = deque()
+
+            if exclusive:
+                self._exclusive.setdefault(conn_id, set()).add(queue)
+
+            return queue, len(self._queues[queue])
+
+    def queue_delete(self, queue):
+
+        with self._cond:
+            self._queues.pop(queue, None)
+
+    def publish(self, queue, body, props):
+
+        with self._cond:
+
+            if queue in self._queues:
+                self._queues[queue].append((body, props))
+                self._cond.notify_all()
+
+    def get(self, conn_id, queues, timeout):
+        """
+        **Purpose**: Deliver the first message of any of 'queues' to 'conn_id', wait up to 'timeout' secs for one to
+        arrive. The queues are served round-robin.
+
+        :return: (delivery tag, queue, body, properties) or None
+        """
+
+        deadline = time.time() + timeout
+
+        with self._cond:
+
+            while True:
+
+                self._next += 1
+
+                for cnt in range(len(queues)):
+
+                    queue = queues[(self._next + cnt) % len(queues)]
+                    msgs = self._queues.get(queue)
+
+                    if msgs:
+
+                        body, props = msgs.popleft()
+
+                        self._tag += 1
+                        self._unacked[self._tag] = (conn_id, queue, body, props)
+
+                        return self._tag, queue, body, props
+
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+
+                self._cond.wait(remaining)
+
+    def ack(self, tag):
+
+        with self._cond:
+            self._unacked.pop(tag, None)
+
+    def reject(self, tag):
+
+        with self._cond:
+            self._requeue([tag])
+
+    def requeue(self, tags):
+        """
+        **Purpose**: Requeue the messages of 'tags' which are not acknowledged yet.
+
+        :return: number of messages requeued
+        """
+
+        with self._cond:
+            return self._requeue(tags)
+
+    def close(self, conn_id):
+
+        with self._cond:
+
+            self._requeue([tag for tag, msg in self._unacked.iteritems() if msg[0] == conn_id])
+
+            for queue in self._exclusive.pop(conn_id, set()):
+                self._queues.pop(queue, None)
+
+    def _requeue(self, tags):
+
+        requeued = 0
+
+        # Requeued messages keep their original order at the head of their queue
+        for tag in sorted(tags, reverse=True):
+
+            if tag not in self._unacked:
+                continue
+
+            conn_id, queue, body, props = self._unacked.pop(tag)
+
+            if queue in self._queues:
+                self._queues[queue].appendleft((body, props))
+                requeued += 1
+
+        self._cond.notify_all()
+
+        return requeued
+
+
+class _BrokerManager(BaseManager):
+    pass
+
+
+# Instance served by the broker server process
+_broker = None
+
+
+def _get_broker():
+
+    global _broker
+
+    if _broker is None:
+        _broker = LocalBroker()
+
+    return _broker
+
+
+_BrokerManager.register('get_broker', callable=_get_broker)
+
+# Broker server of this process or of the process it was forked from
+_manager = None
+_address = None
+_authkey = None
+
+
+def start_local_broker():
+    """
+    **Purpose**: Start the broker server process of the local transport, unless already running. The broker is
+    available to this process and to all processes forked afterwards, it is shut down when this process exits.
+    """
+
+    global _manager, _address, _authkey
+
+    if _manager is None:
+
+        _manager = _BrokerManager()
+        _manager.start()
+
+        _address = _manager.address
+        _authkey = current_process().authkey
+
+
+def local_broker_running():
+    """
+    **Purpose**: Return True if the broker of the local transport is available to this process.
+    """
+
+    return _address is not None
+
+
+class _Method(object):
+
+    def __init__(self, delivery_tag=None, queue=None, message_count=None):
+
+        self.delivery_tag = delivery_tag
+        self.queue = queue
+        self.message_count = message_count
+
+
+class _Properties(object):
+
+    def __init__(self, correlation_id=None, reply_to=None):
+
+        self.correlation_id = correlation_id
+        self.reply_to = reply_to
+
+
+class _DeclareOk(object):
+
+    def __init__(self, queue, message_count):
+
+        self.method = _Method(queue=queue, message_count=message_count)
+
+
+class LocalConnection(object):
+
+    """
+    A LocalConnection connects to the broker of the local transport. It provides the subset of the interface of
+    pika.BlockingConnection EnTK uses: consumer callbacks are dispatched in process_data_events() and sleep(), but
+    not in nested calls from a callback.
+    """
+
+    def __init__(self):
+
+        if not local_broker_running():
+            raise EnTKError('Local broker not started')
+
+        manager = _BrokerManager(address=_address, authkey=_authkey)
+        manager.connect()
+
+        self._broker = manager.get_broker()
+        self._id = str(uuid.uuid4())
+        self._channels = list()
+        self._dispatching = False
+        self.is_open = True
+
+    @property
+    def is_closed(self):
+        return not self.is_open
+
+    def channel(self):
+
+        channel = LocalChannel(self, self._broker, self._id)
+        self._channels.append(channel)
+
+        return channel
+
+    def process_data_events(self, time_limit=0):
+
+        consumers = self._consumers()
+
+        # Callbacks are not dispatched in nested calls
+        if self._dispatching or not consumers:
+
+            if time_limit:
+                time.sleep(time_limit)
+
+            return
+
+        if time_limit is None:
+
+            msg = None
+            while not msg:
+                msg = self._broker.get(self._id, consumers.keys(), _POLL_INTERVAL)
+
+        else:
+            msg = self._broker.get(self._id, consumers.keys(), time_limit)
+
+        self._dispatching = True
+
+        try:
+
+            while msg:
+
+                tag, queue, body, props = msg
+
+                if queue in consumers:
+                    channel, callback = consumers[queue]
+                    callback(channel, _Method(delivery_tag=tag), _Properties(**props), body)
+
+                else:
+                    # Consumer cancelled meanwhile
+                    self._broker.reject(tag)
+
+                consumers = self._consumers()
+                if not consumers:
+                    break
+
+                msg = self._broker.get(self._id, consumers.keys(), 0)
+
+        finally:
+            self._dispatching = False
+
+    def sleep(self, duration):
+
+        deadline = time.time() + duration
+
+        while True:
+
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+
+            self.process_data_events(time_limit=remaining)
+
+    def close(self):
+
+        if self.is_open:
+
+            self.is_open = False
+
+            for channel in self._channels:
+                channel.is_open = False
+
+            self._broker.close(self._id)
+
+    def _consumers(self):
+
+        # queue name --> (channel, callback)
+        consumers = dict()
+
+        for channel in self._channels:
+            for queue, callback in channel._consumers.itervalues():
+                consumers[queue] = (channel, callback)
+
+        return consumers
+
+
+class LocalChannel(object):
+
+    """
+    A LocalChannel provides the subset of the interface of pika.adapters.blocking_connection.BlockingChannel EnTK
+    uses. Messages are fetched from the broker one by one, the prefetch count is ignored.
+    """
+
+    def __init__(self, connection, broker, conn_id):
+
+        self.connection = connection
+        self.is_open = True
+
+        self._broker = broker
+        self._conn_id = conn_id
+
+        # consumer tag --> (queue name, callback)
+        self._consumers = dict()
+
+        # delivery tags of the messages yielded by consume() and not acknowledged yet, requeued by cancel()
+        self._consumed = set()
+
+    @property
+    def is_closed(self):
+        return not self.is_open
+
+    def basic_qos(self, prefetch_size=0, prefetch_count=0, all_channels=False):
+        pass
+
+    def queue_declare(self, queue='', exclusive=False, passive=False, **kwargs):
+
+        declared = self._broker.queue_declare(self._conn_id, queue, exclusive, passive)
+
+        # A passive declare of a missing queue fails, as with RabbitMQ
+        if declared is None:
+            raise pika.exceptions.ChannelClosed(404, "NOT_FOUND - no queue '%s'" % queue)
+
+        queue, message_count = declared
+
+        return _DeclareOk(queue, message_count)
+
+    def queue_delete(self, queue='', **kwargs):
+
+        self._broker.queue_delete(queue)
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, **kwargs):
+
+        props = dict()
+
+        if properties:
+            props['correlation_id'] = properties.correlation_id
+            props['reply_to'] = properties.reply_to
+
+        self._broker.publish(routing_key, body, props)
+
+    def basic_consume(self, consumer_callback, queue='', consumer_tag=None, **kwargs):
+
+        if not consumer_tag:
+            consumer_tag = 'ctag-%s' % uuid.uuid4()
+
+        self._consumers[consumer_tag] = (queue, consumer_callback)
+
+        return consumer_tag
+
+    def basic_cancel(self, consumer_tag=''):
+
+        self._consumers.pop(consumer_tag, None)
+
+    def basic_ack(self, delivery_tag=0, multiple=False):
+
+        self._consumed.discard(delivery_tag)
+        self._broker.ack(delivery_tag)
+
+    def basic_get(self, queue='', no_ack=False):
+
+        msg = self._broker.get(self._conn_id, [queue], 0)
+
+        if not msg:
+            return None, None, None
+
+        tag, queue, body, props = msg
+
+        if no_ack:
+            self._broker.ack(tag)
+
+        return _Method(delivery_tag=tag), _Properties(**props), body
+
+    def consume(self, queue, inactivity_timeout=None, **kwargs):
+
+        while True:
+
+            if inactivity_timeout is None:
+                msg = self._broker.get(self._conn_id, [queue], _POLL_INTERVAL)
+            else:
+                msg = self._broker.get(self._conn_id, [queue], inactivity_timeout)
+
+            if msg:
+                tag, queue, body, props = msg
+                self._consumed.add(tag)
+                yield _Method(delivery_tag=tag), _Properties(**props), body
+
+            elif inactivity_timeout is not None:
+                yield None, None, None
+
+    def cancel(self):
+        """
+        **Purpose**: Stop consuming via consume(), the messages it yielded which are not acknowledged are requeued.
+
+        :return: number of messages requeued
+        """
+
+        tags = list(self._consumed)
+        self._consumed = set()
+
+        if not tags:
+            return 0
+
+        return self._broker.requeue(tags)
+
+    def close(self):
+
+        self.is_open = False
@@ -0,0 +1,94 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+
+# 'verbose' reports every update of a Task, Stage or Pipeline on the console, 'quiet' reports periodic summaries
+REPORT_MODE = os.getenv('ENTK_REPORT_MODE', 'verbose')
+
+# Interval (secs) between the summaries of the 'quiet' report mode
+SUMMARY_INTERVAL = float(os.getenv('ENTK_SUMMARY_INTERVAL', 5))
+
+
+def log_enabled(logger, level):
+    """
+    **Purpose**: Test if 'logger' emits messages of 'level', so that messages which would be dropped are not built.
+    """
+
+    try:
+        return logger.isEnabledFor(level)
+    except AttributeError:
+        return True
+
+
+class UpdateReporter(object):
+
+    """
+    An UpdateReporter reports the state updates applied by the AppManager on the console. In 'verbose' mode every
+    update is reported as it is applied. In 'quiet' mode updates are counted per object type and state and reported
+    as one summary every 'interval' secs, e.g. 'Update: 1240 Tasks DONE, 2 Stages DONE in last 5s'.
+
+    :arguments:
+        :report: ru.Reporter of the AppManager
+        :mode: 'verbose' or 'quiet', defaults to $ENTK_REPORT_MODE or 'verbose'
+        :interval: secs between summaries, defaults to $ENTK_SUMMARY_INTERVAL or 5
+    """
+
+    def __init__(self, report, mode=None, interval=None):
+
+        self._report = report
+        self._mode = mode or REPORT_MODE
+        self._interval = SUMMARY_INTERVAL if interval is None else interval
+
+        # (obj_type, state) --> number of updates since the last summary
+        self._counts = OrderedDict()
+        self._last = time.time()
+        self._lock = threading.Lock()
+
+    @property
+    def mode(self):
+
+        return self._mode
+
+    def update(self, obj_type, uid, state):
+        """
+        **Purpose**: Report that the object 'uid' of type 'obj_type' moved to 'state'
+        """
+
+        if self._mode != 'quiet':
+            self._report.ok('Update: ')
+            self._report.info('%s %s in state %s\n' % (obj_type, uid, state))
+            return
+
+        with self._lock:
+
+            key = (obj_type, state)
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+            if time.time() - self._last >= self._interval:
+                self._summarize()
+
+    def flush(self):
+        """
+        **Purpose**: Report the summary of the updates counted so far
+        """
+
+        with self._lock:
+            self._summarize()
+
+    def _summarize(self):
+
+        now = time.time()
+
+        if self._counts:
+
+            counts = ', '.join('%s %ss %s' % (count, obj_type, state)
+                               for (obj_type, state), count in self._counts.items())
+
+            self._report.ok('Update: ')
+            self._report.info('%s in last %ds\n' % (counts, round(now - self._last)))
+
+            self._counts = OrderedDict()
+
+        self._last = now
@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+
+# Interval (secs) at which the metrics of a component are dumped, 0 disables the dumps
+METRICS_INTERVAL = float(os.getenv('ENTK_METRICS_INTERVAL', 30))
+
+# Upper bounds (secs) of the latency buckets, from 10us to ~5.6min. Latencies beyond fall into an overflow bucket.
+BUCKETS = [1e-5 * 2 ** i for i in range(26)]
+
+
+class Histogram(object):
+
+    """
+    A Histogram counts latencies in log-spaced buckets, see BUCKETS. Memory use and cost of an observation are
+    independent of the number of observations, percentiles are estimated from the buckets.
+    """
+
+    def __init__(self):
+
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+
+        if self.min is None or value < self.min:
+            self.min = value
+
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """
+        :return: upper bound of the bucket holding the 'q'-th percentile (0 < q <= 100), at most the maximum
+            observed value. None if nothing was observed.
+        """
+
+        if not self.count:
+            return None
+
+        rank = q / 100.0 * self.count
+        seen = 0
+
+        for cnt, count in enumerate(self.counts):
+
+            seen += count
+
+            if seen >= rank:
+                if cnt < len(BUCKETS):
+                    return min(BUCKETS[cnt], self.max)
+                break
+
+        return self.max
+
+    def to_dict(self):
+
+        return {'count': self.count,
+                'sum': self.total,
+                'mean': self.total / self.count if self.count else None,
+                'min': self.min,
+                'max': self.max,
+                'p50': self.percentile(50),
+                'p90': self.percentile(90),
+                'p99': self.percentile(99),
+                'buckets': [[bound, count] for bound, count in zip(BUCKETS + ['inf'], self.counts) if count]}
+
+
+class Metrics(object):
+
+    """
+    Metrics holds the live latency histograms and gauges of one EnTK component (AppManager, WFprocessor process,
+    tmgr process) and dumps them periodically as JSON to '<path>/<name>.metrics.json', so that a running session
+    can be inspected. The file is replaced atomically at every dump.
+
+    :arguments:
+        :name: name of the component, e.g. 'radical.entk.appmanager.0000'
+        :path: folder the metrics are dumped to, usually the session folder. No dumps if not given.
+        :interval: secs between dumps, defaults to $ENTK_METRICS_INTERVAL or 30. 0 disables the dumps.
+
+    Metrics are shared by the threads of a component.
+    """
+
+    def __init__(self, name, path=None, interval=None):
+
+        self._name = name
+        self._path = path
+        self._interval = METRICS_INTERVAL if interval is None else interval
+
+        self._histograms = dict()
+        self._gauges = dict()
+        self._start = time.time()
+
+        self._lock = threading.Lock()
+        self._terminate = threading.Event()
+        self._thread = None
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Getter functions
+    # ------------------------------------------------------------------------------------------------------------------
+
+    @property
+    def name(self):
+
+        return self._name
+
+    @property
+    def path(self):
+        """
+        :getter: Returns the file the metrics are dumped to, None if they are not dumped
+        """
+
+        if not self._path:
+            return None
+
+        return os.path.join(self._path, '%s.metrics.json' % self._name)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Public methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def observe(self, name, value):
+        """
+        **Purpose**: Add the latency 'value' (secs) to the histogram 'name'
+        """
+
+        with self._lock:
+
+            if name not in self._histograms:
+                self._histograms[name] = Histogram()
+
+            self._histograms[name].observe(value)
+
+    @contextmanager
+    def timer(self, name):
+        """
+        **Purpose**: Add the time spent in the with-block to the histogram 'name'
+        """
+
+        start = time.time()
+
+        try:
+            yield
+        finally:
+            self.observe(name, time.time() - start)
+
+    def gauge(self, name, value):
+        """
+        **Purpose**: Set the gauge 'name' to its current 'value'
+        """
+
+        with self._lock:
+            self._gauges[name] = value
+
+    def to_dict(self):
+
+        with self._lock:
+
+            return {'name': self._name,
+                    'time': time.time(),
+                    'uptime': time.time() - self._start,
+                    'histograms': dict((name, hist.to_dict()) for name, hist in self._histograms.items()),
+                    'gauges': dict(self._gauges)}
+
+    def dump(self):
+        """
+        **Purpose**: Write the current metrics to the metrics file
+        """
+
+        path = self.path
+
+        if not path:
+            return
+
+        tmp = '%s.tmp' % path
+
+        with open(tmp, 'w') as fp:
+            json.dump(self.to_dict(), fp, indent=2, sort_keys=True)
+
+        os.rename(tmp, path)
+
+    def start(self):
+        """
+        **Purpose**: Start the thread dumping the metrics every 'interval' secs
+        """
+
+        if not self._interval or not self._path or self._thread:
+            return
+
+        self._terminate.clear()
+        self._thread = threading.Thread(target=self._dumper, name='metrics-dumper')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        **Purpose**: Stop the dump thread and dump the final metrics
+        """
+
+        if not self._thread:
+            return
+
+        self._terminate.set()
+        self._thread.join()
+        self._thread = None
+
+        self.dump()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Private methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def _dumper(self):
+
+        while not self._terminate.wait(self._interval):
+
+            try:
+                self.dump()
+
+            # The metrics must never take the component down
+            except (IOError, OSError):
+                pass
@@ -0,0 +1,227 @@
+import os
+import zlib
+import threading
+import pika
+from collections import deque
+from local_transport import LocalConnection, start_local_broker
+from radical.entk.exceptions import *
+
+
+# Time (secs) a consumer sleeps waiting for a message before it re-checks its termination condition
+CONSUME_TIMEOUT = float(os.getenv('ENTK_CONSUME_TIMEOUT', 1))
+
+# Maximum number of unacknowledged messages the RabbitMQ server pushes to a consumer
+PREFETCH_COUNT = int(os.getenv('ENTK_MQ_PREFETCH', 16))
+
+# Transports connections can be made with: a RabbitMQ server or the broker-less local transport
+TRANSPORTS = ['rabbitmq', 'local']
+
+# Transport of the connections of this process and of the processes forked afterwards
+_transport = 'rabbitmq'
+
+
+def set_transport(transport):
+    """
+    **Purpose**: Select the transport of the connections handed out by get_connection_manager(). The 'local'
+    transport starts its broker, which is then shared with all processes forked afterwards.
+    """
+
+    global _transport
+
+    if transport not in TRANSPORTS:
+        raise ValueError(obj='mq_utils', attribute='transport', expected_value=TRANSPORTS, actual_value=transport)
+
+    if transport == 'local':
+        start_local_broker()
+
+    _transport = transport
+
+
+def get_transport():
+    """
+    **Purpose**: Return the transport of the connections handed out by get_connection_manager().
+    """
+
+    return _transport
+
+
+def select_queue(queues, key):
+    """
+    **Purpose**: Select one of 'queues' for 'key'. The selection is stable across processes, all messages with the
+    same key, e.g. the uid of a Pipeline, end up in the same queue.
+    """
+
+    return queues[(zlib.crc32(str(key)) & 0xffffffff) % len(queues)]
+
+
+def consume_queues(connection, channel, queues, terminate):
+    """
+    **Purpose**: Generator yielding (method_frame, props, body) for every message arriving on any of 'queues' until
+    'terminate' is set. Messages are buffered by consumer callbacks and yielded outside of them, so that the caller
+    can wait on other consumers of 'connection' (e.g. the acks of a SyncInitiator) while handling a message. Messages
+    are not acknowledged, unacknowledged messages are requeued when the consumers are cancelled.
+    """
+
+    deliveries = deque()
+
+    def on_message(ch, method_frame, props, body):
+        deliveries.append((method_frame, props, body))
+
+    consumer_tags = [channel.basic_consume(on_message, queue=queue) for queue in queues]
+
+    try:
+
+        while not terminate.is_set():
+
+            # Sleep until messages arrive
+            connection.process_data_events(time_limit=CONSUME_TIMEOUT)
+
+            while deliveries and not terminate.is_set():
+                yield deliveries.popleft()
+
+    finally:
+
+        for consumer_tag in consumer_tags:
+            channel.basic_cancel(consumer_tag)
+
+
+class ConnectionManager(object):
+    """
+    **Purpose**: Hands out connections and channels to the RabbitMQ server at 'hostname':'port', or to the broker of
+    the local transport if 'transport' is 'local' (hostname and port are then ignored). pika connections are
+    not thread-safe: every thread of the process gets its own connection and channel, which are created on first use
+    and reused by later requests of the same thread. A connection found closed, e.g. after a use of it failed with
+    AMQPConnectionError because the server or the network failed, is transparently re-established by the next
+    request. Connections are not probed, as that would dispatch pending consumer callbacks from within the request.
+
+    The manager of a process is obtained via get_connection_manager().
+    """
+
+    def __init__(self, hostname, port, transport='rabbitmq'):
+
+        self._hostname = hostname
+        self._port = port
+        self._transport = transport
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self._opened = 0
+        self._closed = 0
+        self._reconnects = 0
+        self._channels = 0
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Getter functions
+    # ------------------------------------------------------------------------------------------------------------------
+
+    @property
+    def metrics(self):
+        """
+        Counters of the manager: number of currently open connections, connections opened in total, reconnects after
+        a connection was found closed and channels opened in total.
+
+        :getter: Returns the counters of the manager
+        :type: dict
+        """
+
+        with self._lock:
+            return {'connections': self._opened - self._closed,
+                    'opened': self._opened,
+                    'reconnects': self._reconnects,
+                    'channels': self._channels}
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Public methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def connection(self):
+        """
+        **Purpose**: Return the connection of the calling thread, (re-)establish it if required.
+        """
+
+        connection = getattr(self._local, 'connection', None)
+
+        if connection:
+
+            # pika closes a connection once a use of it failed with AMQPConnectionError
+            if connection.is_open:
+                return connection
+
+            with self._lock:
+                self._closed += 1
+                self._reconnects += 1
+
+        self._local.connection = None
+        self._local.channel = None
+
+        if self._transport == 'local':
+            connection = LocalConnection()
+        else:
+            connection = pika.BlockingConnection(pika.ConnectionParameters(host=self._hostname, port=self._port))
+
+        self._local.connection = connection
+
+        with self._lock:
+            self._opened += 1
+
+        return connection
+
+    def channel(self):
+        """
+        **Purpose**: Return the channel of the calling thread, open it on the connection of the thread if required.
+        """
+
+        connection = self.connection()
+        channel = getattr(self._local, 'channel', None)
+
+        if not (channel and channel.is_open):
+
+            channel = connection.channel()
+            self._local.channel = channel
+
+            with self._lock:
+                self._channels += 1
+
+        return channel
+
+    def close(self):
+        """
+        **Purpose**: Close the connection of the calling thread. Threads owning consumers close their connection when
+        they terminate, unacknowledged messages are then requeued.
+        """
+
+        connection = getattr(self._local, 'connection', None)
+
+        self._local.connection = None
+        self._local.channel = None
+
+        if connection:
+
+            with self._lock:
+                self._closed += 1
+
+            if connection.is_open:
+                connection.close()
+
+
+# ConnectionManagers of this process, keyed by (pid, transport, hostname, port). Forked processes do not share the
+# connections of their parent.
+_managers = dict()
+_managers_lock = threading.Lock()
+
+
+def get_connection_manager(hostname, port):
+    """
+    **Purpose**: Return the ConnectionManager of this process for the RabbitMQ server at 'hostname':'port', or for
+    the broker of the local transport if selected via set_transport().
+    """
+
+    key = (os.getpid(), _transport, hostname, port)
+
+    with _managers_lock:
+
+        if key not in _managers:
+            _managers[key] = ConnectionManager(hostname, port, _transport)
+
+        return _managers[key]
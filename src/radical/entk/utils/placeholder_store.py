@@ -0,0 +1,177 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+
+
+class PlaceholderStore(object):
+
+    """
+    A PlaceholderStore holds the paths of completed tasks, referred to by placeholders of the form
+    $Pipeline_{pipeline.name}_Stage_{stage.name}_Task_{task.name}. Entries are kept as (path, rts_uid) tuples indexed
+    by the interned pipeline, stage and task names.
+
+    :arguments:
+        :path: file the entries are appended to and loaded from, so that the store survives restarts of the tmgr
+            process (optional)
+        :max_pipelines: maximum number of completed pipelines kept, beyond it the least recently used completed
+            pipeline is evicted. 0 keeps all pipelines.
+
+    The store is shared by the threads of the tmgr process.
+    """
+
+    def __init__(self, path=None, max_pipelines=0):
+
+        # pipeline -> stage -> task -> (path, rts_uid)
+        self._index = dict()
+
+        # Completed pipelines, least recently used first
+        self._done = OrderedDict()
+
+        self._max_pipelines = max_pipelines
+        self._path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+        if path:
+
+            if os.path.exists(path):
+                self._load()
+
+            self._file = open(path, 'a')
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Public methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def add(self, pipeline, stage, task, path, rts_uid=None):
+        """
+        Add the path of a completed task. A pipeline which was marked as completed is active again.
+        """
+
+        with self._lock:
+            self._add(pipeline, stage, task, path, rts_uid)
+            self._write(['add', pipeline, stage, task, path, rts_uid])
+
+    def get(self, pipeline, stage, task):
+        """
+        :return: (path, rts_uid) of a completed task, None if the task is not known
+        """
+
+        with self._lock:
+
+            try:
+                entry = self._index[pipeline][stage][task]
+            except KeyError:
+                return None
+
+            # Completed pipelines which are referred to are used recently
+            if pipeline in self._done:
+                self._done[pipeline] = self._done.pop(pipeline)
+
+            return entry
+
+    def get_path(self, pipeline, stage, task):
+        """
+        :return: path of a completed task, None if the task is not known
+        """
+
+        entry = self.get(pipeline, stage, task)
+
+        if entry:
+            return entry[0]
+
+        return None
+
+    def pipeline_done(self, pipeline):
+        """
+        Mark a pipeline as completed, its tasks can then be evicted.
+        """
+
+        with self._lock:
+            self._pipeline_done(pipeline)
+            self._write(['done', pipeline])
+
+    def close(self):
+
+        with self._lock:
+
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def __contains__(self, pipeline):
+
+        return pipeline in self._index
+
+    def __len__(self):
+
+        return sum(len(tasks) for stages in self._index.values() for tasks in stages.values())
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Private methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def _add(self, pipeline, stage, task, path, rts_uid):
+
+        pipeline = intern(str(pipeline))
+        stage = intern(str(stage))
+        task = intern(str(task))
+
+        self._index.setdefault(pipeline, dict()).setdefault(stage, dict())[task] = (str(path), rts_uid)
+        self._done.pop(pipeline, None)
+
+    def _pipeline_done(self, pipeline):
+
+        pipeline = str(pipeline)
+
+        if pipeline not in self._index:
+            return
+
+        self._done.pop(pipeline, None)
+        self._done[pipeline] = True
+
+        while self._max_pipelines and len(self._done) > self._max_pipelines:
+            evicted, _ = self._done.popitem(last=False)
+            del self._index[evicted]
+
+    def _write(self, record):
+
+        if self._file:
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+
+    def _load(self):
+        """
+        Replay the records of the store file and rewrite it with the entries which are still held.
+        """
+
+        with open(self._path) as fp:
+
+            for line in fp:
+
+                # The last record is incomplete if the tmgr process was killed while writing it
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+
+                if record[0] == 'add':
+                    self._add(*record[1:])
+
+                elif record[0] == 'done':
+                    self._pipeline_done(record[1])
+
+        tmp = '%s.tmp' % self._path
+
+        with open(tmp, 'w') as fp:
+
+            for pipeline, stages in self._index.items():
+                for stage, tasks in stages.items():
+                    for task, (path, rts_uid) in tasks.items():
+                        fp.write(json.dumps(['add', pipeline, stage, task, path, rts_uid]) + '\n')
+
+            for pipeline in self._done:
+                fp.write(json.dumps(['done', pipeline]) + '\n')
+
+        os.rename(tmp, self._path)
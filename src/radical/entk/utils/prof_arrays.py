@@ -0,0 +1,215 @@
+import os
+import csv
+import glob
+from radical.entk.exceptions import *
+from radical.entk import states as res
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# State codes of the profile arrays, code 0 is used for events without state
+STATES = ['', res.INITIAL, res.SCHEDULING, res.SCHEDULED, res.SUBMITTING, res.SUBMITTED, res.COMPLETED,
+          res.DEQUEUEING, res.DEQUEUED, res.DONE, res.FAILED, res.CANCELED]
+
+
+class ProfileArrays(object):
+
+    """
+    Columnar form of the profiles of a session, one row per event, sorted by time. The rows are held in typed arrays:
+
+        :time: timestamps of the events (float64)
+        :uid: index into 'uids' of the entity of the events (int32), 0 for events without uid
+        :event: index into 'events' of the name of the events (int32)
+        :state: index into 'states' of the state of the events (int8), 0 for events without state
+
+    All helpers on top of the arrays are vectorized and require numpy>=1.13, installed with the 'numpy' extra of
+    radical.entk.
+    """
+
+    def __init__(self, time, uid, event, state, uids, events, states):
+
+        self.time = time
+        self.uid = uid
+        self.event = event
+        self.state = state
+
+        self.uids = uids
+        self.events = events
+        self.states = states
+
+        # Entity type of each uid, e.g. 'task' for 'task.0000'
+        self.etypes = np.array([u.split('.')[0] for u in uids])
+
+    def __len__(self):
+
+        return len(self.time)
+
+    def mask(self, etype=None, event=None, state=None):
+        """
+        :return: boolean array selecting the events of entities of type 'etype' (e.g. 'task') with name 'event' and
+            state 'state'. Criteria which are None are not applied.
+        """
+
+        selected = np.ones(len(self.time), dtype=bool)
+
+        if etype is not None:
+            selected &= (self.etypes == etype)[self.uid]
+
+        if event is not None:
+            if event not in self.events:
+                return np.zeros(len(self.time), dtype=bool)
+            selected &= self.event == self.events.index(event)
+
+        if state is not None:
+            if state not in self.states:
+                return np.zeros(len(self.time), dtype=bool)
+            selected &= self.state == self.states.index(state)
+
+        return selected
+
+    def state_times(self, state, etype='task'):
+        """
+        :return: time at which each uid first entered 'state', NaN for uids which did not, indexed like 'uids'
+        """
+
+        selected = self.mask(etype=etype, event='advance', state=state)
+
+        first = np.full(len(self.uids), np.inf)
+        np.minimum.at(first, self.uid[selected], self.time[selected])
+        first[np.isinf(first)] = np.nan
+
+        return first
+
+
+def read_session_arrays(sid, src=None):
+    """
+    **Purpose**: Read the profiles of a session into ProfileArrays. The .prof files are parsed directly, without
+    building the per-event rows of get_session_profile(). EnTK profiles are written on one host, no clock
+    correction is applied.
+
+    :arguments:
+        :sid: session id
+        :src: folder holding the session folder, the current folder by default
+    """
+
+    if np is None:
+        raise EnTKError('Profile arrays require the numpy module')
+
+    if not src:
+        src = os.getcwd()
+
+    if not os.path.exists('%s/%s' % (src, sid)):
+        raise EnTKError('%s/%s does not exist' % (src, sid))
+
+    profiles = glob.glob('%s/%s/*.prof' % (src, sid))
+
+    if len(profiles) == 0:
+        raise EnTKError('No profiles found at %s' % src)
+
+    uids = ['']
+    events = list()
+    states = list(STATES)
+
+    uid_index = {'': 0}
+    event_index = dict()
+    state_index = dict((state, code) for code, state in enumerate(states))
+
+    times = list()
+    uid_codes = list()
+    event_codes = list()
+    state_codes = list()
+
+    for profile in profiles:
+
+        with open(profile) as fp:
+
+            for row in csv.reader(fp):
+
+                if not row or row[0].startswith('#') or len(row) < 6:
+                    continue
+
+                time, event, _, _, uid, state = row[:6]
+
+                if uid not in uid_index:
+                    uid_index[uid] = len(uids)
+                    uids.append(uid)
+
+                if event not in event_index:
+                    event_index[event] = len(events)
+                    events.append(event)
+
+                if state not in state_index:
+                    state_index[state] = len(states)
+                    states.append(state)
+
+                times.append(float(time))
+                uid_codes.append(uid_index[uid])
+                event_codes.append(event_index[event])
+                state_codes.append(state_index[state])
+
+    order = np.argsort(np.array(times), kind='mergesort')
+
+    return ProfileArrays(time=np.array(times, dtype=np.float64)[order],
+                         uid=np.array(uid_codes, dtype=np.int32)[order],
+                         event=np.array(event_codes, dtype=np.int32)[order],
+                         state=np.array(state_codes, dtype=np.int8)[order],
+                         uids=uids,
+                         events=events,
+                         states=states)
+
+
+def get_state_durations(arrays, start_state, end_state, etype='task'):
+    """
+    **Purpose**: Time each entity of type 'etype' took from entering 'start_state' to entering 'end_state'.
+
+    :return: array of durations of the entities which entered both states
+    """
+
+    durations = arrays.state_times(end_state, etype) - arrays.state_times(start_state, etype)
+
+    return durations[~np.isnan(durations)]
+
+
+def get_concurrency(arrays, start_state, end_state, etype='task'):
+    """
+    **Purpose**: Number of entities of type 'etype' which entered 'start_state' but not yet 'end_state' over time.
+
+    :return: (times, counts) where counts[i] holds from times[i] until times[i+1]
+    """
+
+    starts = arrays.state_times(start_state, etype)
+    ends = arrays.state_times(end_state, etype)
+
+    starts = starts[~np.isnan(starts)]
+    ends = ends[~np.isnan(ends)]
+
+    times = np.concatenate([starts, ends])
+    steps = np.concatenate([np.ones(len(starts), dtype=np.int64), -np.ones(len(ends), dtype=np.int64)])
+
+    # Ends are counted before starts at the same time
+    order = np.lexsort((steps, times))
+
+    return times[order], np.cumsum(steps[order])
+
+
+def get_throughput(arrays, state, bin_size=1.0, etype='task'):
+    """
+    **Purpose**: Rate at which entities of type 'etype' entered 'state', per 'bin_size' secs.
+
+    :return: (bin start times, entities per sec in each bin)
+    """
+
+    times = arrays.state_times(state, etype)
+    times = times[~np.isnan(times)]
+
+    if not len(times):
+        return np.array([]), np.array([])
+
+    start = times.min()
+    nbins = int((times.max() - start) // bin_size) + 1
+    counts = np.bincount(((times - start) // bin_size).astype(np.int64), minlength=nbins)
+
+    return start + np.arange(nbins) * bin_size, counts / float(bin_size)
@@ -1,11 +1,13 @@
 import os
 import csv
+import exceptions
 import copy
 import glob
 import time
 import threading
 import json
 import radical.utils as ru
+from collections import OrderedDict
 
 from radical.entk.exceptions import *
 import traceback
@@ -222,38 +224,164 @@ def get_session_description(sid, src=None):
     return desc
 
 
+class WorkflowWriter(object):
+
+    """
+    A WorkflowWriter appends snapshots of pipelines, stages and tasks to '<uid>/entk_workflow.jsonl', one JSON record
+    per line, as the objects reach final states. Each record is written out at once, so that the file stays readable
+    by read_workflow() if the run is killed.
+
+    :arguments:
+        :uid: folder of the file, usually the session id
+    """
+
+    def __init__(self, uid):
+
+        try:
+            os.mkdir(uid)
+        except:
+            pass
+
+        self._path = '%s/entk_workflow.jsonl' % uid
+        self._file = open(self._path, 'a')
+        self._lock = threading.Lock()
+
+        # A killed run may have left an incomplete last record, the first new record must not be appended to it
+        if os.path.getsize(self._path):
+
+            with open(self._path, 'rb') as fp:
+                fp.seek(-1, os.SEEK_END)
+                last = fp.read(1)
+
+            if last != '\n':
+                self._file.write('\n')
+                self._file.flush()
+
+        # Uids of the objects written so far
+        self._written = set()
+
+    @property
+    def path(self):
+
+        return self._path
+
+    def write(self, obj_type, obj):
+        """
+        Append a snapshot of 'obj' of type 'obj_type' ('Pipeline', 'Stage' or 'Task').
+        """
+
+        record = json.dumps({'type': obj_type, 'object': obj.to_dict()})
+
+        with self._lock:
+            self._file.write(record + '\n')
+            self._file.flush()
+            self._written.add(obj.uid)
+
+    def write_workflow(self, workflow):
+        """
+        Append snapshots of the pipelines, stages and tasks of 'workflow' which have not been written yet.
+        """
+
+        for pipe in workflow:
+
+            for stage in pipe.stages:
+
+                for task in stage.tasks:
+                    if task.uid not in self._written:
+                        self.write('Task', task)
+
+                if stage.uid not in self._written:
+                    self.write('Stage', stage)
+
+            if pipe.uid not in self._written:
+                self.write('Pipeline', pipe)
+
+    def close(self):
+
+        with self._lock:
+            self._file.close()
+
+
 def write_workflow(workflow, uid):
+    """
+    Append snapshots of all pipelines, stages and tasks of 'workflow' to '<uid>/entk_workflow.jsonl'.
+    """
 
-    try:
-        os.mkdir(uid)
-    except:
-        pass
+    writer = WorkflowWriter(uid)
+    writer.write_workflow(workflow)
+    writer.close()
 
-    data = list()
-    if os.path.isfile('%s/entk_workflow.json' % uid):
-        data = ru.read_json('%s/entk_workflow.json' % uid)
 
-    for pipe in workflow:
+def iter_workflow(uid):
+    """
+    Iterate over the records in '<uid>/entk_workflow.jsonl' in the order they were written. An incomplete last record,
+    left by a killed run, is skipped.
 
-        p = dict()
-        p['uid'] = pipe.uid
-        p['name'] = pipe.name
-        p['state_history'] = pipe.state_history
-        p['stages'] = list()
+    :return: generator of (type, object as dict)
+    """
 
-        for stage in pipe.stages:
+    with open('%s/entk_workflow.jsonl' % uid) as fp:
 
-            s = dict()
-            s['uid'] = stage.uid
-            s['name'] = stage.name
-            s['state_history'] = stage.state_history
-            s['tasks'] = list()
+        for line in fp:
 
-            for task in stage.tasks:
-                s['tasks'].append(task.to_dict())
+            # json raises the builtin ValueError, not the one of radical.entk.exceptions
+            try:
+                record = json.loads(line)
+            except exceptions.ValueError:
+                continue
+
+            yield record['type'], record['object']
+
+
+def read_workflow(uid):
+    """
+    Rebuild the workflow from the records in '<uid>/entk_workflow.jsonl'. The latest snapshot of each object is used.
+
+    :return: list of pipelines as dicts with their 'stages', each stage as dict with its 'tasks'
+    """
+
+    pipelines = OrderedDict()
+    stages = OrderedDict()
+
+    def get_pipeline(parent):
+
+        if parent['uid'] not in pipelines:
+            pipelines[parent['uid']] = {'uid': parent['uid'],
+                                        'name': parent['name'],
+                                        'state_history': list(),
+                                        'stages': OrderedDict()}
+
+        return pipelines[parent['uid']]
+
+    def get_stage(parent, parent_pipeline):
+
+        if parent['uid'] not in stages:
+            stages[parent['uid']] = {'uid': parent['uid'],
+                                     'name': parent['name'],
+                                     'state_history': list(),
+                                     'tasks': OrderedDict()}
+            get_pipeline(parent_pipeline)['stages'][parent['uid']] = stages[parent['uid']]
+
+        return stages[parent['uid']]
+
+    for obj_type, obj in iter_workflow(uid):
+
+        if obj_type == 'Task':
+            get_stage(obj['parent_stage'], obj['parent_pipeline'])['tasks'][obj['uid']] = obj
+
+        elif obj_type == 'Stage':
+            stage = get_stage({'uid': obj['uid'], 'name': obj['name']}, obj['parent_pipeline'])
+            stage['name'] = obj['name']
+            stage['state_history'] = obj['state_history']
 
-            p['stages'].append(s)
+        elif obj_type == 'Pipeline':
+            pipe = get_pipeline({'uid': obj['uid'], 'name': obj['name']})
+            pipe['name'] = obj['name']
+            pipe['state_history'] = obj['state_history']
 
-        data.append(p)
+    for pipe in pipelines.values():
+        pipe['stages'] = pipe['stages'].values()
+        for stage in pipe['stages']:
+            stage['tasks'] = stage['tasks'].values()
 
-    ru.write_json(data, '%s/entk_workflow.json' % uid)
+    return pipelines.values()
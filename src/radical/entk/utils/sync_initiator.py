@@ -1,11 +1,102 @@
+import os
+import time
 import uuid
 import json
 import pika
+from collections import OrderedDict
+from radical.entk.exceptions import *
+from mq_utils import CONSUME_TIMEOUT
 
 
-def sync_with_master(obj, obj_type, channel, queue, logger, local_prof):
+# Maximum time (secs) sync_with_master waits for a message on the reply queue before giving up on the AppManager
+SYNC_TIMEOUT = float(os.getenv('ENTK_SYNC_TIMEOUT', 300))
+
+
+def get_reply_queue(queue):
+    """
+    **Purpose**: Derive the name of the queue on which the AppManager acknowledges messages published to 'queue'.
+    Queue names are expected to follow the structure '<sid>-A-to-B', the acks are then sent to '<sid>-B-to-A'.
+    """
+
+    sid = '-'.join(queue.split('-')[:-3])
+    qname = queue.split('-')[-3:]
+    qname.reverse()
+    reply_queue = '-'.join(qname)
+
+    return sid + '-' + reply_queue
+
+
+def _prof_sync_event(local_prof, event, obj, obj_type):
+
+    if obj_type == 'Task':
+        local_prof.prof(event, uid=obj.uid, msg=obj.parent_stage['uid'])
+    elif obj_type == 'Stage':
+        local_prof.prof(event, uid=obj.uid, msg=obj.parent_pipeline['uid'])
+    else:
+        local_prof.prof(event, uid=obj.uid)
+
+
+def _to_sync_dict(obj, obj_type, full=False):
+    """
+    **Purpose**: Describe 'obj' for the AppManager. Unless 'full' is True, only the fields the AppManager applies are
+    included: the uid, the parent uids, the state and, for Tasks, the path and exit code once they are set.
+    """
+
+    if full:
+        return obj.to_dict()
+
+    if obj_type == 'Task':
+
+        obj_as_dict = {
+            'uid': obj.uid,
+            'state': obj.state,
+            'parent_stage': obj.parent_stage,
+            'parent_pipeline': obj.parent_pipeline
+        }
+
+        if obj.path:
+            obj_as_dict['path'] = obj.path
+
+        if obj.exit_code is not None:
+            obj_as_dict['exit_code'] = obj.exit_code
+
+    elif obj_type == 'Stage':
+
+        obj_as_dict = {
+            'uid': obj.uid,
+            'state': obj.state,
+            'parent_pipeline': obj.parent_pipeline
+        }
+
+    else:
+
+        obj_as_dict = {
+            'uid': obj.uid,
+            'state': obj.state,
+            'completed': obj.completed
+        }
+
+    return obj_as_dict
+
+
+def _publish(objs, obj_type, channel, queue, logger, local_prof, bulk=False, full=False, reply_to=None):
+    """
+    **Purpose**: Publish the current state of 'objs' to the AppManager in one message. A single object is sent as
+    {'type': .., 'object': ..}, a bulk of objects as {'type': .., 'objects': [..]}. Unless 'full' is True, the objects
+    are sent as compact updates and the message is marked with 'delta': True. The AppManager acknowledges the message
+    on 'reply_to' if given, otherwise on the reply queue of 'queue'.
+
+    :return: correlation id of the published message
+    """
+
+    if bulk:
+        object_as_dict = {'objects': [_to_sync_dict(obj, obj_type, full) for obj in objs]}
+    else:
+        object_as_dict = {'object': _to_sync_dict(objs[0], obj_type, full)}
+
+    if not full:
+        object_as_dict['delta'] = True
 
-    object_as_dict = {'object': obj.to_dict()}
     if obj_type == 'Task':
         object_as_dict['type'] = 'Task'
 
@@ -17,47 +108,246 @@ def sync_with_master(obj, obj_type, channel, queue, logger, local_prof):
 
     corr_id = str(uuid.uuid4())
 
-    logger.debug('Attempting to sync %s with state %s with AppManager' % (obj.uid, obj.state))
+    if bulk:
+        logger.debug('Attempting to sync %s %ss with AppManager', len(objs), obj_type)
+    else:
+        logger.debug('Attempting to sync %s with state %s with AppManager', objs[0].uid, objs[0].state)
+
     channel.basic_publish(exchange='',
                           routing_key=queue,
                           body=json.dumps(object_as_dict),
-                          properties=pika.BasicProperties(correlation_id=corr_id)
+                          properties=pika.BasicProperties(correlation_id=corr_id, reply_to=reply_to)
                           )
 
-    if obj_type == 'Task':
-        local_prof.prof('publishing obj with state %s for sync' % obj.state, uid=obj.uid, msg=obj.parent_stage['uid'])
-    elif obj_type == 'Stage':
-        local_prof.prof('publishing obj with state %s for sync' %
-                        obj.state, uid=obj.uid, msg=obj.parent_pipeline['uid'])
-    else:
-        local_prof.prof('publishing obj with state %s for sync' % obj.state, uid=obj.uid)
+    for obj in objs:
+        _prof_sync_event(local_prof, 'publishing obj with state %s for sync' % obj.state, obj, obj_type)
 
-    sid = '-'.join(queue.split('-')[:-3])
-    qname = queue.split('-')[-3:]
-    qname.reverse()
-    reply_queue = '-'.join(qname)
-    reply_queue = sid + '-' + reply_queue
+    return corr_id
+
+
+def sync_with_master(obj, obj_type, channel, queue, logger, local_prof, full=False):
+    """
+    **Purpose**: Publish the current state of 'obj' to the AppManager and block until it is acknowledged. Raises
+    EnTKError if no message arrives on the reply queue for SYNC_TIMEOUT secs.
+    """
 
-    while True:
-        #self._logger.info('waiting for ack')
+    corr_id = _publish([obj], obj_type, channel, queue, logger, local_prof, full=full)
+    reply_queue = get_reply_queue(queue)
 
-        method_frame, props, body = channel.basic_get(queue=reply_queue)
+    try:
+
+        # Sleep until the ack arrives
+        for method_frame, props, body in channel.consume(queue=reply_queue, inactivity_timeout=SYNC_TIMEOUT):
+
+            if method_frame is None:
+                raise EnTKError('No ack from the AppManager for %s with state %s within %s secs' %
+                                (obj.uid, obj.state, SYNC_TIMEOUT))
 
-        if body:
             if corr_id == props.correlation_id:
 
                 # print 'acknowledged: ', obj.uid, obj.state
-                if obj_type == 'Task':
-                    local_prof.prof('obj with state %s synchronized' %
-                                    obj.state, uid=obj.uid, msg=obj.parent_stage['uid'])
-                elif obj_type == 'Stage':
-                    local_prof.prof('obj with state %s synchronized' %
-                                    obj.state, uid=obj.uid, msg=obj.parent_pipeline['uid'])
-                else:
-                    local_prof.prof('obj with state %s synchronized' % obj.state, uid=obj.uid)
+                _prof_sync_event(local_prof, 'obj with state %s synchronized' % obj.state, obj, obj_type)
 
-                logger.debug('%s with state %s synced with AppManager' % (obj.uid, obj.state))
+                logger.debug('%s with state %s synced with AppManager', obj.uid, obj.state)
 
                 channel.basic_ack(delivery_tag=method_frame.delivery_tag)
 
                 break
+
+    finally:
+
+        # Stop consuming, acks for other messages are requeued
+        channel.cancel()
+
+
+class SyncInitiator(object):
+
+    """
+    A SyncInitiator is the pipelined counterpart of `sync_with_master`. State updates are published to the
+    AppManager without waiting for the acknowledgement of each of them. The correlation ids of all published but
+    not yet acknowledged updates are kept in a window. A caller only blocks when the window is full or when it
+    explicitly needs the AppManager to have seen a specific state, via `wait()`.
+
+    Updates are sent as compact deltas. Objects the AppManager does not know yet, e.g. Stages added to a Pipeline
+    at runtime, have to be registered via `require_full()` so that their first update carries the full description.
+
+    Acks are pushed to the SyncInitiator by a consumer on its private reply queue, named in the reply_to property of
+    the updates. Several SyncInitiators can thus publish to the same queue and share a channel, each only receives
+    the acks of its own updates. Acks are processed whenever the connection of 'channel' processes events, a caller
+    waiting for acks sleeps until one arrives.
+
+    :arguments:
+        :channel: channel to the RabbitMQ server, used exclusively by the thread owning this object
+        :queue: queue to which state updates are published
+        :logger: logger of the calling component
+        :profiler: profiler of the calling component
+        :window: maximum number of outstanding (unacknowledged) updates, defaults to $ENTK_SYNC_WINDOW or 128
+        :metrics: Metrics of the calling component, the round-trip time of every update is added to its histogram
+            'sync.<A-to-B>' (optional)
+    """
+
+    def __init__(self, channel, queue, logger, profiler, window=None, metrics=None):
+
+        self._channel = channel
+        self._connection = channel.connection
+        self._queue = queue
+
+        # Server-named queue, deleted by close() or together with the connection
+        self._reply_queue = channel.queue_declare(exclusive=True).method.queue
+
+        self._logger = logger
+        self._prof = profiler
+        self._metrics = metrics
+        self._metric = 'sync.%s' % '-'.join(queue.split('-')[-3:])
+
+        if window:
+            self._window = window
+        else:
+            self._window = int(os.getenv('ENTK_SYNC_WINDOW', 128))
+
+        # corr_id --> (objs, obj_type, states at time of publishing, time of publishing)
+        self._outstanding = OrderedDict()
+
+        # uids of objects whose next update is sent with the full description
+        self._require_full = set()
+
+        self._consumer_tag = self._channel.basic_consume(self._on_ack, queue=self._reply_queue)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Getter functions
+    # ------------------------------------------------------------------------------------------------------------------
+
+    @property
+    def outstanding(self):
+        """
+        :getter: Returns the number of messages published but not yet acknowledged by the AppManager
+        """
+        return len(self._outstanding)
+
+    @property
+    def window(self):
+        """
+        :getter: Returns the maximum number of outstanding messages
+        """
+        return self._window
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Public methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def sync(self, obj, obj_type, blocking=False):
+        """
+        **Purpose**: Publish the current state of 'obj' to the AppManager. The call only blocks if 'blocking' is
+        True or if the window of outstanding acknowledgements is full.
+
+        :return: correlation id of the published update
+        """
+
+        return self._sync([obj], obj_type, blocking, bulk=False)
+
+    def sync_bulk(self, objs, obj_type, blocking=False):
+        """
+        **Purpose**: Publish the current state of all objects in 'objs' to the AppManager as one message, which is
+        applied and acknowledged by the AppManager as a unit. The call only blocks if 'blocking' is True or if the
+        window of outstanding acknowledgements is full.
+
+        :return: correlation id of the published update
+        """
+
+        return self._sync(list(objs), obj_type, blocking, bulk=True)
+
+    def require_full(self, uids):
+        """
+        **Purpose**: Send the next update of each object in 'uids' with its full description instead of a delta,
+        since the AppManager does not know these objects yet.
+        """
+
+        self._require_full.update(uids)
+
+    def wait(self, corr_id=None):
+        """
+        **Purpose**: Block until the update with correlation id 'corr_id' has been acknowledged by the AppManager.
+        If no 'corr_id' is given, block until all outstanding updates have been acknowledged.
+        """
+
+        if corr_id:
+            while corr_id in self._outstanding:
+                self._receive_ack()
+
+        else:
+            while self._outstanding:
+                self._receive_ack()
+
+    def flush(self):
+        """
+        **Purpose**: Block until all outstanding updates have been acknowledged by the AppManager.
+        """
+
+        self.wait()
+
+    def close(self):
+        """
+        **Purpose**: Stop consuming acks and delete the reply queue, so that SyncInitiators created for a few updates
+        do not leave their queues behind until the connection is closed. Outstanding updates are not waited for,
+        their acks are discarded.
+        """
+
+        if self._consumer_tag:
+            self._channel.basic_cancel(self._consumer_tag)
+            self._channel.queue_delete(queue=self._reply_queue)
+            self._consumer_tag = None
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Private methods
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def _sync(self, objs, obj_type, blocking, bulk):
+
+        full = False
+        if self._require_full:
+            for obj in objs:
+                if obj.uid in self._require_full:
+                    self._require_full.discard(obj.uid)
+                    full = True
+
+        corr_id = _publish(objs, obj_type, self._channel, self._queue, self._logger, self._prof,
+                           bulk=bulk, full=full, reply_to=self._reply_queue)
+        self._outstanding[corr_id] = (objs, obj_type, [obj.state for obj in objs], time.time())
+
+        if blocking:
+            self.wait(corr_id)
+
+        else:
+            while len(self._outstanding) >= self._window:
+                self._receive_ack()
+
+        return corr_id
+
+    def _receive_ack(self):
+        """
+        **Purpose**: Sleep until acknowledgements arrive on the reply queue or CONSUME_TIMEOUT expires.
+        """
+
+        self._connection.process_data_events(time_limit=CONSUME_TIMEOUT)
+
+    def _on_ack(self, channel, method_frame, props, body):
+        """
+        **Purpose**: Consumer callback on the reply queue, retires the update corresponding to the ack received.
+        """
+
+        self._channel.basic_ack(delivery_tag=method_frame.delivery_tag)
+
+        # The reply queue is private, an unknown ack is a duplicate of an ack already received
+        if props.correlation_id not in self._outstanding:
+            self._logger.warning('Received ack with unknown correlation id %s on %s' %
+                                 (props.correlation_id, self._reply_queue))
+            return
+
+        objs, obj_type, obj_states, published = self._outstanding.pop(props.correlation_id)
+
+        if self._metrics:
+            self._metrics.observe(self._metric, time.time() - published)
+
+        for obj, state in zip(objs, obj_states):
+            _prof_sync_event(self._prof, 'obj with state %s synchronized' % state, obj, obj_type)
+            self._logger.debug('%s with state %s synced with AppManager', obj.uid, state)
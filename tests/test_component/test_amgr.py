@@ -34,6 +34,8 @@ def test_amgr_initialization():
     # RabbitMQ Queues
     assert amgr._num_pending_qs == 1
     assert amgr._num_completed_qs == 1
+    assert amgr._num_dequeue_workers == 1
+    assert amgr._transport == 'rabbitmq'
     assert isinstance(amgr._pending_queue, list)
     assert isinstance(amgr._completed_queue, list)
 
@@ -104,7 +106,9 @@ def test_amgr_read_config():
          "rts_config": { "sandbox_cleanup": True, "db_cleanup": True},
          "pending_qs": 2,
          "completed_qs": 3,
-         "rmq_cleanup": False}
+         "dequeue_workers": 4,
+         "rmq_cleanup": False,
+         "transport": "local"}
 
     ru.write_json(d, './config.json')
     amgr._read_config(config_path='./',
@@ -128,7 +132,9 @@ def test_amgr_read_config():
     assert amgr._rts_config == d['rts_config']
     assert amgr._num_pending_qs == d['pending_qs']
     assert amgr._num_completed_qs == d['completed_qs']
+    assert amgr._num_dequeue_workers == d['dequeue_workers']
     assert amgr._rmq_cleanup == d['rmq_cleanup']
+    assert amgr._transport == d['transport']
 
     os.remove('./config.json')
 
@@ -268,7 +274,8 @@ def test_amgr_setup_mqs():
         '%s-sync-to-tmgr' % amgr._sid,
         '%s-sync-to-cb' % amgr._sid,
         '%s-sync-to-enq' % amgr._sid,
-        '%s-sync-to-deq' % amgr._sid
+        '%s-sync-to-deq' % amgr._sid,
+        '%s-pipeline-done' % amgr._sid
     ]
 
     for q in qs:
@@ -302,6 +309,7 @@ def test_amgr_cleanup_mqs():
           '%s-sync-to-cb' % sid,
           '%s-sync-to-enq' % sid,
           '%s-sync-to-deq' % sid,
+          '%s-pipeline-done' % sid,
           '%s-pendingq-1' % sid,
           '%s-completedq-1' % sid]
 
@@ -366,7 +374,7 @@ def test_amgr_synchronizer():
         s.add_tasks(t)
 
     p.add_stages(s)
-    p._assign_uid(amgr._sid)
+    p._assign_uid(amgr._sid, amgr._uid_map)
     p._validate()
 
     amgr.workflow = [p]
@@ -399,6 +407,40 @@ def test_amgr_synchronizer():
     sync_thread.join()
 
 
+def test_amgr_apply_bulk_sync_msg():
+
+    amgr = Amgr(hostname=hostname, port=port)
+
+    p = Pipeline()
+    s = Stage()
+
+    for cnt in range(10):
+
+        t = Task()
+        t.executable = ['some-executable-%s' % cnt]
+
+        s.add_tasks(t)
+
+    p.add_stages(s)
+    p._assign_uid(amgr._sid, amgr._uid_map)
+    p._validate()
+
+    amgr.workflow = [p]
+
+    objs = list()
+    for t in p.stages[0].tasks:
+        t_copy = Task()
+        t_copy.from_dict(t.to_dict())
+        t_copy.state = states.SCHEDULING
+        objs.append(t_copy.to_dict())
+
+    completed_pipes = amgr._apply_sync_msg({'type': 'Task', 'objects': objs})
+
+    assert completed_pipes == []
+    for t in p.stages[0].tasks:
+        assert t.state == states.SCHEDULING
+
+
 def test_sid_in_mqs():
 
     appman = Amgr(hostname=hostname, port=port)
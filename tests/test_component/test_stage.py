@@ -229,6 +229,83 @@ def test_stage_check_complete():
     assert s._check_stage_complete() == True
 
 
+def test_stage_progress():
+
+    s = Stage()
+    t1 = Task()
+    t2 = Task()
+    t3 = Task()
+    s.add_tasks([t1, t2])
+
+    assert s.progress[states.INITIAL] == 2
+    assert sum(s.progress.values()) == 2
+
+    t1.state = states.SCHEDULING
+    t2.state = states.FAILED
+    assert s.progress[states.INITIAL] == 0
+    assert s.progress[states.SCHEDULING] == 1
+    assert s.progress[states.FAILED] == 1
+    assert s._check_stage_complete() == False
+
+    # Tasks added to the set directly are counted as well
+    s.tasks.add(t3)
+    assert s.progress[states.INITIAL] == 1
+    assert sum(s.progress.values()) == 3
+
+    t1.from_dict({'state': states.DONE})
+    t3.state = states.DONE
+    assert s.progress[states.DONE] == 2
+    assert s._check_stage_complete() == True
+
+    # Reassigning the tasks resets the counters
+    s.tasks = t1
+    assert s.progress[states.DONE] == 1
+    assert sum(s.progress.values()) == 1
+
+
+def test_stage_progress_threads():
+    """
+    ***Purpose***: Test that concurrent state changes of the tasks of a stage, as done by the enqueue and dequeue
+    threads, keep the counters consistent and that tasks moved to another stage are removed from their old stage
+    """
+
+    import threading
+
+    s = Stage()
+    tasks = [Task() for _ in range(400)]
+    s.add_tasks(tasks)
+
+    def advance(part):
+        for t in part:
+            for state in [states.SCHEDULING, states.SCHEDULED, states.SUBMITTING, states.SUBMITTED,
+                          states.COMPLETED, states.DEQUEUEING, states.DEQUEUED, states.DONE]:
+                t.state = state
+
+    threads = [threading.Thread(target=advance, args=(tasks[cnt::4],)) for cnt in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert s.progress[states.DONE] == 400
+    assert s._tracked_tasks == 400
+    assert s._check_stage_complete() == True
+
+    # A task added to another stage is removed from its old stage
+    s2 = Stage()
+    s2.add_tasks(tasks[0])
+    assert tasks[0] not in s.tasks
+    assert s.progress[states.DONE] == 399
+    assert s2.progress[states.DONE] == 1
+
+    # As is a task whose parent stage is reassigned
+    s._uid = 'stage.0000'
+    tasks[1].parent_stage = {'uid': 'stage.0001', 'name': None}
+    assert tasks[1] not in s.tasks
+    assert s.progress[states.DONE] == 398
+    assert tasks[1]._stage is None
+
+
 @given(t=st.text(),
        l=st.lists(st.text()),
        i=st.integers().filter(lambda x: type(x) == int),
@@ -304,3 +381,9 @@ def test_stage_pass_uid():
     assert t2.parent_stage['name'] == s.name
     assert t2.parent_pipeline['uid'] == s.parent_pipeline['uid']
     assert t2.parent_pipeline['name'] == s.parent_pipeline['name']
+
+    # Modifying the parents of one task does not change the parents of the other tasks
+    t1.parent_stage['name'] = 'renamed'
+    t1.parent_pipeline['name'] = 'renamed'
+    assert t2.parent_stage['name'] == s.name
+    assert t2.parent_pipeline['name'] == s.parent_pipeline['name']
@@ -352,7 +352,7 @@ def test_task_assign_uid():
 def test_task_validate():
 
     t = Task()
-    t._state = 'test'
+    t.state = states.SCHEDULING
     with pytest.raises(ValueError):
         t._validate()
 
@@ -360,3 +360,43 @@ def test_task_validate():
     with pytest.raises(MissingError):
         t._validate()
 
+
+
+def test_task_shared_defaults():
+
+    """
+    **Purpose**: Test that modifying the defaults shared between Tasks only affects the modified Task
+    """
+
+    t1 = Task()
+    t2 = Task()
+
+    t1.cpu_reqs['processes'] = 4
+    t1.gpu_reqs = {'processes': 2}
+    t1.parent_stage['uid'] = 's1'
+    t1.pre_exec.append('module load abc')
+
+    assert t1.cpu_reqs['processes'] == 4
+    assert t1.gpu_reqs['processes'] == 2
+    assert t1.parent_stage['uid'] == 's1'
+    assert t1.pre_exec == ['module load abc']
+
+    assert t2.cpu_reqs['processes'] == 1
+    assert t2.gpu_reqs['processes'] == 0
+    assert t2.parent_stage['uid'] == None
+    assert t2.pre_exec == list()
+
+    t1.state = states.SCHEDULING
+    t1.state = states.FAILED
+    t1.state = states.INITIAL
+
+    assert t1.state == states.INITIAL
+    assert t1.state_history == [states.INITIAL, states.SCHEDULING, states.FAILED, states.INITIAL]
+    assert t2.state_history == [states.INITIAL]
+
+    # The history is only changed by assigning a state
+    t1.state_history.append(states.DONE)
+    assert t1.state_history == [states.INITIAL, states.SCHEDULING, states.FAILED, states.INITIAL]
+
+    with pytest.raises(AttributeError):
+        t1.unknown = 'abc'
@@ -0,0 +1,153 @@
+from radical.entk import Stage, Task, TaskArray
+from radical.entk.utils.codec import encode_tasks, decode_tasks
+from radical.entk import states
+from radical.entk.exceptions import *
+import json
+import pytest
+
+
+def get_template():
+
+    t = Task()
+    t.name = 'task-{index}'
+    t.executable = ['/bin/cat']
+    t.arguments = ['-n', '{input}', '${HOME}/{index}.log']
+    t.copy_input_data = ['$SHARED/{input}']
+    t.cpu_reqs = {'processes': 2, 'process_type': None, 'threads_per_process': 1, 'thread_type': None}
+
+    return t
+
+
+def test_task_array_exceptions():
+    """
+    ***Purpose***: Test if correct exceptions are raised for invalid templates, sizes and parameter tables
+    """
+
+    with pytest.raises(TypeError):
+        TaskArray('task', size=2)
+
+    # The template is validated
+    with pytest.raises(MissingError):
+        TaskArray(Task(), size=2)
+
+    with pytest.raises(TypeError):
+        TaskArray(get_template())
+
+    with pytest.raises(TypeError):
+        TaskArray(get_template(), params=['a.dat'])
+
+    with pytest.raises(ValueError):
+        TaskArray(get_template(), size=3, params=[{'input': 'a.dat'}])
+
+    with pytest.raises(TypeError):
+        TaskArray(get_template(), size=True)
+
+    with pytest.raises(ValueError):
+        TaskArray(get_template(), size=0)
+
+    with pytest.raises(ValueError):
+        TaskArray(get_template(), params=[])
+
+
+def test_task_array_members():
+    """
+    ***Purpose***: Test if the members of a TaskArray are added to a Stage and expanded from the template once
+    accessed
+    """
+
+    params = [{'input': 'in.%s.dat' % cnt} for cnt in range(5)]
+    template = get_template()
+    array = TaskArray(template, params=params)
+
+    # Changes of the template after the array was created do not change the members
+    template.arguments.append('-v')
+
+    assert len(array) == 5
+    assert array.size == 5
+    assert array.params == params
+
+    s = Stage()
+    s.add_tasks(array)
+
+    assert len(s.tasks) == 5
+    assert s.progress[states.INITIAL] == 5
+    s._validate()
+
+    members = sorted(s.tasks, key=lambda t: t._index)
+
+    # Members are not expanded by to_dict()
+    d = members[3].to_dict()
+    assert members[3]._array is array
+    assert d['name'] == 'task-3'
+    assert d['arguments'] == ['-n', 'in.3.dat', '${HOME}/3.log']
+    assert d['copy_input_data'] == ['$SHARED/in.3.dat']
+    assert d['cpu_reqs']['processes'] == 2
+
+    assert members[1].name == 'task-1'
+    assert members[1]._array is None
+    assert members[1].arguments == ['-n', 'in.1.dat', '${HOME}/1.log']
+
+    # Members do not share the lists of the template
+    members[1].arguments.append('-v')
+    assert members[2].arguments == ['-n', 'in.2.dat', '${HOME}/2.log']
+
+    # Assigning an attribute expands the other attributes first
+    members[4].arguments = ['-v']
+    assert members[4].executable == ['/bin/cat']
+    assert members[4].name == 'task-4'
+
+
+def test_task_array_names():
+    """
+    ***Purpose***: Test if the members of a named template without placeholder in its name get distinct names
+    """
+
+    template = get_template()
+    template.name = 'task'
+
+    members = TaskArray(template, size=3)._members()
+    assert [t.name for t in members] == ['task-0', 'task-1', 'task-2']
+
+    # Unnamed templates give unnamed members
+    template = Task()
+    template.executable = ['/bin/date']
+
+    members = TaskArray(template, size=2)._members()
+    assert [t.name for t in members] == [None, None]
+
+
+def test_task_array_codec():
+    """
+    ***Purpose***: Test if unexpanded members of a TaskArray are encoded compactly and decoded with the same
+    description as the members
+    """
+
+    s = Stage()
+    s.add_tasks(TaskArray(get_template(), size=3))
+
+    t = Task()
+    t.executable = ['/bin/date']
+    s.add_tasks(t)
+
+    s._assign_uid('test')
+    tasks = sorted(s.tasks, key=lambda task: task.uid)
+
+    for task in tasks:
+        task.state = states.SCHEDULING
+
+    message = json.loads(encode_tasks(tasks, codec='json'))
+
+    # One template for the three members, which are sent without description
+    assert len(message['arrays']) == 1
+    assert len(message['tasks']) == 4
+    assert len([task for task in message['tasks'] if 'array' in task]) == 3
+    assert len([task for task in message['tasks'] if 'arguments' in task]) == 1
+
+    for codec in ['json', 'pickle']:
+
+        decoded = decode_tasks(encode_tasks(tasks, codec=codec), codec=codec)
+
+        assert len(decoded) == len(tasks)
+        for task, d in zip(tasks, decoded):
+            assert d.to_dict() == task.to_dict()
+            assert d.state == states.SCHEDULING
@@ -341,3 +341,49 @@ def test_resolve_placeholder():
     raw_path = '$Task_2'
     with pytest.raises(ValueError):
         resolve_placeholders(raw_path, placeholder_dict)
+
+
+def test_directive_cache():
+    """
+    **Purpose**: Test if staging paths shared by the tasks of a stage are resolved once and produce the same RP
+    directives as uncached resolution
+    """
+
+    placeholder_dict = {
+        'p1': {
+            's1': {
+                't1': {
+                    'path': '/home/vivek/t1',
+                    'rts_uid': 'unit.0000'
+                }
+            }
+        }
+    }
+
+    cache = dict()
+
+    for name in ['t2', 't3']:
+
+        t = Task()
+        t.name = name
+        t.copy_input_data = ['$Pipeline_p1_Stage_s1_Task_t1/input.dat', '$SHARED/shared.dat > new.dat']
+        t.download_output_data = ['output.dat']
+
+        assert get_input_list_from_task(t, placeholder_dict, cache) == get_input_list_from_task(t, placeholder_dict)
+        assert get_output_list_from_task(t, placeholder_dict, cache) == get_output_list_from_task(t, placeholder_dict)
+
+    assert cache == {'$Pipeline_p1_Stage_s1_Task_t1/input.dat': ('/home/vivek/t1/input.dat', 'input.dat'),
+                     '$SHARED/shared.dat > new.dat': ('pilot:///shared.dat', 'new.dat'),
+                     'output.dat': ('output.dat', 'output.dat')}
+
+    # Each call returns new directives
+    ip_list = get_input_list_from_task(t, placeholder_dict, cache)
+    assert ip_list[0] is not get_input_list_from_task(t, placeholder_dict, cache)[0]
+    assert ip_list[0] == {'source': '/home/vivek/t1/input.dat', 'target': 'input.dat', 'action': rp.COPY}
+
+    # Unresolved placeholders are not cached
+    t = Task()
+    t.copy_input_data = ['$Pipeline_p1_Stage_s1_Task_t9/input.dat']
+    with pytest.raises(EnTKError):
+        get_input_list_from_task(t, placeholder_dict, cache)
+    assert '$Pipeline_p1_Stage_s1_Task_t9/input.dat' not in cache
@@ -77,6 +77,12 @@ def test_wfp_initialize_workflow():
     for t in p.stages[0].tasks:
         assert t.uid is not None
 
+    assert wfp.uid_map[p.uid] is p
+    assert wfp.uid_map[p.stages[0].uid] is p.stages[0]
+    for t in p.stages[0].tasks:
+        assert wfp.uid_map[t.uid] is t
+    assert len(wfp.uid_map) == 3
+
 
 def func_for_enqueue_test(wfp):
 
@@ -99,6 +105,37 @@ def func_for_enqueue_test(wfp):
     thread.join()
 
 
+def test_wfp_get_ready_pipes():
+
+    pipes = list()
+    for cnt in range(3):
+        p = Pipeline()
+        s = Stage()
+        t = Task()
+        t.executable = ['/bin/date']
+        s.add_tasks(t)
+        p.add_stages(s)
+        pipes.append(p)
+
+    wfp = WFprocessor(sid='test',
+                      workflow=pipes,
+                      pending_queue=list(),
+                      completed_queue=list(),
+                      mq_hostname=hostname,
+                      port=port,
+                      resubmit_failed=False)
+
+    wfp._initialize_workflow()
+
+    assert wfp._get_ready_pipes() == []
+
+    for p in [pipes[1], pipes[0], pipes[1], pipes[2], pipes[0]]:
+        wfp._ready_pipes.put(p)
+
+    assert wfp._get_ready_pipes() == [pipes[1], pipes[0], pipes[2]]
+    assert wfp._ready_pipes.empty()
+
+
 def test_wfp_enqueue():
 
     p = Pipeline()
@@ -122,6 +159,7 @@ def test_wfp_enqueue():
     wfp._initialize_workflow()
 
     amgr.workflow = [p]
+    amgr._uid_map = wfp.uid_map
     profiler = ru.Profiler(name='radical.entk.temp')
 
     for t in p.stages[0].tasks:
@@ -192,6 +230,7 @@ def test_wfp_dequeue():
     wfp._initialize_workflow()
 
     amgr.workflow = [p]
+    amgr._uid_map = wfp.uid_map
     profiler = ru.Profiler(name='radical.entk.temp')
 
     assert p.stages[0].state == states.INITIAL
@@ -254,7 +293,7 @@ def test_wfp_start_processor():
 
     assert wfp.start_processor()
     assert not wfp._enqueue_thread
-    assert not wfp._dequeue_thread
+    assert not wfp._dequeue_threads
     assert not wfp._enqueue_thread_terminate.is_set()
     assert not wfp._dequeue_thread_terminate.is_set()
     assert not wfp._wfp_terminate.is_set()
@@ -315,6 +354,7 @@ def test_wfp_workflow_incomplete():
     assert wfp.workflow_incomplete()
 
     amgr.workflow = [p]
+    amgr._uid_map = wfp.uid_map
     profiler = ru.Profiler(name='radical.entk.temp')
 
     p.stages[0].state == states.SCHEDULING
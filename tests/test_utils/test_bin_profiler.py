@@ -0,0 +1,91 @@
+from radical.entk.utils.bin_profiler import BinaryProfiler, read_binary_profile, convert_profiles, PROF_HEADER
+from radical.entk.exceptions import *
+from multiprocessing import Process
+import tempfile
+import shutil
+import pytest
+import glob
+import os
+
+
+def test_binary_profiler():
+
+    path = tempfile.mkdtemp()
+
+    try:
+
+        prof = BinaryProfiler(name='radical.entk.test', path=path)
+
+        for cnt in range(3):
+            prof.prof('advance', uid='task.%04d' % cnt, state='SCHEDULING', msg='stage.0000', timestamp=10.0 + cnt)
+
+        # Events are buffered until flushed
+        _, events = read_binary_profile(prof.path)
+        assert events == []
+
+        prof.flush()
+        prof.prof(u'publishing obj with state DONE for sync', uid='task.0000', timestamp=20.0)
+
+        # A forked process writes to a file of its own
+        def child():
+            prof.prof('child event', uid='task.0001', timestamp=15.0)
+            prof.close()
+
+        proc = Process(target=child)
+        proc.start()
+        proc.join()
+
+        prof.close()
+
+        name, events = read_binary_profile(prof.path)
+        assert name == 'radical.entk.test'
+        assert events[0][1] == 'sync_abs'
+        assert events[1] == (10.0, 'advance', 'MainThread', 'task.0000', 'SCHEDULING', 'stage.0000')
+        assert events[-1] == (20.0, 'publishing obj with state DONE for sync', 'MainThread', 'task.0000', '', '')
+        assert 'child event' not in [event[1] for event in events]
+
+        # Files of forked processes are merged
+        assert convert_profiles(path) == [os.path.join(path, 'radical.entk.test.prof')]
+
+        with open(os.path.join(path, 'radical.entk.test.prof')) as fp:
+            lines = [line for line in fp.readlines() if ',sync_abs,' not in line]
+
+        assert lines[0] == PROF_HEADER
+        assert lines[1] == '10.0000,advance,radical.entk.test,MainThread,task.0000,SCHEDULING,stage.0000\n'
+        assert lines[4].startswith('15.0000,child event,radical.entk.test,')
+        assert lines[5].startswith('20.0000,publishing obj with state DONE for sync,')
+        assert len(lines) == 6
+
+    finally:
+        shutil.rmtree(path)
+
+
+def test_binary_profile_truncated():
+
+    path = tempfile.mkdtemp()
+
+    try:
+
+        prof = BinaryProfiler(name='radical.entk.test', path=path)
+        prof.prof('event 1', timestamp=1.0)
+        prof.prof('event 2', timestamp=2.0)
+        prof.close()
+
+        # A killed process leaves an incomplete record
+        with open(prof.path, 'rb') as fp:
+            data = fp.read()
+
+        with open(prof.path, 'wb') as fp:
+            fp.write(data[:-3])
+
+        _, events = read_binary_profile(prof.path)
+        assert [event[1] for event in events] == ['sync_abs', 'event 1']
+
+        with open(os.path.join(path, 'other.bprof'), 'wb') as fp:
+            fp.write('#time,event\n')
+
+        with pytest.raises(EnTKError):
+            read_binary_profile(os.path.join(path, 'other.bprof'))
+
+    finally:
+        shutil.rmtree(path)
@@ -0,0 +1,96 @@
+from radical.entk.utils.checkpoint import write_checkpoint, read_checkpoint, restore_workflow
+from radical.entk.utils.checkpoint import restore_id_counters, seed_placeholders
+from radical.entk.utils.placeholder_store import PlaceholderStore
+from radical.entk import Pipeline, Stage, Task, states
+import radical.utils as ru
+import shutil
+import os
+
+
+def func_condition():
+    return False
+
+
+def func_on_true():
+    pass
+
+
+def func_on_false():
+    pass
+
+
+def test_checkpoint_resume():
+
+    sid = 'test.checkpoint'
+
+    p = Pipeline()
+    p.name = 'p1'
+
+    for s_cnt in range(3):
+        s = Stage()
+        s.name = 's%s' % s_cnt
+        for t_cnt in range(2):
+            t = Task()
+            t.name = 't%s' % t_cnt
+            t.executable = ['/bin/date']
+            s.add_tasks(t)
+        p.add_stages(s)
+
+    p._assign_uid(sid)
+
+    # First stage is done, second has one done and one running task
+    s0, s1, s2 = p.stages
+    s0._set_tasks_state(states.DONE)
+    s0.state = states.DONE
+    for t in s0.tasks:
+        t.path = '/home/vivek/%s' % t.name
+    t_done, t_running = sorted(s1.tasks, key=lambda t: t.name)
+    t_done.state = states.DONE
+    t_done.path = '/home/vivek/s1/t0'
+    t_running.state = states.SUBMITTED
+    s1.state = states.SCHEDULED
+    p._increment_stage()
+
+    try:
+
+        write_checkpoint([p], sid)
+
+        # The user provides the post_exec functions
+        p2 = Pipeline()
+        p2.name = 'p1'
+        p2.add_stages([Stage(), Stage(), Stage()])
+        p2.stages[2].post_exec = {'condition': func_condition,
+                                  'on_true': func_on_true,
+                                  'on_false': func_on_false}
+
+        workflow = restore_workflow(read_checkpoint(sid), [p2])
+        assert len(workflow) == 1
+
+        pipe = list(workflow)[0]
+        assert pipe.uid == p.uid
+        assert pipe.current_stage == 2
+        assert not pipe.completed
+
+        r0, r1, r2 = pipe.stages
+        assert r0.state == states.DONE
+        assert r1.state == states.INITIAL
+        assert r1.progress[states.DONE] == 1
+        assert r1.progress[states.INITIAL] == 1
+        assert r2.post_exec['condition'] == func_condition
+        assert set([t.uid for t in r1.tasks]) == set([t.uid for t in s1.tasks])
+
+        # Placeholders of done tasks resolve after the resume
+        seed_placeholders(workflow, os.path.join(sid, 'placeholders.jsonl'))
+        store = PlaceholderStore(path=os.path.join(sid, 'placeholders.jsonl'))
+        assert store.get_path('p1', 's1', 't0') == '/home/vivek/s1/t0'
+        assert store.get_path('p1', 's1', 't1') is None
+        store.close()
+
+        # New objects do not reuse the uids of the restored workflow
+        restore_id_counters(workflow, 'test.resumed')
+        s = Stage()
+        s._assign_uid('test.resumed')
+        assert s.uid not in [st.uid for st in pipe.stages]
+
+    finally:
+        shutil.rmtree(sid)
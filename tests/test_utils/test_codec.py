@@ -0,0 +1,67 @@
+from radical.entk.utils.codec import encode_tasks, decode_tasks, msgpack
+from radical.entk import Task
+from radical.entk.exceptions import *
+import cPickle
+import pytest
+import json
+
+
+def test_codec_round_trip():
+
+    tasks = list()
+    for cnt in range(3):
+        t = Task()
+        t._uid = 'task.%04d' % cnt
+        t.name = 'task-%s' % cnt
+        t.executable = ['/bin/date']
+        t.arguments = ['-u', str(cnt)]
+        t.cpu_reqs = {'processes': 2, 'process_type': None, 'threads_per_process': 1, 'thread_type': None}
+        t.tag = 'task.0000'
+        t.parent_stage = {'uid': 'stage.0000', 'name': 'stage-0'}
+        t.parent_pipeline = {'uid': 'pipeline.0000', 'name': 'pipeline-0'}
+        tasks.append(t)
+
+    codecs = ['json', 'pickle']
+    if msgpack:
+        codecs.append('msgpack')
+
+    for codec in codecs:
+
+        decoded = decode_tasks(encode_tasks(tasks, codec=codec), codec=codec)
+
+        assert len(decoded) == len(tasks)
+        for t, d in zip(tasks, decoded):
+            assert isinstance(d, Task)
+            assert d.to_dict() == t.to_dict()
+
+
+def test_codec_single_task():
+
+    t = Task()
+    t._uid = 'task.0000'
+    t.executable = ['/bin/date']
+
+    # Messages holding a single task dictionary are decoded as well
+    decoded = decode_tasks(json.dumps(t.to_dict()), codec='json')
+
+    assert len(decoded) == 1
+    assert decoded[0].uid == t.uid
+    assert decoded[0].executable == t.executable
+
+
+def test_codec_rejects_other_codecs():
+
+    t = Task()
+    t._uid = 'task.0000'
+    t.executable = ['/bin/date']
+
+    # A pickled body must never be unpickled if the codec is json
+    with pytest.raises(EnTKError):
+        decode_tasks(cPickle.dumps([t.to_dict()], cPickle.HIGHEST_PROTOCOL), codec='json')
+
+    with pytest.raises(EnTKError):
+        decode_tasks(encode_tasks([t], codec='json'), codec='pickle')
+
+    if msgpack:
+        with pytest.raises(EnTKError):
+            decode_tasks(encode_tasks([t], codec='json'), codec='msgpack')
@@ -0,0 +1,221 @@
+from radical.entk.utils.local_transport import LocalConnection, start_local_broker
+from radical.entk.utils.mq_utils import set_transport, get_transport, get_connection_manager
+from radical.entk.utils.sync_initiator import SyncInitiator, sync_with_master
+from radical.entk.utils import sync_initiator
+from radical.entk.utils.init_transition import bulk_transition
+from radical.entk import Task
+from radical.entk.exceptions import *
+from multiprocessing import Process
+import radical.utils as ru
+import pytest
+import pika
+
+
+def test_local_transport_consume():
+
+    start_local_broker()
+
+    connection = LocalConnection()
+    channel = connection.channel()
+    channel.queue_declare(queue='test-local-1')
+
+    for cnt in range(5):
+        channel.basic_publish(exchange='', routing_key='test-local-1', body='msg-%s' % cnt,
+                              properties=pika.BasicProperties(correlation_id=str(cnt), reply_to='test-local-2'))
+
+    # Messages to queues which do not exist are dropped
+    channel.basic_publish(exchange='', routing_key='test-local-none', body='msg')
+
+    assert channel.queue_declare(queue='test-local-1', passive=True).method.message_count == 5
+
+    received = list()
+
+    def on_message(ch, method_frame, props, body):
+        received.append((body, props.correlation_id, props.reply_to))
+        ch.basic_ack(delivery_tag=method_frame.delivery_tag)
+
+    consumer_tag = channel.basic_consume(on_message, queue='test-local-1')
+    connection.process_data_events(time_limit=1)
+
+    assert received == [('msg-%s' % cnt, str(cnt), 'test-local-2') for cnt in range(5)]
+
+    # Nothing left to consume
+    channel.basic_cancel(consumer_tag)
+    assert channel.basic_get(queue='test-local-1') == (None, None, None)
+
+    channel.queue_delete(queue='test-local-1')
+    connection.close()
+
+
+def test_local_transport_requeue():
+
+    start_local_broker()
+
+    connection = LocalConnection()
+    channel = connection.channel()
+    channel.queue_declare(queue='test-local-1')
+    reply_queue = channel.queue_declare(exclusive=True).method.queue
+
+    channel.basic_publish(exchange='', routing_key='test-local-1', body='msg-1')
+    channel.basic_publish(exchange='', routing_key='test-local-1', body='msg-2')
+    channel.basic_publish(exchange='', routing_key=reply_queue, body='msg-3')
+
+    method_frame, props, body = channel.basic_get(queue='test-local-1')
+    assert body == 'msg-1'
+
+    # Unacknowledged messages are requeued, exclusive queues deleted once the connection is closed
+    connection.close()
+
+    connection = LocalConnection()
+    channel = connection.channel()
+
+    assert channel.basic_get(queue='test-local-1')[2] == 'msg-1'
+    assert channel.basic_get(queue='test-local-1')[2] == 'msg-2'
+    assert channel.basic_get(queue=reply_queue) == (None, None, None)
+
+    channel.queue_delete(queue='test-local-1')
+    connection.close()
+
+
+def test_local_transport_cancel():
+
+    start_local_broker()
+
+    connection = LocalConnection()
+    channel = connection.channel()
+
+    # A passive declare does not create a missing queue
+    with pytest.raises(pika.exceptions.ChannelClosed):
+        channel.queue_declare(queue='test-local-1', passive=True)
+
+    channel.queue_declare(queue='test-local-1')
+    assert channel.queue_declare(queue='test-local-1', passive=True).method.message_count == 0
+
+    for cnt in range(3):
+        channel.basic_publish(exchange='', routing_key='test-local-1', body='msg-%s' % cnt)
+
+    # Messages yielded by consume() but not acknowledged are requeued on cancel()
+    for method_frame, props, body in channel.consume(queue='test-local-1'):
+        if body == 'msg-1':
+            channel.basic_ack(delivery_tag=method_frame.delivery_tag)
+            break
+
+    assert channel.cancel() == 1
+    assert channel.basic_get(queue='test-local-1')[2] == 'msg-0'
+    assert channel.basic_get(queue='test-local-1')[2] == 'msg-2'
+
+    channel.queue_delete(queue='test-local-1')
+    connection.close()
+
+
+def func(queue):
+
+    connection = LocalConnection()
+    channel = connection.channel()
+
+    for method_frame, props, body in channel.consume(queue=queue, inactivity_timeout=5):
+
+        channel.basic_publish(exchange='', routing_key=props.reply_to, body=body,
+                              properties=pika.BasicProperties(correlation_id=props.correlation_id))
+        channel.basic_ack(delivery_tag=method_frame.delivery_tag)
+
+        break
+
+    connection.close()
+
+
+def test_local_transport_sync():
+
+    set_transport('local')
+    assert get_transport() == 'local'
+
+    try:
+
+        mq = get_connection_manager('localhost', 5672)
+        channel = mq.channel()
+        channel.queue_declare(queue='test-local-sync-1-2-3')
+        channel.queue_declare(queue='test-local-sync-3-2-1')
+
+        # The broker is shared with processes forked afterwards
+        proc = Process(target=func, args=('test-local-sync-1-2-3',))
+        proc.start()
+
+        task = Task()
+        task.parent_stage = {'uid': 'stage.0000', 'name': 'stage.0000'}
+        task.parent_pipeline = {'uid': 'pipeline.0000', 'name': 'pipeline.0000'}
+
+        logger = ru.Logger('radical.entk.test')
+        profiler = ru.Profiler('radical.entk.test')
+
+        syncer = SyncInitiator(channel=channel, queue='test-local-sync-1-2-3', logger=logger, profiler=profiler)
+        syncer.sync(task, 'Task', blocking=True)
+        assert not syncer.outstanding
+
+        proc.join()
+
+        # SyncInitiators sharing a channel and a queue receive the acks of their own updates only
+        other = SyncInitiator(channel=channel, queue='test-local-sync-1-2-3', logger=logger, profiler=profiler)
+
+        procs = [Process(target=func, args=('test-local-sync-1-2-3',)) for _ in range(2)]
+        for proc in procs:
+            proc.start()
+
+        syncer.sync(task, 'Task')
+        other.sync(task, 'Task')
+        syncer.flush()
+        other.flush()
+
+        for proc in procs:
+            proc.join()
+
+        # The reply queue is deleted once the SyncInitiator is closed
+        other.close()
+        with pytest.raises(pika.exceptions.ChannelClosed):
+            channel.queue_declare(queue=other._reply_queue, passive=True)
+
+        # Without a syncer, each call consumes acks through a temporary SyncInitiator which is closed afterwards, so
+        # that the acks of later calls are not delivered to it
+        syncer.close()
+
+        for state in ['SCHEDULING', 'SCHEDULED']:
+
+            proc = Process(target=func, args=('test-local-sync-1-2-3',))
+            proc.start()
+
+            bulk_transition(objs=[task], obj_type='Task', new_state=state, channel=channel,
+                            queue='test-local-sync-1-2-3', profiler=profiler, logger=logger)
+
+            assert task.state == state
+            assert not channel._consumers
+
+            proc.join()
+
+        # Waiting for an ack gives up once no message arrived for SYNC_TIMEOUT secs
+        sync_timeout = sync_initiator.SYNC_TIMEOUT
+        sync_initiator.SYNC_TIMEOUT = 0.5
+
+        try:
+            with pytest.raises(EnTKError):
+                sync_with_master(task, 'Task', channel, 'test-local-sync-1-2-3', logger, profiler)
+        finally:
+            sync_initiator.SYNC_TIMEOUT = sync_timeout
+
+        assert channel.basic_get(queue='test-local-sync-1-2-3')[2]
+
+        # Requesting the connection does not dispatch pending consumer callbacks
+        received = list()
+        consumer_tag = channel.basic_consume(lambda *args: received.append(args), queue='test-local-sync-1-2-3')
+        channel.basic_publish(exchange='', routing_key='test-local-sync-1-2-3', body='msg')
+
+        assert mq.connection() is channel.connection
+        assert mq.channel() is channel
+        assert not received
+
+        channel.basic_cancel(consumer_tag)
+
+        channel.queue_delete(queue='test-local-sync-1-2-3')
+        channel.queue_delete(queue='test-local-sync-3-2-1')
+        mq.close()
+
+    finally:
+        set_transport('rabbitmq')
@@ -0,0 +1,60 @@
+from radical.entk.utils.log_utils import UpdateReporter, log_enabled
+import logging
+
+
+class Report(object):
+
+    def __init__(self):
+        self.lines = list()
+
+    def ok(self, msg):
+        self.lines.append(msg)
+
+    def info(self, msg):
+        self.lines[-1] += msg
+
+
+def test_update_reporter_verbose():
+
+    report = Report()
+    updates = UpdateReporter(report, mode='verbose')
+
+    updates.update('Task', 'task.0000', 'DONE')
+    updates.flush()
+
+    assert report.lines == ['Update: Task task.0000 in state DONE\n']
+
+
+def test_update_reporter_quiet():
+
+    report = Report()
+    updates = UpdateReporter(report, mode='quiet', interval=3600)
+
+    for cnt in range(1240):
+        updates.update('Task', 'task.%04d' % cnt, 'DONE')
+    updates.update('Stage', 'stage.0000', 'DONE')
+    updates.update('Task', 'task.0000', 'FAILED')
+
+    # Updates are only counted until the summary is due
+    assert report.lines == []
+
+    updates.flush()
+    assert report.lines == ['Update: 1240 Tasks DONE, 1 Stages DONE, 1 Tasks FAILED in last 0s\n']
+
+    # Nothing to summarize
+    updates.flush()
+    assert len(report.lines) == 1
+
+    updates = UpdateReporter(report, mode='quiet', interval=0)
+    updates.update('Pipeline', 'pipeline.0000', 'DONE')
+    assert report.lines[-1] == 'Update: 1 Pipelines DONE in last 0s\n'
+
+
+def test_log_enabled():
+
+    logger = logging.getLogger('radical.entk.test_log_utils')
+    logger.setLevel(logging.INFO)
+
+    assert log_enabled(logger, logging.INFO)
+    assert not log_enabled(logger, logging.DEBUG)
+    assert log_enabled(object(), logging.DEBUG)
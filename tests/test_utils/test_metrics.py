@@ -0,0 +1,76 @@
+from radical.entk.utils.metrics import Histogram, Metrics, BUCKETS
+import tempfile
+import shutil
+import json
+import time
+
+
+def test_histogram():
+
+    hist = Histogram()
+
+    assert hist.percentile(50) is None
+
+    for value in [0.001] * 90 + [0.1] * 9 + [1000]:
+        hist.observe(value)
+
+    assert hist.count == 100
+    assert hist.min == 0.001
+    assert hist.max == 1000
+
+    # Percentiles are bucket bounds, capped by the maximum
+    assert 0.001 <= hist.percentile(50) < 0.002
+    assert 0.1 <= hist.percentile(99) < 0.2
+    assert hist.percentile(100) == 1000
+
+    hist_dict = hist.to_dict()
+    assert hist_dict['count'] == 100
+    assert sum(count for _, count in hist_dict['buckets']) == 100
+    assert hist_dict['buckets'][-1] == ['inf', 1]
+
+
+def test_metrics_dump():
+
+    path = tempfile.mkdtemp()
+
+    try:
+
+        metrics = Metrics(name='radical.entk.test', path=path, interval=0.1)
+
+        with metrics.timer('test.timer'):
+            time.sleep(0.01)
+
+        metrics.observe('test.latency', 0.5)
+        metrics.gauge('queue.test', 3)
+
+        metrics.start()
+        time.sleep(0.3)
+
+        with open(metrics.path) as fp:
+            dumped = json.load(fp)
+
+        assert dumped['name'] == 'radical.entk.test'
+        assert dumped['gauges'] == {'queue.test': 3}
+        assert dumped['histograms']['test.timer']['min'] >= 0.01
+        assert dumped['histograms']['test.latency']['count'] == 1
+
+        # The final dump holds all observations
+        metrics.observe('test.latency', 0.5)
+        metrics.stop()
+
+        with open(metrics.path) as fp:
+            assert json.load(fp)['histograms']['test.latency']['count'] == 2
+
+    finally:
+        shutil.rmtree(path)
+
+
+def test_metrics_no_path():
+
+    metrics = Metrics(name='radical.entk.test')
+    metrics.observe('test.latency', BUCKETS[-1] * 2)
+    metrics.start()
+    metrics.stop()
+
+    assert metrics.path is None
+    assert metrics.to_dict()['histograms']['test.latency']['p50'] == BUCKETS[-1] * 2
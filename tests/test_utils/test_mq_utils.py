@@ -0,0 +1,62 @@
+from radical.entk.utils.mq_utils import select_queue, get_connection_manager
+import threading
+import os
+
+hostname = os.environ.get('RMQ_HOSTNAME', 'localhost')
+port = int(os.environ.get('RMQ_PORT', 5672))
+
+
+def test_select_queue():
+
+    queues = ['test-completedq-1', 'test-completedq-2', 'test-completedq-3']
+
+    selected = set()
+    for cnt in range(100):
+        uid = 'pipeline.%04d' % cnt
+        queue = select_queue(queues, uid)
+        assert queue in queues
+        assert select_queue(queues, uid) == queue
+        assert select_queue(queues, unicode(uid)) == queue
+        selected.add(queue)
+
+    assert selected == set(queues)
+
+    assert select_queue(['test-completedq-1'], 'pipeline.0000') == 'test-completedq-1'
+
+
+def test_connection_manager():
+
+    mq = get_connection_manager(hostname, port)
+    assert get_connection_manager(hostname, port) is mq
+    assert get_connection_manager(hostname, port + 1) is not mq
+
+    mq.close()
+    metrics = mq.metrics
+
+    # A thread reuses its connection and channel
+    connection = mq.connection()
+    channel = mq.channel()
+    assert mq.connection() is connection
+    assert mq.channel() is channel
+    assert mq.metrics['connections'] == metrics['connections'] + 1
+
+    # Other threads get their own connection
+    connections = list()
+
+    def func():
+        connections.append(mq.connection())
+        mq.close()
+
+    thread = threading.Thread(target=func)
+    thread.start()
+    thread.join()
+    assert connections[0] is not connection
+    assert mq.metrics['connections'] == metrics['connections'] + 1
+
+    # A closed connection is re-established
+    connection.close()
+    assert mq.connection() is not connection
+    assert mq.metrics['reconnects'] == metrics['reconnects'] + 1
+
+    mq.close()
+    assert mq.metrics['connections'] == metrics['connections']
@@ -0,0 +1,65 @@
+from radical.entk.utils.placeholder_store import PlaceholderStore
+import tempfile
+import shutil
+import os
+
+
+def test_placeholder_store_eviction():
+
+    store = PlaceholderStore(max_pipelines=2)
+
+    for p in ['p1', 'p2', 'p3']:
+        store.add(p, 's1', 't1', '/home/vivek/%s' % p, 'unit.0000')
+
+    assert len(store) == 3
+    assert store.get('p1', 's1', 't1') == ('/home/vivek/p1', 'unit.0000')
+    assert store.get_path('p1', 's1', 't2') is None
+
+    # Only completed pipelines are evicted, least recently used first
+    store.pipeline_done('p1')
+    store.pipeline_done('p2')
+    assert store.get_path('p1', 's1', 't1') == '/home/vivek/p1'
+    store.pipeline_done('p3')
+
+    assert 'p1' in store
+    assert 'p2' not in store
+    assert 'p3' in store
+
+    # Pipelines adding tasks are active again
+    store.add('p1', 's2', 't1', '/home/vivek/p1-s2')
+    store.add('p4', 's1', 't1', '/home/vivek/p4')
+    store.pipeline_done('p4')
+    assert 'p1' in store
+    assert len(store) == 4
+
+
+def test_placeholder_store_persistence():
+
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, 'placeholders.jsonl')
+
+    try:
+
+        store = PlaceholderStore(path=path, max_pipelines=1)
+        store.add('p1', 's1', 't1', '/home/vivek/p1', 'unit.0000')
+        store.add('p2', 's1', 't1', '/home/vivek/p2', 'unit.0001')
+        store.pipeline_done('p1')
+        store.pipeline_done('p2')
+        store.close()
+
+        # A truncated last record is skipped
+        with open(path, 'a') as fp:
+            fp.write('["add", "p3", "s1"')
+
+        store = PlaceholderStore(path=path, max_pipelines=1)
+        assert 'p1' not in store
+        assert store.get('p2', 's1', 't1') == ('/home/vivek/p2', 'unit.0001')
+        assert len(store) == 1
+        store.close()
+
+        # The file is rewritten with the entries still held
+        with open(path) as fp:
+            assert len(fp.readlines()) == 2
+
+    finally:
+        shutil.rmtree(folder)
@@ -0,0 +1,42 @@
+from radical.entk.utils.prof_arrays import read_session_arrays, get_state_durations, get_concurrency, get_throughput
+from radical.entk import states
+import pytest
+import os
+
+np = pytest.importorskip('numpy')
+
+sid = 're.session.vivek-HP-Pavilion-m6-Notebook-PC.vivek.017732.0002'
+curdir = os.path.dirname(os.path.abspath(__file__))
+src = '%s/sample_data/profiler' % curdir
+
+
+def test_read_session_arrays():
+
+    arrays = read_session_arrays(sid=sid, src=src)
+
+    assert len(arrays) == 197
+    assert np.all(np.diff(arrays.time) >= 0)
+    assert arrays.uid.dtype == np.int32
+    assert arrays.state.dtype == np.int8
+    assert set(['task.0000', 'task.0001', 'stage.0000', 'pipeline.0000']) < set(arrays.uids)
+
+    # Both tasks advanced through all states once
+    assert arrays.mask(etype='task', event='advance', state=states.DONE).sum() == 2
+    assert not arrays.mask(event='no such event').any()
+
+
+def test_state_analytics():
+
+    arrays = read_session_arrays(sid=sid, src=src)
+
+    durations = get_state_durations(arrays, states.SCHEDULING, states.DONE)
+    assert len(durations) == 2
+    assert np.all(durations > 0)
+
+    times, counts = get_concurrency(arrays, states.SCHEDULING, states.DONE)
+    assert len(times) == 4
+    assert counts.max() <= 2
+    assert counts[-1] == 0
+
+    bins, rates = get_throughput(arrays, states.DONE, bin_size=0.5)
+    assert rates.sum() * 0.5 == 2
@@ -1,5 +1,6 @@
 import pytest
 from radical.entk.utils import get_session_profile, get_session_description, write_session_description, write_workflow
+from radical.entk.utils import read_workflow, iter_workflow
 from pprint import pprint
 from radical.entk.exceptions import *
 import radical.utils as ru
@@ -369,7 +370,7 @@ def generate_pipeline(nid):
     return p
 
 
-def test_write_workflow():
+def test_write_workflow(tmpdir):
 
     wf = list()
     wf.append(generate_pipeline(1))
@@ -387,9 +388,18 @@ def test_write_workflow():
     amgr._wfp._initialize_workflow()  
     wf = amgr._wfp.workflow
 
-    write_workflow(wf, 'test')
+    uid = str(tmpdir.join('test'))
+    write_workflow(wf, uid)
+    records = len(list(iter_workflow(uid)))
 
-    data = ru.read_json('test/entk_workflow.json')
+    # An incomplete record of a killed run is skipped, records appended afterwards start on a new line
+    with open('%s/entk_workflow.jsonl' % uid, 'a') as fp:
+        fp.write('{"type": "Task", "obj')
+
+    write_workflow(wf, uid)
+    assert len(list(iter_workflow(uid))) == 2 * records
+
+    data = read_workflow(uid)
     assert len(data) == len(wf)
 
     p_cnt = 0
@@ -405,7 +415,4 @@ def test_write_workflow():
             for t in wf[p_cnt].stages[s_cnt].tasks:
                 assert t.to_dict() in s['tasks']
             s_cnt += 1
-        p_cnt += 1
-
-
-    shutil.rmtree('test')
\ No newline at end of file
+        p_cnt += 1
\ No newline at end of file
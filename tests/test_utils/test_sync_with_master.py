@@ -1,4 +1,4 @@
-from radical.entk.utils.sync_initiator import sync_with_master
+from radical.entk.utils.sync_initiator import sync_with_master, SyncInitiator, _to_sync_dict
 import pika
 from radical.entk import Task, Stage, Pipeline
 import radical.utils as ru
@@ -73,4 +73,94 @@ def test_utils_sync_with_master():
     obj = Pipeline()
     obj_type = 'Pipeline'    
     master(obj, obj_type)
-    
\ No newline at end of file
+    
+
+def pipelined_syncer(objs, obj_type, queue1, logger, profiler):
+
+    hostname = os.environ.get('RMQ_HOSTNAME', 'localhost')
+    port = int(os.environ.get('RMQ_PORT', 5672))
+
+    mq_connection = pika.BlockingConnection(pika.ConnectionParameters(host=hostname, port=port))
+    mq_channel = mq_connection.channel()
+
+    syncer = SyncInitiator(channel=mq_channel,
+                           queue=queue1,
+                           logger=logger,
+                           profiler=profiler,
+                           window=2)
+
+    for obj in objs:
+        syncer.sync(obj, obj_type)
+        assert syncer.outstanding <= syncer.window
+
+    syncer.flush()
+    assert syncer.outstanding == 0
+
+    mq_connection.close()
+
+
+def test_utils_sync_initiator():
+
+    hostname = os.environ.get('RMQ_HOSTNAME', 'localhost')
+    port = int(os.environ.get('RMQ_PORT', 5672))
+
+    mq_connection = pika.BlockingConnection(pika.ConnectionParameters(host=hostname, port=port))
+    mq_channel = mq_connection.channel()
+
+    queue1 = 'test-1-2-3'       # Expected queue name structure 'X-A-B-C'
+    queue2 = 'test-3-2-1'       # Expected queue name structure 'X-C-B-A'
+    mq_channel.queue_declare(queue=queue1)
+    mq_channel.queue_declare(queue=queue2)
+
+    logger = ru.Logger('radical.entk.test')
+    profiler = ru.Profiler('radical.entk.test')
+
+    objs = [Task() for _ in range(5)]
+
+    thread1 = Thread(target=pipelined_syncer, args=(objs, 'Task', queue1, logger, profiler))
+    thread1.start()
+
+    # Acks are sent to the private reply queue of the SyncInitiator, as done by the AppManager
+    acked = 0
+    while acked < len(objs):
+        method_frame, props, body = mq_channel.basic_get(queue=queue1)
+        if body:
+            mq_channel.basic_publish(exchange='',
+                                     routing_key=props.reply_to,
+                                     properties=pika.BasicProperties(correlation_id=props.correlation_id),
+                                     body='ack')
+            mq_channel.basic_ack(delivery_tag=method_frame.delivery_tag)
+            acked += 1
+
+    thread1.join()
+
+    mq_channel.queue_delete(queue=queue1)
+    mq_channel.queue_delete(queue=queue2)
+    mq_connection.close()
+
+
+def test_utils_sync_dict():
+
+    t = Task()
+    t.executable = ['/bin/date']
+    t.arguments = ['arg'] * 100
+    t.parent_stage['uid'] = 'stage.0000'
+    t.parent_pipeline['uid'] = 'pipeline.0000'
+
+    t_dict = _to_sync_dict(t, 'Task')
+    assert set(t_dict.keys()) == set(['uid', 'state', 'parent_stage', 'parent_pipeline'])
+    assert t_dict['parent_stage']['uid'] == 'stage.0000'
+
+    t.path = 'some/path'
+    t.exit_code = 1
+    t_dict = _to_sync_dict(t, 'Task')
+    assert t_dict['path'] == 'some/path'
+    assert t_dict['exit_code'] == 1
+
+    assert _to_sync_dict(t, 'Task', full=True) == t.to_dict()
+
+    s = Stage()
+    assert set(_to_sync_dict(s, 'Stage').keys()) == set(['uid', 'state', 'parent_pipeline'])
+
+    p = Pipeline()
+    assert set(_to_sync_dict(p, 'Pipeline').keys()) == set(['uid', 'state', 'completed'])